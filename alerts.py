@@ -0,0 +1,242 @@
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+from entities import ENTITY_FIELDS, extract_entities, normalize_location, normalize_name, normalize_phone
+
+# Case fields a rule can require a value of
+RULE_FIELDS = ('crime_type', 'priority', 'status')
+
+# Entity a rule can require a case to mention, with its normalization (entities.py)
+ENTITY_KINDS = {
+    'name': normalize_name,
+    'email': lambda value: value.strip().lower() or None,
+    'phone': lambda value: normalize_phone(value) if sum(char.isdigit() for char in value) >= 10 else None,
+    'location': normalize_location
+}
+
+# Case fields read to match and describe a case
+CASE_FIELDS = ('case_id', 'title', *RULE_FIELDS, *ENTITY_FIELDS)
+
+# Notifications returned by one feed read
+FEED_LIMIT = 100
+
+@dataclass(frozen=True, slots=True)
+class AlertRule:
+    id: int
+    owner: str
+    name: str
+    crime_type: str
+    priority: str
+    status: str
+    entity_kind: str
+    entity_value: str
+    
+    def matches(self, case, entities):
+        """Whether a case dict (with its extracted entities) meets every condition of the rule"""
+        for field in RULE_FIELDS:
+            value = getattr(self, field)
+            if value is not None and value != case.get(field):
+                return False
+        return self.entity_kind is None or (self.entity_kind, self.entity_value) in entities
+
+def _rule_key(rule):
+    """Bucket a rule is filed under: its most selective condition"""
+    if rule.entity_kind:
+        return ('entity', rule.entity_kind, rule.entity_value)
+    if rule.crime_type and rule.priority:
+        return ('type_priority', rule.crime_type, rule.priority)
+    if rule.crime_type:
+        return ('crime_type', rule.crime_type)
+    if rule.priority:
+        return ('priority', rule.priority)
+    if rule.status:
+        return ('status', rule.status)
+    return ('any',)
+
+def _case_keys(case, entities):
+    """Every bucket holding rules a case could match"""
+    yield from (('entity', kind, value) for kind, value in entities)
+    yield ('type_priority', case.get('crime_type'), case.get('priority'))
+    yield ('crime_type', case.get('crime_type'))
+    yield ('priority', case.get('priority'))
+    yield ('status', case.get('status'))
+    yield ('any',)
+
+class RuleMatcher:
+    """Alert rules compiled into buckets by crime type, priority, status or entity
+    
+    A case is only checked against the rules in the few buckets its own
+    values lead to, so matching cost follows the number of candidate rules
+    rather than the number of rules.
+    """
+    
+    def __init__(self, rules):
+        self.size = len(rules)
+        self._buckets = defaultdict(list)
+        for rule in rules:
+            self._buckets[_rule_key(rule)].append(rule)
+    
+    def match(self, case, entities=None):
+        """Rules a case dict matches"""
+        if entities is None:
+            entities = extract_entities(case)
+        return [rule for key in _case_keys(case, entities) for rule in self._buckets.get(key, ())
+                if rule.matches(case, entities)]
+
+class AlertRules:
+    """Standing searches evaluated against each case as it is created or updated
+    
+    Rules live in the alert_rules table and are compiled into a RuleMatcher,
+    which is rebuilt whenever the rule table's change counter moves. A match
+    writes a notification for the rule's owner, once per case reaching the
+    rule: later edits of a case that already matched do not notify again.
+    """
+    
+    def __init__(self, database):
+        self.db = database
+        self._lock = threading.Lock()
+        self._matcher = None
+        self._version = None
+    
+    def add_rule(self, owner, name, crime_type=None, priority=None, status=None, entity_kind=None, entity_value=None):
+        """Save a rule for a user; at least one condition is required"""
+        entity_value = (entity_value or '').strip() or None
+        if entity_kind and entity_value:
+            if entity_kind not in ENTITY_KINDS:
+                return {'success': False, 'error': f'Unknown entity kind: {entity_kind}'}
+            entity_value = ENTITY_KINDS[entity_kind](entity_value)
+            if not entity_value:
+                return {'success': False, 'error': 'The entity is too short or a placeholder'}
+        else:
+            entity_kind = entity_value = None
+        
+        if not (crime_type or priority or status or entity_kind):
+            return {'success': False, 'error': 'A rule needs at least one condition'}
+        
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.execute('''
+                INSERT INTO alert_rules (owner, name, crime_type, priority, status, entity_kind, entity_value)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (owner, name, crime_type or None, priority or None, status or None, entity_kind, entity_value))
+            conn.commit()
+            conn.close()
+            return {'success': True, 'rule_id': cursor.lastrowid}
+        except Exception as e:
+            conn.close()
+            return {'success': False, 'error': str(e)}
+    
+    def delete_rules(self, owner, rule_ids):
+        """Delete rules of a user, keeping the notifications they raised"""
+        conn = self.db.get_connection()
+        with conn:
+            deleted = conn.execute(f'''
+                DELETE FROM alert_rules WHERE owner = ? AND id IN ({', '.join('?' for _ in rule_ids)})
+            ''', (owner, *rule_ids)).rowcount
+        conn.close()
+        return {'success': True, 'deleted': deleted}
+    
+    def get_rules(self, owner):
+        """Rules of a user, newest first"""
+        conn = self.db.get_connection()
+        rows = conn.execute('''
+            SELECT id, name, crime_type, priority, status, entity_kind, entity_value, created_at
+            FROM alert_rules WHERE owner = ? ORDER BY id DESC
+        ''', (owner,)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    def matcher(self, conn=None):
+        """Current compiled matcher, rebuilt if rules were added or deleted since it was built"""
+        own = conn is None
+        conn = conn or self.db.get_connection()
+        try:
+            version = conn.execute("SELECT value FROM change_sequence WHERE name = 'alert_rules'").fetchone()[0]
+            with self._lock:
+                if version != self._version:
+                    rows = conn.execute('''
+                        SELECT id, owner, name, crime_type, priority, status, entity_kind, entity_value
+                        FROM alert_rules
+                    ''').fetchall()
+                    self._matcher = RuleMatcher([AlertRule(*row) for row in rows])
+                    self._version = version
+                return self._matcher
+        finally:
+            if own:
+                conn.close()
+    
+    def on_change(self, topic, event):
+        """Change feed listener that notifies rule owners of cases newly matching their rules
+        
+        Bulk status changes carry each changed case's old status, so every
+        case in them is evaluated as a single status update would be.
+        """
+        if topic != 'cases' or event.get('action') not in ('create', 'update', 'bulk_update'):
+            return
+        if event['action'] == 'bulk_update':
+            old_statuses = event.get('old_statuses') or {}
+            if not old_statuses:
+                return
+            df = self.db.get_cases_by_ids(old_statuses, columns=list(dict.fromkeys(CASE_FIELDS)))
+            cases = [(case, {'status': (old_statuses[case['case_id']], event['status'])})
+                     for case in df.astype(object).where(df.notna(), None).to_dict('records')]
+        else:
+            changes = event.get('changes', {})
+            if event['action'] == 'update' and not set(changes) & {*RULE_FIELDS, *ENTITY_FIELDS}:
+                return
+            case = self.db.get_case_by_id(event['case_id'])
+            if not case:
+                return
+            cases = [(asdict(case), changes)]
+        
+        conn = self.db.get_connection()
+        try:
+            matcher = self.matcher(conn)
+            notifications = []
+            for case, changes in cases:
+                matched = matcher.match(case)
+                if matched and changes:
+                    before = {rule.id for rule in matcher.match({**case, **{field: old for field, (old, new) in changes.items()}})}
+                    matched = [rule for rule in matched if rule.id not in before]
+                notifications.extend(
+                    (rule.owner, rule.id, rule.name, case['case_id'], event['action'],
+                     f"{case['title']} ({case['crime_type']}, {case['priority']}, {case['status']})")
+                    for rule in matched
+                )
+            
+            if notifications:
+                with conn:
+                    conn.executemany('''
+                        INSERT INTO notifications (username, rule_id, rule_name, case_id, action, message)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', notifications)
+        finally:
+            conn.close()
+    
+    def get_notifications(self, username, limit=FEED_LIMIT):
+        """Newest notifications of a user"""
+        conn = self.db.get_connection()
+        rows = conn.execute('''
+            SELECT id, rule_name, case_id, action, message, created_at, read_at IS NOT NULL AS read
+            FROM notifications WHERE username = ? ORDER BY id DESC LIMIT ?
+        ''', (username, limit)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    def unread_count(self, username):
+        """Number of unread notifications of a user"""
+        conn = self.db.get_connection()
+        count = conn.execute('SELECT COUNT(*) FROM notifications WHERE username = ? AND read_at IS NULL',
+                             (username,)).fetchone()[0]
+        conn.close()
+        return count
+    
+    def mark_read(self, username):
+        """Mark every notification of a user read"""
+        conn = self.db.get_connection()
+        with conn:
+            conn.execute('''
+                UPDATE notifications SET read_at = CURRENT_TIMESTAMP WHERE username = ? AND read_at IS NULL
+            ''', (username,))
+        conn.close()
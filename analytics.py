@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+def _hourly_grid(weekdays, hours, counts):
+    """7 x 24 weekday/hour-of-day grid of summed counts, zero-filled"""
+    grid = np.zeros((7, 24), dtype=np.int64)
+    np.add.at(grid, (np.asarray(weekdays, dtype=np.int64), np.asarray(hours, dtype=np.int64)),
+              np.asarray(counts, dtype=np.int64))
+    return pd.DataFrame(grid, index=WEEKDAYS, columns=range(24))
+
+def _with_user_names(by_user, users):
+    """Label per-user counts with full names, listing active users with no activity as 0"""
+    merged = users[['username', 'full_name']].merge(by_user, on='username', how='left')
+    merged['count'] = merged['count'].fillna(0).astype(int)
+    return merged.sort_values(['count', 'full_name'], ascending=[False, True], ignore_index=True)
+
+def counter_summary(db, start_date, end_date, username=None):
+    """Logins per day, cases created per user and the weekday/hour heatmap, from the hourly counters"""
+    logins = db.get_daily_activity(start_date, end_date, 'LOGIN', username)
+    cases = db.get_activity_by_user(start_date, end_date, 'CREATE_CASE')
+    hourly = db.get_hourly_activity(start_date, end_date, username)
+    
+    hours = pd.to_datetime(hourly['hour'], format='%Y-%m-%d %H')
+    return {
+        'logins_per_day': logins,
+        'cases_by_user': _with_user_names(cases, db.get_all_users()),
+        'hourly': _hourly_grid(hours.dt.dayofweek, hours.dt.hour, hourly['count'])
+    }
+
+def raw_log_summary(db, start_date, end_date, username=None):
+    """Same summary computed from the raw activity log, for exact ad-hoc ranges
+    
+    Only months still in the log are covered (see compact_activity_log).
+    """
+    log = db.get_activity_log(username=None, limit=None, start_date=start_date, end_date=end_date)
+    log = log[['username', 'action', 'timestamp']]
+    timestamps = pd.to_datetime(log['timestamp'], format='%Y-%m-%d %H:%M:%S')
+    mine = log['username'] == username if username else np.ones(len(log), dtype=bool)
+    
+    is_login = (log['action'] == 'LOGIN').to_numpy() & mine
+    logins = (timestamps[is_login].dt.strftime('%Y-%m-%d').value_counts().sort_index()
+              .rename_axis('day').reset_index(name='count'))
+    
+    created = log.loc[log['action'] == 'CREATE_CASE', 'username']
+    cases = created.value_counts().rename_axis('username').reset_index(name='count')
+    
+    return {
+        'logins_per_day': logins,
+        'cases_by_user': _with_user_names(cases, db.get_all_users()),
+        'hourly': _hourly_grid(timestamps[mine].dt.dayofweek, timestamps[mine].dt.hour, np.ones(int(np.sum(mine))))
+    }
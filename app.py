@@ -1,26 +1,112 @@
 import dash
-from dash import dcc, html, Input, Output, State, dash_table
+from dash import dcc, html, Input, Output, State, dash_table, DiskcacheManager
+import diskcache
 import dash_bootstrap_components as dbc
-from datetime import datetime
+from flask import session
+from flask_compress import Compress
+import json
+import os
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from database import Database
+from alerts import AlertRules
 from auth import AuthManager
+from casecache import CaseCache
+from changefeed import ChangeFeed
+from entities import EntityIndex
+from evidence import EvidenceStore
+from locations import LocationIndex
+from metrics import CallbackMetrics
+from similarity import SimilarityIndex
+from snapshot import CaseSnapshot
+
+# Background callbacks (reports) run as separate processes queued through a
+# local disk cache. Results are cached per case change cursor, which every
+# process reads from the database, so a report is only recomputed after
+# cases change.
+background_callback_manager = DiskcacheManager(
+    diskcache.Cache(os.environ.get('CYBERCRIME_JOB_CACHE', '/tmp/cybercrime-jobs')),
+    cache_by=[lambda: db.get_change_cursor()],
+    expire=24 * 3600
+)
 
 # Initialize the Dash app with Bootstrap theme
 app = dash.Dash(
     __name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME],
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    background_callback_manager=background_callback_manager
 )
 app.title = "Gloria's Cybercrime Management System"
 server = app.server
 
-# Initialize database and auth manager
-db = Database()
+# Signs the session cookie that identifies the logged-in user to plain Flask
+# routes (evidence, exports). Every worker and instance must share the key, or
+# a login is only known to the worker that served it, so a server refuses to
+# start without CYBERCRIME_SECRET_KEY; only `python app.py` makes up its own
+server.secret_key = os.environ.get('CYBERCRIME_SECRET_KEY')
+if not server.secret_key:
+    if __name__ != '__main__':
+        raise RuntimeError("CYBERCRIME_SECRET_KEY is not set; every worker and instance needs the same key "
+                           "to sign login sessions")
+    server.secret_key = os.urandom(32)
+
+# Bearer token partner systems send to read /api/changes; unset keeps the feed closed
+server.config['SYNC_API_TOKEN'] = os.environ.get('CYBERCRIME_SYNC_TOKEN')
+
+# Brotli (or gzip) for callback responses and assets. Streamed responses, the
+# /events feed and evidence downloads, are passed through untouched.
+server.config.update(COMPRESS_ALGORITHM=['br', 'gzip'], COMPRESS_BR_LEVEL=5, COMPRESS_STREAMS=False)
+Compress(server)
+
+# Initialize database and auth manager. CYBERCRIME_SHARD_BY_YEAR=1 archives
+# each year's closed cases into a file of its own (see shards.py)
+db = Database(os.environ.get('CYBERCRIME_DB', '/tmp/cybercrime.db'),
+              shard_by_year=os.environ.get('CYBERCRIME_SHARD_BY_YEAR') == '1')
 auth_manager = AuthManager(db)
 
+# Standing searches matched against every new or edited case. Subscribed
+# ahead of the change feed, so notifications are written before browsers
+# are told that cases changed
+alert_rules = AlertRules(db)
+db.subscribe(alert_rules.on_change)
+
+# Data versions from the database's change sequences, pushed to browsers over
+# /events; local writes are pushed at once, other workers' within POLL_SECONDS
+change_feed = ChangeFeed(db)
+db.subscribe(change_feed.publish)
+
+# Near-duplicate detection, kept current as cases are added or edited
+similarity_index = SimilarityIndex(db)
+similarity_index.ensure_built()
+db.subscribe(similarity_index.on_change)
+
+# Shared suspects, victims, contacts and places between cases
+entity_index = EntityIndex(db)
+entity_index.ensure_built()
+db.subscribe(entity_index.on_change)
+
+# Case counts by canonical location for the dashboard's geographic view
+location_index = LocationIndex(db)
+location_index.ensure_built()
+db.subscribe(location_index.on_change)
+
+# Recently viewed cases for the case detail page; committed updates drop them
+case_cache = CaseCache(db)
+db.subscribe(case_cache.on_change)
+
+# Columnar copy of cases that reports and trend charts aggregate over,
+# refreshed incrementally so analytics never scan the transactional tables
+case_snapshot = CaseSnapshot(db, os.environ.get('CYBERCRIME_SNAPSHOT_DIR', '/tmp/cybercrime-snapshot'))
+
+# Runs and DB statements per callback, served at /api/metrics
+callback_metrics = CallbackMetrics(db)
+callback_metrics.init_app(server)
+
+# Evidence files live on local disk, addressed by their SHA-256
+evidence_store = EvidenceStore(db, os.environ.get('CYBERCRIME_EVIDENCE_DIR', '/tmp/cybercrime-evidence'))
+
 # Color scheme
 COLORS = {
     'primary': '#2C3E50',
@@ -33,6 +119,30 @@ COLORS = {
     'dark': '#34495E'
 }
 
+# Look of every data table. Tables are built once in the page layouts with
+# these styles, and callbacks only ever send their rows.
+TABLE_STYLE = {
+    'style_table': {'overflowX': 'auto'},
+    'style_cell': {'textAlign': 'left', 'padding': '10px', 'fontFamily': 'Arial'},
+    'style_header': {'backgroundColor': COLORS['primary'], 'color': 'white', 'fontWeight': 'bold'},
+    'style_data_conditional': [{'if': {'row_index': 'odd'}, 'backgroundColor': '#F8F9FA'}]
+}
+
+# Overdue rows in red, rows due soon in amber (hours_overdue is negative until due)
+SLA_ROW_STYLES = TABLE_STYLE['style_data_conditional'] + [
+    {'if': {'filter_query': '{hours_overdue} > 0'}, 'backgroundColor': '#F8D7DA'},
+    {'if': {'filter_query': '{hours_overdue} <= 0'}, 'backgroundColor': '#FFF3CD'}
+]
+
+def data_table(table_id, columns=(), **kwargs):
+    """Empty DataTable with the shared styles; columns are (header, field) pairs"""
+    return dash_table.DataTable(
+        id=table_id,
+        columns=[{'name': name, 'id': field} for name, field in columns],
+        data=[],
+        **{**TABLE_STYLE, **kwargs}
+    )
+
 # Login page layout
 def get_login_layout():
     return dbc.Container([
@@ -73,8 +183,8 @@ def get_login_layout():
 # Main dashboard layout
 def get_dashboard_layout(username='Guest'):
     return dbc.Container([
-        # Interval for auto-refresh
-        dcc.Interval(id='interval-component', interval=60000, n_intervals=0),
+        # Change notifications pushed by assets/changefeed.js
+        dcc.Store(id='change-feed'),
         
         # Header
         dbc.Navbar([
@@ -102,17 +212,25 @@ def get_dashboard_layout(username='Guest'):
                     dbc.CardBody([
                         dbc.Nav([
                             dbc.NavLink([html.I(className="fas fa-tachometer-alt me-2"), "Dashboard"], 
-                                       id='nav-dashboard', active=True, href="#"),
+                                       id='nav-dashboard', href="/dashboard"),
                             dbc.NavLink([html.I(className="fas fa-file-alt me-2"), "Cases"], 
-                                       id='nav-cases', href="#"),
+                                       id='nav-cases', href="/cases"),
                             dbc.NavLink([html.I(className="fas fa-plus-circle me-2"), "New Case"], 
-                                       id='nav-new-case', href="#"),
+                                       id='nav-new-case', href="/new-case"),
                             dbc.NavLink([html.I(className="fas fa-search me-2"), "Search"], 
-                                       id='nav-search', href="#"),
+                                       id='nav-search', href="/search"),
+                            dbc.NavLink([html.I(className="fas fa-project-diagram me-2"), "Linked Cases"], 
+                                       id='nav-linked', href="/linked"),
                             dbc.NavLink([html.I(className="fas fa-chart-bar me-2"), "Reports"], 
-                                       id='nav-reports', href="#"),
+                                       id='nav-reports', href="/reports"),
                             dbc.NavLink([html.I(className="fas fa-users me-2"), "Users"], 
-                                       id='nav-users', href="#"),
+                                       id='nav-users', href="/users"),
+                            dbc.NavLink([html.I(className="fas fa-chart-line me-2"), "User Analytics"], 
+                                       id='nav-analytics', href="/analytics"),
+                            dbc.NavLink([html.I(className="fas fa-history me-2"), "Activity Log"], 
+                                       id='nav-activity', href="/activity"),
+                            dbc.NavLink([html.I(className="fas fa-bell me-2"), "Alerts"], 
+                                       id='nav-alerts', href="/alerts"),
                         ], vertical=True, pills=True)
                     ])
                 ])
@@ -127,9 +245,7 @@ def get_dashboard_layout(username='Guest'):
 
 # Dashboard page
 def get_dashboard_page():
-    # Get statistics
-    stats = db.get_statistics()
-    
+    # Statistics values are filled in by the update_statistics_cards callback
     return html.Div([
         html.H2("Dashboard Overview", className="mb-4"),
         
@@ -140,7 +256,7 @@ def get_dashboard_page():
                     dbc.CardBody([
                         html.Div([
                             html.I(className="fas fa-file-alt fa-3x text-primary"),
-                            html.H3(stats['total_cases'], className="mt-2"),
+                            html.H3(id='stat-total-cases', className="mt-2"),
                             html.P("Total Cases", className="text-muted")
                         ], className="text-center")
                     ])
@@ -152,7 +268,7 @@ def get_dashboard_page():
                     dbc.CardBody([
                         html.Div([
                             html.I(className="fas fa-hourglass-half fa-3x text-warning"),
-                            html.H3(stats['pending_cases'], className="mt-2"),
+                            html.H3(id='stat-pending-cases', className="mt-2"),
                             html.P("Pending Cases", className="text-muted")
                         ], className="text-center")
                     ])
@@ -164,7 +280,7 @@ def get_dashboard_page():
                     dbc.CardBody([
                         html.Div([
                             html.I(className="fas fa-check-circle fa-3x text-success"),
-                            html.H3(stats['resolved_cases'], className="mt-2"),
+                            html.H3(id='stat-resolved-cases', className="mt-2"),
                             html.P("Resolved Cases", className="text-muted")
                         ], className="text-center")
                     ])
@@ -176,7 +292,7 @@ def get_dashboard_page():
                     dbc.CardBody([
                         html.Div([
                             html.I(className="fas fa-users fa-3x text-info"),
-                            html.H3(stats['total_users'], className="mt-2"),
+                            html.H3(id='stat-total-users', className="mt-2"),
                             html.P("System Users", className="text-muted")
                         ], className="text-center")
                     ])
@@ -205,13 +321,56 @@ def get_dashboard_page():
             ], width=6)
         ], className="mb-4"),
         
+        # Geographic view, read from the per-location counts
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Cases by Region"),
+                    dbc.CardBody([
+                        dcc.Graph(id='cases-by-region-chart')
+                    ])
+                ])
+            ], width=6),
+            
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Crime Types by State"),
+                    dbc.CardBody([
+                        dcc.Graph(id='state-crime-heatmap')
+                    ])
+                ])
+            ], width=6)
+        ], className="mb-4"),
+        
+        # SLA watch: overdue and soon-due open cases, most overdue first
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([html.I(className="fas fa-stopwatch me-2"), "SLA Watch"]),
+                    dbc.CardBody([
+                        html.Div(id='sla-summary', className="mb-3"),
+                        data_table('sla-cases-table', [
+                            ('Case ID', 'case_id'), ('Title', 'title'), ('Priority', 'priority'),
+                            ('Status', 'status'), ('Due (UTC)', 'due_at'), ('Hours Overdue', 'hours_overdue')
+                        ], page_size=10, style_data_conditional=SLA_ROW_STYLES)
+                    ])
+                ])
+            ])
+        ], className="mb-4"),
+        
         # Recent cases table
         dbc.Row([
             dbc.Col([
                 dbc.Card([
                     dbc.CardHeader("Recent Cases"),
                     dbc.CardBody([
-                        html.Div(id='recent-cases-table')
+                        # Change cursor and rows shown, so new cases can be prepended
+                        dcc.Store(id='recent-cases-shown'),
+                        html.Div(id='recent-cases-empty'),
+                        data_table('recent-cases-table', [
+                            ('Case ID', 'case_id'), ('Title', 'title'), ('Crime Type', 'crime_type'),
+                            ('Status', 'status'), ('Priority', 'priority'), ('Created', 'created_at')
+                        ], page_size=10)
                     ])
                 ])
             ])
@@ -248,7 +407,35 @@ def get_cases_page():
                         )
                     ], width=4)
                 ]),
-                html.Div(id='cases-list-table')
+                html.Div(id='cases-list-empty'),
+                data_table(
+                    'cases-list-table',
+                    [('Case ID', 'case_id'), ('Title', 'title'), ('Crime Type', 'crime_type'),
+                     ('Incident Date', 'incident_date'), ('Location', 'location'), ('Status', 'status'),
+                     ('Priority', 'priority'), ('Created', 'created_at')],
+                    filter_action="native",
+                    sort_action="native",
+                    page_action="native",
+                    page_size=20,
+                    style_cell={**TABLE_STYLE['style_cell'], 'minWidth': '100px'},
+                    style_data_conditional=TABLE_STYLE['style_data_conditional'] + [
+                        {
+                            'if': {'filter_query': '{status} = "Resolved"', 'column_id': 'status'},
+                            'backgroundColor': '#D4EDDA',
+                            'color': '#155724'
+                        },
+                        {
+                            'if': {'filter_query': '{status} = "Pending"', 'column_id': 'status'},
+                            'backgroundColor': '#FFF3CD',
+                            'color': '#856404'
+                        },
+                        {
+                            'if': {'filter_query': '{priority} = "Critical"', 'column_id': 'priority'},
+                            'backgroundColor': '#F8D7DA',
+                            'color': '#721C24'
+                        }
+                    ]
+                )
             ])
         ])
     ])
@@ -364,7 +551,9 @@ def get_new_case_page():
                     ], className="mb-3"),
                     
                     dbc.Button("Submit Case", id='submit-case-button', color='primary', className='mt-3')
-                ])
+                ]),
+                
+                html.Div(id='duplicate-cases-panel', className='mt-4')
             ])
         ])
     ])
@@ -410,11 +599,150 @@ def get_search_page():
                 
                 html.Hr(),
                 
-                html.Div(id='search-results')
+                html.Div(id='search-results'),
+                html.Div(
+                    data_table(
+                        'search-results-table',
+                        [('Case ID', 'case_id'), ('Title', 'title'), ('Crime Type', 'crime_type'),
+                         ('Incident Date', 'incident_date'), ('Victim', 'victim_name'), ('Status', 'status'),
+                         ('Priority', 'priority')],
+                        filter_action="native",
+                        sort_action="native",
+                        page_action="native",
+                        page_size=15
+                    ),
+                    id='search-results-container',
+                    style={'display': 'none'}
+                )
+            ])
+        ])
+    ])
+
+# Linked cases page
+def get_linked_cases_page():
+    return html.Div([
+        html.H2("Linked Cases", className="mb-4"),
+        dbc.Card([
+            dbc.CardBody([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Label("Case ID"),
+                        dbc.Input(id='linked-case-id', type='text', placeholder='e.g. CYB-2025-0001')
+                    ], width=4),
+                    dbc.Col([
+                        dbc.Label("Expand"),
+                        dbc.Select(
+                            id='linked-hops',
+                            options=[
+                                {'label': 'Direct links (1 hop)', 'value': '1'},
+                                {'label': '2 hops', 'value': '2'},
+                                {'label': '3 hops', 'value': '3'}
+                            ],
+                            value='2'
+                        )
+                    ], width=4)
+                ], className="mb-3"),
+                
+                dbc.Button("Find Linked Cases", id='linked-button', color='primary', className='mb-3'),
+                
+                html.Hr(),
+                
+                html.Div(id='linked-cases-results'),
+                html.Div(
+                    data_table(
+                        'linked-cases-table',
+                        [('Case ID', 'case_id'), ('Title', 'title'), ('Crime Type', 'crime_type'),
+                         ('Status', 'status'), ('Hops', 'hops'), ('Linked By', 'linked_by')],
+                        filter_action="native",
+                        sort_action="native",
+                        page_action="native",
+                        page_size=15,
+                        style_data_conditional=[{'if': {'filter_query': '{hops} = 1'}, 'fontWeight': 'bold'}]
+                    ),
+                    id='linked-cases-container',
+                    style={'display': 'none'}
+                ),
+                html.Div(id='linked-cases-skipped')
             ])
         ])
     ])
 
+# Case detail page: one layout for every /case/<case_id>, filled in from the
+# URL. Rows clicked in any case table lead here (see CASE_TABLES).
+def get_case_detail_page():
+    def text_field(label, field, **kwargs):
+        return dbc.Col([dbc.Label(label), dbc.Input(id=f'detail-{field}', type='text', **kwargs)], width=6)
+    
+    def select_field(label, field, values):
+        return dbc.Col([
+            dbc.Label(label),
+            dbc.Select(id=f'detail-{field}', options=[{'label': value, 'value': value} for value in values])
+        ], width=6)
+    
+    return html.Div([
+        dcc.Location(id='case-detail-url', refresh=False),
+        # case_id and version the form was loaded at, for the optimistic update
+        dcc.Store(id='case-detail-loaded'),
+        html.H2(id='case-detail-heading', className="mb-4"),
+        html.Div(id='case-detail-alert'),
+        html.Div([
+            dbc.Card([
+                dbc.CardBody([
+                    html.Div(id='case-detail-save-alert'),
+                    dbc.Row([
+                        text_field("Case Title", 'title'),
+                        select_field("Crime Type", 'crime_type', [
+                            'Hacking', 'Phishing', 'Identity Theft', 'Online Fraud', 'Malware',
+                            'Ransomware', 'Cyberstalking', 'Data Breach', 'Other'
+                        ])
+                    ], className="mb-3"),
+                    dbc.Row([
+                        dbc.Col([dbc.Label("Incident Date"), dbc.Input(id='detail-incident_date', type='date')], width=6),
+                        text_field("Location", 'location')
+                    ], className="mb-3"),
+                    dbc.Row([
+                        text_field("Victim Name", 'victim_name'),
+                        text_field("Victim Contact", 'victim_contact')
+                    ], className="mb-3"),
+                    dbc.Row([
+                        text_field("Suspect Name", 'suspect_name'),
+                        text_field("Suspect Details", 'suspect_details')
+                    ], className="mb-3"),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Description"),
+                            dbc.Textarea(id='detail-description', style={'height': '150px'})
+                        ])
+                    ], className="mb-3"),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Evidence/Notes"),
+                            dbc.Textarea(id='detail-evidence', style={'height': '100px'})
+                        ])
+                    ], className="mb-3"),
+                    dbc.Row([
+                        select_field("Priority Level", 'priority', ['Low', 'Medium', 'High', 'Critical']),
+                        select_field("Status", 'status', ['Pending', 'Under Investigation', 'Resolved', 'Closed'])
+                    ], className="mb-3"),
+                    
+                    dbc.Button("Save Changes", id='case-detail-save', color='primary', className='mt-3 me-2'),
+                    dcc.Link(dbc.Button("Back to Cases", color='secondary', outline=True, className='mt-3'),
+                             href='/cases')
+                ])
+            ], className="mb-4"),
+            
+            dbc.Card([
+                dbc.CardHeader("Change History"),
+                dbc.CardBody([
+                    data_table('case-history-table', [
+                        ('Version', 'version'), ('Field', 'field'), ('Old Value', 'old_value'),
+                        ('New Value', 'new_value'), ('Changed By', 'changed_by'), ('Changed At', 'changed_at')
+                    ], page_size=10)
+                ])
+            ])
+        ], id='case-detail-body')
+    ])
+
 # Reports page
 def get_reports_page():
     return html.Div([
@@ -432,6 +760,9 @@ def get_reports_page():
                                 {'label': 'Monthly Summary', 'value': 'monthly'},
                                 {'label': 'Crime Type Analysis', 'value': 'crime_type'},
                                 {'label': 'Status Overview', 'value': 'status'},
+                                {'label': 'Crime Type by Status', 'value': 'crime_type_status'},
+                                {'label': 'Crime Type by Priority', 'value': 'crime_type_priority'},
+                                {'label': 'Monthly Cases by Crime Type', 'value': 'month_crime_type'},
                                 {'label': 'Custom Report', 'value': 'custom'}
                             ],
                             value='monthly'
@@ -443,7 +774,11 @@ def get_reports_page():
                             end_date_placeholder_text="End Date"
                         ),
                         dbc.Button("Generate Report", id='generate-report-button', 
-                                 color='primary', className='mt-3 w-100')
+                                 color='primary', className='mt-3 w-100'),
+                        dbc.Button("Cancel", id='cancel-report-button', color='secondary',
+                                 outline=True, className='mt-2 w-100', disabled=True),
+                        dbc.Progress(id='report-progress', value=0, className='mt-3',
+                                   style={'visibility': 'hidden'})
                     ])
                 ])
             ], width=4),
@@ -452,7 +787,16 @@ def get_reports_page():
                 dbc.Card([
                     dbc.CardHeader("Report Output"),
                     dbc.CardBody([
-                        html.Div(id='report-output')
+                        html.Div(id='report-output'),
+                        # Every report's first column is its row label, 'Total' on total rows
+                        html.Div(
+                            data_table('report-table', style_data_conditional=[
+                                {'if': {'column_id': 'Total'}, 'fontWeight': 'bold'},
+                                {'if': {'filter_query': '{label} = "Total"'}, 'fontWeight': 'bold'}
+                            ]),
+                            id='report-table-container',
+                            style={'display': 'none'}
+                        )
                     ])
                 ])
             ], width=8)
@@ -467,6 +811,37 @@ def get_reports_page():
                     ])
                 ])
             ])
+        ], className="mb-4"),
+        
+        # Open cases past or near their SLA deadline, read off the (status, due_at) index
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        "SLA Report: Overdue and Due Soon",
+                        dbc.Select(
+                            id='sla-report-window',
+                            options=[
+                                {'label': 'Overdue only', 'value': '0'},
+                                {'label': 'Due within 24 hours', 'value': '24'},
+                                {'label': 'Due within 3 days', 'value': '72'},
+                                {'label': 'Due within 7 days', 'value': '168'}
+                            ],
+                            value='24',
+                            size='sm',
+                            className='float-end w-auto'
+                        )
+                    ]),
+                    dbc.CardBody([
+                        html.Div(id='sla-report-summary'),
+                        data_table('sla-report-table', [
+                            ('Case ID', 'case_id'), ('Title', 'title'), ('Crime Type', 'crime_type'),
+                            ('Priority', 'priority'), ('Status', 'status'), ('Due (UTC)', 'due_at'),
+                            ('Hours Overdue', 'hours_overdue')
+                        ], page_size=15, sort_action='native', style_data_conditional=SLA_ROW_STYLES)
+                    ])
+                ])
+            ])
         ])
     ])
 
@@ -507,13 +882,253 @@ def get_users_page():
                 dbc.Card([
                     dbc.CardHeader("All Users"),
                     dbc.CardBody([
-                        html.Div(id='users-table')
+                        data_table('users-table', [
+                            ('id', 'id'), ('username', 'username'), ('full_name', 'full_name'), ('role', 'role'),
+                            ('created_at', 'created_at'), ('last_login', 'last_login')
+                        ], page_size=10)
                     ])
                 ])
             ], width=8)
         ])
     ])
 
+# User analytics page: workload and login patterns from the activity counters
+def get_analytics_page():
+    return html.Div([
+        html.H2("User Analytics", className="mb-4"),
+        dbc.Card([
+            dbc.CardBody([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Label("Period"),
+                        html.Br(),
+                        dcc.DatePickerRange(
+                            id='analytics-date-range',
+                            start_date=None,
+                            end_date=None,
+                            start_date_placeholder_text="A year ago",
+                            end_date_placeholder_text="Today"
+                        )
+                    ], width=5),
+                    dbc.Col([
+                        dbc.Label("User"),
+                        dbc.Select(id='analytics-user', options=[{'label': 'All Users', 'value': 'all'}], value='all')
+                    ], width=3),
+                    dbc.Col([
+                        dbc.Label("Source"),
+                        dbc.RadioItems(
+                            id='analytics-source',
+                            options=[
+                                {'label': 'Hourly counters', 'value': 'counters'},
+                                {'label': 'Raw log (exact)', 'value': 'raw'}
+                            ],
+                            value='counters',
+                            inline=True
+                        )
+                    ], width=4)
+                ])
+            ])
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Logins per Day"),
+                    dbc.CardBody([
+                        dcc.Graph(id='analytics-logins-chart')
+                    ])
+                ])
+            ], width=6),
+            
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Cases Created per User"),
+                    dbc.CardBody([
+                        dcc.Graph(id='analytics-cases-chart')
+                    ])
+                ])
+            ], width=6)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Activity by Weekday and Hour (UTC)"),
+                    dbc.CardBody([
+                        dcc.Graph(id='analytics-hourly-heatmap')
+                    ])
+                ])
+            ])
+        ])
+    ])
+
+# Activity log page (admin only); pages through the log with a keyset cursor
+def get_activity_page():
+    return html.Div([
+        html.H2("Activity Log", className="mb-4"),
+        
+        # id of the oldest row shown, where the next "Older" page starts
+        dcc.Store(id='activity-cursor'),
+        
+        dbc.Card([
+            dbc.CardBody([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Input(id='activity-username', type='text', placeholder='Filter by username')
+                    ], width=4),
+                    dbc.Col([
+                        dbc.Button("Newest", id='activity-newest-button', color='primary', className='me-2'),
+                        dbc.Button("Older", id='activity-older-button', color='secondary', outline=True)
+                    ], width=8)
+                ], className="mb-3"),
+                
+                html.Div(id='activity-alert'),
+                
+                data_table('activity-table', [
+                    ('Time (UTC)', 'timestamp'), ('User', 'username'), ('Action', 'action'), ('Details', 'details')
+                ], style_data_conditional=[])
+            ])
+        ], className="mb-4"),
+        
+        dbc.Card([
+            dbc.CardHeader("Summarized History (months past retention)"),
+            dbc.CardBody([
+                html.Div(id='activity-rollup-table')
+            ])
+        ])
+    ])
+
+# Alerts page: the user's standing searches and the notifications they raised
+def get_alerts_page():
+    def select(select_id, placeholder, values):
+        return dbc.Select(id=select_id, placeholder=placeholder,
+                          options=[{'label': 'Any', 'value': ''}] + [{'label': value, 'value': value} for value in values])
+    
+    return html.Div([
+        html.H2("Alerts", className="mb-4"),
+        dbc.Card([
+            dbc.CardHeader([
+                "Notifications",
+                dbc.Button("Mark all read", id='notifications-read-button', color='secondary', outline=True,
+                           size='sm', className='float-end')
+            ]),
+            dbc.CardBody([
+                html.Div(id='notifications-summary'),
+                data_table('notifications-table', [
+                    ('Time (UTC)', 'created_at'), ('Rule', 'rule_name'), ('Case ID', 'case_id'),
+                    ('Event', 'action'), ('Case', 'message')
+                ], page_size=15, style_data_conditional=[{'if': {'filter_query': '{read} = 0'}, 'fontWeight': 'bold'}])
+            ])
+        ], className="mb-4"),
+        
+        dbc.Card([
+            dbc.CardHeader("New Alert Rule"),
+            dbc.CardBody([
+                html.Div(id='alert-rule-alert'),
+                dbc.Row([
+                    dbc.Col([dbc.Label("Rule Name"), dbc.Input(id='alert-rule-name', type='text',
+                                                               placeholder='e.g. Critical ransomware')], width=4),
+                    dbc.Col([dbc.Label("Crime Type"), select('alert-rule-crime-type', 'Any', [
+                        'Hacking', 'Phishing', 'Identity Theft', 'Online Fraud', 'Malware',
+                        'Ransomware', 'Cyberstalking', 'Data Breach', 'Other'
+                    ])], width=4),
+                    dbc.Col([dbc.Label("Priority"), select('alert-rule-priority', 'Any',
+                                                           ['Low', 'Medium', 'High', 'Critical'])], width=4)
+                ], className="mb-3"),
+                dbc.Row([
+                    dbc.Col([dbc.Label("Status"), select('alert-rule-status', 'Any',
+                                                         ['Pending', 'Under Investigation', 'Resolved', 'Closed'])], width=4),
+                    dbc.Col([dbc.Label("Mentions"), dbc.Select(id='alert-rule-entity-kind', value='name', options=[
+                        {'label': 'Suspect or victim name', 'value': 'name'},
+                        {'label': 'Email address', 'value': 'email'},
+                        {'label': 'Phone number', 'value': 'phone'},
+                        {'label': 'Location', 'value': 'location'}
+                    ])], width=4),
+                    dbc.Col([dbc.Label("Name, email, phone or place"),
+                             dbc.Input(id='alert-rule-entity-value', type='text', placeholder='Optional')], width=4)
+                ], className="mb-3"),
+                dbc.Button("Save Rule", id='alert-rule-save', color='primary')
+            ])
+        ], className="mb-4"),
+        
+        dbc.Card([
+            dbc.CardHeader([
+                "My Rules",
+                dbc.Button("Delete selected", id='alert-rules-delete', color='danger', outline=True,
+                           size='sm', className='float-end')
+            ]),
+            dbc.CardBody([
+                data_table('alert-rules-table', [
+                    ('Name', 'name'), ('Crime Type', 'crime_type'), ('Priority', 'priority'), ('Status', 'status'),
+                    ('Mentions', 'entity_kind'), ('Value', 'entity_value'), ('Created', 'created_at')
+                ], row_selectable='multi', selected_rows=[])
+            ])
+        ])
+    ])
+
+# What each page keeps current: the change feed topics its components follow,
+# and how often (seconds) it re-checks versions in case a pushed change was
+# missed. The version stores live inside the page, so components of pages not
+# being shown have nothing to trigger their callbacks and never query the DB.
+PAGE_REFRESH = {
+    '/dashboard': {'interval': 60, 'topics': ('cases', 'users')},
+    '/reports': {'interval': 300, 'topics': ('cases',)},
+    '/users': {'interval': 300, 'topics': ('users',)},
+    '/analytics': {'interval': 300, 'topics': ('users',)},
+    '/alerts': {'interval': 60, 'topics': ('cases',)}
+}
+
+def page_refresh_components(route):
+    """Refresh timer and per-topic version stores of a page; pages without data never poll
+    
+    Store ids carry the page, so a version change only reaches callbacks of
+    components on that page.
+    """
+    refresh = PAGE_REFRESH.get(route, {'interval': None, 'topics': ()})
+    return [
+        dcc.Interval(id='page-refresh', interval=(refresh['interval'] or 3600) * 1000,
+                     disabled=not refresh['interval']),
+        *[dcc.Store(id={'type': 'page-version', 'page': route.strip('/'), 'topic': topic})
+          for topic in refresh['topics']]
+    ]
+
+# Layout cache: every page is a static component tree whose data is filled in
+# by callbacks, so each page is built once and reused on every navigation
+PAGE_CACHE = {
+    route: html.Div(page_refresh_components(route) + [build()])
+    for route, build in (
+        ('/dashboard', get_dashboard_page),
+        ('/cases', get_cases_page),
+        ('/new-case', get_new_case_page),
+        ('/search', get_search_page),
+        ('/linked', get_linked_cases_page),
+        ('/case', get_case_detail_page),
+        ('/reports', get_reports_page),
+        ('/users', get_users_page),
+        ('/analytics', get_analytics_page),
+        ('/activity', get_activity_page),
+        ('/alerts', get_alerts_page)
+    )
+}
+
+# Sidebar link id -> route, used for the clientside active-link state
+NAV_ROUTES = {
+    'nav-dashboard': '/dashboard',
+    'nav-cases': '/cases',
+    'nav-new-case': '/new-case',
+    'nav-search': '/search',
+    'nav-linked': '/linked',
+    'nav-reports': '/reports',
+    'nav-users': '/users',
+    'nav-analytics': '/analytics',
+    'nav-activity': '/activity',
+    'nav-alerts': '/alerts'
+}
+
+# Tables listing cases by case_id; clicking a row opens /case/<case_id>
+CASE_TABLES = ('recent-cases-table', 'cases-list-table', 'search-results-table', 'linked-cases-table',
+               'notifications-table', 'sla-cases-table', 'sla-report-table')
+
 # App layout
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -521,16 +1136,16 @@ app.layout = html.Div([
     dcc.Store(id='session-store', storage_type='session')
 ])
 
-# Import callbacks module
+# Import callbacks and routes modules
 from callbacks import register_callbacks
+from routes import register_routes
 
 # Core authentication and navigation callbacks
 @app.callback(
     Output('page-layout', 'children'),
-    [Input('url', 'pathname'),
-     Input('session-store', 'data')]
+    Input('session-store', 'data')
 )
-def display_page(pathname, session_data):
+def display_page(session_data):
     if session_data and session_data.get('logged_in'):
         username = session_data.get('username', 'Guest')
         return get_dashboard_layout(username)
@@ -548,44 +1163,57 @@ def login(n_clicks, username, password):
     if n_clicks and username and password:
         user = auth_manager.authenticate(username, password)
         if user:
+            session['user'] = {'username': user['username'], 'role': user['role']}
             return {'logged_in': True, 'username': user['username'], 'role': user['role']}, None
         return None, dbc.Alert("Invalid credentials", color="danger", duration=3000)
     return None, None
 
 @app.callback(
     Output('page-content', 'children'),
-    [Input('nav-dashboard', 'n_clicks'),
-     Input('nav-cases', 'n_clicks'),
-     Input('nav-new-case', 'n_clicks'),
-     Input('nav-search', 'n_clicks'),
-     Input('nav-reports', 'n_clicks'),
-     Input('nav-users', 'n_clicks')],
-    prevent_initial_call=True
+    Input('url', 'pathname')
 )
-def navigate(dash_clicks, cases_clicks, new_clicks, search_clicks, reports_clicks, users_clicks):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return get_dashboard_page()
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    if button_id == 'nav-dashboard':
-        return get_dashboard_page()
-    elif button_id == 'nav-cases':
-        return get_cases_page()
-    elif button_id == 'nav-new-case':
-        return get_new_case_page()
-    elif button_id == 'nav-search':
-        return get_search_page()
-    elif button_id == 'nav-reports':
-        return get_reports_page()
-    elif button_id == 'nav-users':
-        return get_users_page()
-    
-    return get_dashboard_page()
+def navigate(pathname):
+    # Served straight from the layout cache; unknown paths fall back to the dashboard
+    if pathname and pathname.startswith('/case/'):
+        return PAGE_CACHE['/case']
+    return PAGE_CACHE.get(pathname, PAGE_CACHE['/dashboard'])
+
+# Highlight the sidebar link for the current route without a server round-trip
+app.clientside_callback(
+    """
+    function(pathname) {
+        const routes = %s;
+        const current = routes.includes(pathname) ? pathname
+            : pathname && pathname.startsWith('/case/') ? '/cases' : '/dashboard';
+        return routes.map(route => route === current);
+    }
+    """ % json.dumps(list(NAV_ROUTES.values())),
+    [Output(nav_id, 'active') for nav_id in NAV_ROUTES],
+    Input('url', 'pathname')
+)
+
+# Open the case of a clicked row, from the row as it is shown after sorting,
+# filtering and paging, without a server round-trip
+for table_id in CASE_TABLES:
+    app.clientside_callback(
+        """
+        function(cell, rows) {
+            if (!cell || !rows || !rows[cell.row]) {
+                return window.dash_clientside.no_update;
+            }
+            return '/case/' + encodeURIComponent(rows[cell.row].case_id);
+        }
+        """,
+        Output('url', 'pathname', allow_duplicate=True),
+        Input(table_id, 'active_cell'),
+        State(table_id, 'derived_viewport_data'),
+        prevent_initial_call=True
+    )
 
-# Register all other callbacks
-register_callbacks(app, db)
+# Register all other callbacks and server routes
+register_callbacks(app, db, change_feed, similarity_index, entity_index, case_snapshot, case_cache,
+                   alert_rules)
+register_routes(server, db, change_feed, evidence_store, callback_metrics, case_cache)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8050)
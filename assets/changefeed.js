@@ -0,0 +1,27 @@
+// Listens to the server's change feed (/events) and forwards each change to
+// the 'change-feed' store, which wakes the check_data_versions callback.
+(function () {
+    var seen = {};
+
+    function applyChange(event) {
+        var change = JSON.parse(event.data);
+        if (seen[change.topic] === change.version) {
+            return;
+        }
+        seen[change.topic] = change.version;
+
+        if (!window.dash_clientside || !window.dash_clientside.set_props) {
+            return;
+        }
+        try {
+            window.dash_clientside.set_props('change-feed', {data: change});
+        } catch (err) {
+            // The store only exists once logged in; the page loads fresh data then anyway
+        }
+    }
+
+    if (window.EventSource) {
+        var source = new EventSource('/events');
+        source.addEventListener('change', applyChange);
+    }
+})();
@@ -1,5 +1,9 @@
 import hashlib
+import hmac
+from dataclasses import asdict
 from datetime import datetime
+from functools import wraps
+from flask import abort, current_app, request, session
 
 class AuthManager:
     def __init__(self, database):
@@ -11,27 +15,16 @@ class AuthManager:
     
     def authenticate(self, username, password):
         """Authenticate a user"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
         # For demo purposes, we're not hashing passwords
         # In production, you should use proper password hashing
-        cursor.execute('''
-            SELECT id, username, full_name, role 
-            FROM users 
-            WHERE username = ? AND password = ? AND is_active = 1
-        ''', (username, password))
-        
-        user = cursor.fetchone()
+        user = self.db.get_user_by_credentials(username, password)
         
         if user:
             # Update last login
             self.db.update_last_login(username)
             self.db.log_activity(username, 'LOGIN', 'User logged in')
-            conn.close()
-            return dict(user)
+            return asdict(user)
         
-        conn.close()
         return None
     
     def check_permission(self, role, action):
@@ -44,3 +37,38 @@ class AuthManager:
         }
         
         return action in permissions.get(role, [])
+
+def current_user():
+    """User logged in on this browser, from the signed session cookie set at login, or None"""
+    return session.get('user')
+
+def login_required(view):
+    """Route decorator answering 401 unless a user is logged in"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user():
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_role(role):
+    """Abort with 401 unless a user is logged in, and 403 unless the user has role"""
+    user = current_user()
+    if not user:
+        abort(401)
+    if user['role'] != role:
+        abort(403)
+
+def api_token_required(config_key):
+    """Route decorator answering 401 unless the request carries 'Authorization: Bearer <token>'
+    with the token set in the server config under config_key; with none set, every request is refused"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            expected = current_app.config.get(config_key)
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if not expected or scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), expected.encode()):
+                abort(401)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,1145 @@
+"""Benchmarks and load tests for the Cybercrime Management System
+
+Usage:
+    python benchmark.py idle-tabs [--tabs 200] [--seconds 30]
+    python benchmark.py projection [--cases 100000] [--blob-kb 4]
+    python benchmark.py similarity [--cases 100000] [--queries 200]
+    python benchmark.py linked [--cases 1000000] [--queries 200]
+    python benchmark.py activity [--rows 5000000] [--months 24]
+    python benchmark.py analytics [--rows 2000000] [--users 200]
+    python benchmark.py snapshot [--cases 3000000] [--updates 1000]
+    python benchmark.py changes [--cases 1000000] [--updates 200]
+    python benchmark.py payload [--cases 5000]
+    python benchmark.py pages
+    python benchmark.py statements [--cases 100000] [--calls 5000] [--gevent] [--greenlets 50]
+    python benchmark.py listing [--sizes 10000,40000,160000]
+    python benchmark.py dates [--cases 500000] [--queries 20]
+    python benchmark.py shards [--cases 500000] [--queries 20]
+    python benchmark.py case-cache [--cases 200000] [--views 20000] [--update-every 50]
+    python benchmark.py alerts [--rules 10000] [--cases 2000]
+    python benchmark.py sla [--cases 1000000] [--repeat 5]
+
+Every benchmark runs against a throwaway database, never /tmp/cybercrime.db.
+"""
+import argparse
+import http.client
+import importlib
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+SAMPLE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cybercrime.db')
+
+CRIME_TYPES = ['Hacking', 'Phishing', 'Identity Theft', 'Online Fraud', 'Malware',
+               'Ransomware', 'Cyberstalking', 'Data Breach', 'Other']
+STATUSES = ['Pending', 'Under Investigation', 'Resolved', 'Closed']
+PRIORITIES = ['Low', 'Medium', 'High', 'Critical']
+LOCATIONS = ['Lagos', 'Abuja', 'Kano', 'Ibadan', 'Port Harcourt', 'Enugu', 'Jos', 'Benin City']
+NAMES = ['Adebayo Okafor', 'Fatima Bello', 'Chinedu Eze', 'Grace Okoli', 'Musa Ibrahim',
+         'Ngozi Adeyemi', 'Tunde Balogun', 'Aisha Yusuf', 'Emeka Nwosu', 'Zainab Sani']
+WORDS = ('account transfer victim reported suspicious email link password bank card '
+         'wallet bitcoin ransom server breach login credentials invoice refund loan '
+         'whatsapp instagram scam funds recovered device malware screenshot').split()
+
+def build_synthetic_db(path, cases, blob_kb=4, years=(2019, 2025), seed=42, pool=64, words=WORDS,
+                       names=NAMES):
+    """Create a database with many realistic cases and multi-kilobyte free text"""
+    from database import Database
+    
+    rng = random.Random(seed)
+    db = Database(path)
+    
+    # A pool of paragraphs keeps generation fast while rows still differ
+    paragraphs = [' '.join(rng.choices(words, k=blob_kb * 180)) for _ in range(pool)]
+    first, last = years
+    
+    def rows():
+        for i in range(cases):
+            year = first + i * (last - first + 1) // cases
+            day = rng.randint(1, 365)
+            created = f"{year}-{(day - 1) // 31 + 1:02d}-{(day - 1) % 28 + 1:02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+            yield (
+                f"CYB-{year}-{i + 1:06d}",
+                f"{rng.choice(CRIME_TYPES)} report {i}",
+                rng.choice(CRIME_TYPES),
+                created[:10],
+                rng.choice(LOCATIONS),
+                rng.choice(names),
+                f"080{rng.randint(10000000, 99999999)}",
+                rng.choice(names) if rng.randrange(3) else '',
+                paragraphs[rng.randrange(pool)][:blob_kb * 256],
+                paragraphs[rng.randrange(pool)],
+                paragraphs[rng.randrange(pool)][:blob_kb * 512],
+                rng.choice(PRIORITIES),
+                rng.choice(STATUSES),
+                'benchmark',
+                created,
+                created
+            )
+    
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO cases (
+            case_id, title, crime_type, incident_date, location,
+            victim_name, victim_contact, suspect_name, suspect_details,
+            description, evidence, priority, status, created_by, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    conn.close()
+    return db
+
+def measure(func, repeat=3):
+    """Best wall time in ms over repeat runs, plus the tracemalloc peak in MB of one run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    del result
+    
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak / 1024 / 1024
+
+class QueryCounter:
+    """Counts every SQL statement run through a Database's connections"""
+    
+    def __init__(self, db):
+        self.count = 0
+        self._lock = threading.Lock()
+        connect = db.get_connection
+        
+        def counted_connection(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(self._record)
+            return conn
+        
+        db.get_connection = counted_connection
+    
+    def _record(self, statement):
+        with self._lock:
+            self.count += 1
+    
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+def load_app(db_path=None):
+    """Import the Dash app against a temporary copy of the sample database"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+        shutil.copy(SAMPLE_DB, db_path)
+    os.environ['CYBERCRIME_DB'] = db_path
+    os.environ.setdefault('CYBERCRIME_SECRET_KEY', os.urandom(32).hex())
+    return importlib.import_module('app')
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+def start_server(server):
+    """Serve a Flask app on a free local port in a background thread"""
+    http_server = make_server('127.0.0.1', 0, server, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    return http_server, http_server.server_port
+
+class IdleTab:
+    """A browser tab that keeps the /events stream open and does nothing else"""
+    
+    def __init__(self, port):
+        self.port = port
+        self.connected = threading.Event()
+        self.change_times = {}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        conn.request('GET', '/events')
+        response = conn.getresponse()
+        while True:
+            line = response.fp.readline()
+            if not line:
+                return
+            line = line.decode().strip()
+            if line.startswith('data:'):
+                topic = json.loads(line[len('data:'):])['topic']
+                self.change_times.setdefault(topic, []).append(time.perf_counter())
+                if len(self.change_times) == 2:
+                    self.connected.set()
+
+def bench_idle_tabs(args):
+    """Open many idle dashboard tabs and measure DB load and push latency"""
+    app = load_app()
+    counter = QueryCounter(app.db)
+    http_server, port = start_server(app.server)
+    
+    print(f"Opening {args.tabs} idle tabs against /events ...")
+    tabs = [IdleTab(port) for _ in range(args.tabs)]
+    for tab in tabs:
+        tab.connected.wait(10)
+    connected = sum(tab.connected.is_set() for tab in tabs)
+    
+    counter.reset()
+    time.sleep(args.seconds)
+    idle_queries = counter.count
+    
+    # Data callbacks that used to poll every 60s: stats, 2 charts, recent cases, trend, users
+    polled_callbacks = 6
+    legacy_queries = args.tabs * polled_callbacks * args.seconds / 60
+    
+    # One write should reach every tab
+    seen_before = [len(tab.change_times.get('cases', [])) for tab in tabs]
+    started = time.perf_counter()
+    app.db.add_case({'title': 'Benchmark case', 'crime_type': 'Phishing',
+                     'incident_date': '2025-01-01', 'created_by': 'benchmark'})
+    deadline = time.time() + 10
+    while time.time() < deadline and any(
+            len(tab.change_times.get('cases', [])) <= seen for tab, seen in zip(tabs, seen_before)):
+        time.sleep(0.01)
+    latencies = [(tab.change_times['cases'][seen] - started) * 1000
+                 for tab, seen in zip(tabs, seen_before) if len(tab.change_times['cases']) > seen]
+    
+    print(f"Connected tabs:               {connected}/{args.tabs}")
+    print(f"Idle window:                  {args.seconds}s")
+    print(f"DB statements while idle:     {idle_queries}")
+    print(f"Polling design (estimate):    >= {legacy_queries:.0f} callback runs hitting the DB")
+    print(f"Tabs notified of one write:   {len(latencies)}/{args.tabs}")
+    if latencies:
+        print(f"Push latency p50 / max:       {statistics.median(latencies):.1f} ms / {max(latencies):.1f} ms")
+    
+    http_server.shutdown()
+
+def bench_projection(args):
+    """Compare SELECT * listings against column-projected listings"""
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases with ~{args.blob_kb} KB descriptions ...")
+    db = build_synthetic_db(path, args.cases, args.blob_kb)
+    print(f"Database size: {os.path.getsize(path) / 1024 / 1024:.0f} MB")
+    
+    # The columns each listing callback renders
+    listings = {
+        'get_all_cases': (db.get_all_cases, ['case_id', 'title', 'crime_type', 'incident_date',
+                                             'location', 'status', 'priority', 'created_at']),
+        'search_cases': (lambda columns=None: db.search_cases('report', columns=columns),
+                         ['case_id', 'title', 'crime_type', 'incident_date',
+                          'victim_name', 'status', 'priority']),
+        'get_recent_cases': (lambda columns=None: db.get_recent_cases(10, columns=columns),
+                             ['case_id', 'title', 'crime_type', 'status', 'priority', 'created_at'])
+    }
+    
+    print(f"{'method':<18} {'mode':<10} {'time ms':>9} {'peak MB':>9} {'frame MB':>9}")
+    for name, (method, columns) in listings.items():
+        for mode, kwargs in (('SELECT *', {}), ('projected', {'columns': columns})):
+            elapsed, peak = measure(lambda: method(**kwargs))
+            frame_mb = method(**kwargs).memory_usage(deep=True).sum() / 1024 / 1024
+            print(f"{name:<18} {mode:<10} {elapsed:>9.1f} {peak:>9.1f} {frame_mb:>9.1f}")
+
+def bench_similarity(args):
+    """Index a large backlog and time duplicate lookups for new cases"""
+    from similarity import SimilarityIndex
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    # Distinct text per case from a wide vocabulary of names, handles and account
+    # numbers, otherwise the whole backlog is one duplicate cluster
+    rng = random.Random(7)
+    syllables = ['ba', 'ko', 'ne', 'di', 'ru', 'sa', 'te', 'mi', 'lo', 'chi', 'yu', 'fe', 'wa', 'zo']
+    vocabulary = WORDS + [''.join(rng.choices(syllables, k=3)) + str(rng.randint(0, 99)) for _ in range(20000)]
+    db = build_synthetic_db(path, args.cases, blob_kb=1, pool=args.cases, words=vocabulary)
+    index = SimilarityIndex(db)
+    
+    started = time.perf_counter()
+    index.rebuild()
+    print(f"Index build:                  {time.perf_counter() - started:.1f} s")
+    
+    # Lookups for near-copies of existing cases, as a re-reported incident would be
+    conn = db.get_connection()
+    probes = [dict(row) for row in conn.execute(
+        'SELECT * FROM cases WHERE id IN (SELECT id FROM cases ORDER BY random() LIMIT ?)', (args.queries,))]
+    conn.close()
+    for probe in probes:
+        probe['description'] = f"{probe['description']} {' '.join(rng.choices(WORDS, k=5))}"
+    
+    latencies = []
+    found = 0
+    for probe in probes:
+        started = time.perf_counter()
+        matches = index.find_similar(probe)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += any(match['case_id'] == probe['case_id'] for match in matches)
+    
+    latencies.sort()
+    print(f"Lookups:                      {len(latencies)}")
+    print(f"Original case found:          {found}/{len(probes)}")
+    print(f"Latency p50 / p95 / max:      {statistics.median(latencies):.1f} / "
+          f"{latencies[int(len(latencies) * 0.95) - 1]:.1f} / {latencies[-1]:.1f} ms")
+
+def bench_linked(args):
+    """Time two-hop linked case expansion on a large backlog"""
+    from entities import EntityIndex
+    
+    # Enough distinct people that each name recurs in a handful of cases
+    rng = random.Random(11)
+    syllables = ['ba', 'ko', 'ne', 'di', 'ru', 'sa', 'te', 'mi', 'lo', 'chi', 'yu', 'fe', 'wa', 'zo']
+    names = [f"{''.join(rng.choices(syllables, k=3)).title()} {''.join(rng.choices(syllables, k=4)).title()}"
+             for _ in range(args.cases // 5)]
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    db = build_synthetic_db(path, args.cases, blob_kb=1, names=names)
+    index = EntityIndex(db)
+    
+    started = time.perf_counter()
+    index.rebuild()
+    print(f"Index build:                  {time.perf_counter() - started:.1f} s")
+    
+    conn = db.get_connection()
+    case_ids = [row['case_id'] for row in conn.execute(
+        'SELECT case_id FROM cases WHERE id IN (SELECT id FROM cases ORDER BY random() LIMIT ?)', (args.queries,))]
+    conn.close()
+    
+    latencies = []
+    sizes = []
+    for case_id in case_ids:
+        started = time.perf_counter()
+        reached, skipped = index.linked_cases(case_id, hops=2)
+        latencies.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(reached) - 1)
+    
+    latencies.sort()
+    print(f"Expansions:                   {len(latencies)}")
+    print(f"Linked cases p50 / max:       {statistics.median(sizes):.0f} / {max(sizes)}")
+    print(f"Latency p50 / p95 / max:      {statistics.median(latencies):.1f} / "
+          f"{latencies[int(len(latencies) * 0.95) - 1]:.1f} / {latencies[-1]:.1f} ms")
+
+def bench_activity(args):
+    """Insert and page latency of the partitioned activity log as it grows"""
+    from database import Database
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    db = Database(path)
+    rng = random.Random(5)
+    users = [f"user{i}" for i in range(500)]
+    actions = ['LOGIN', 'LOGOUT', 'CREATE_CASE', 'ADD_EVIDENCE']
+    now = time.gmtime()
+    current = now.tm_year * 12 + now.tm_mon - 1
+    
+    def fill(rows):
+        # Spread rows evenly over the last args.months months, oldest first
+        conn = db.get_connection()
+        per_month = rows // args.months
+        for month_index in range(current - args.months + 1, current + 1):
+            table = db._ensure_activity_partition(conn, month_index)
+            stamp = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}-15 12:00:00"
+            conn.executemany(f'INSERT INTO {table} (username, action, details, timestamp) VALUES (?, ?, ?, ?)', (
+                (rng.choice(users), rng.choice(actions), 'benchmark', stamp) for _ in range(per_month)
+            ))
+            conn.commit()
+        conn.close()
+    
+    def timed(func, repeat):
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return statistics.median(latencies)
+    
+    print(f"{'rows':>12} {'insert ms':>10} {'newest ms':>10} {'deep ms':>10} {'user ms':>10}")
+    total = 0
+    for target in (args.rows // 100, args.rows // 10, args.rows):
+        fill(target - total)
+        total = target
+        
+        # A cursor in the oldest month: the page has to skip every newer partition
+        conn = db.get_connection()
+        oldest = db._activity_partition_tables(conn)[-1]
+        deep_cursor = conn.execute(f'SELECT MAX(id) FROM {oldest}').fetchone()[0]
+        conn.close()
+        
+        insert = timed(lambda: db.log_activity(rng.choice(users), 'LOGIN', 'benchmark'), 500)
+        newest = timed(lambda: db.get_activity_log(limit=50), 50)
+        deep = timed(lambda: db.get_activity_log(limit=50, before_id=deep_cursor), 50)
+        user = timed(lambda: db.get_activity_log(username=rng.choice(users), limit=50), 50)
+        print(f"{total:>12} {insert:>10.2f} {newest:>10.2f} {deep:>10.2f} {user:>10.2f}")
+
+def bench_analytics(args):
+    """Time the user analytics summary for a year of activity, counters versus raw log"""
+    import analytics
+    from database import Database
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    db = Database(path)
+    rng = random.Random(9)
+    users = [f"investigator{i}" for i in range(args.users)]
+    conn = db.get_connection()
+    conn.executemany('INSERT INTO users (username, password, full_name, role) VALUES (?, ?, ?, ?)',
+                     [(user, 'x', f"Investigator {i}", 'Investigator') for i, user in enumerate(users)])
+    
+    # A year of activity, mostly in working hours, written month by month
+    print(f"Writing {args.rows} activity rows for {args.users} users ...")
+    start = time.time() - 365 * 86400
+    stamps = sorted(start + rng.random() * 365 * 86400 for _ in range(args.rows))
+    rows = []
+    for stamp in stamps:
+        moment = time.gmtime(stamp)
+        hour = min(23, max(0, int(rng.gauss(12, 3))))
+        rows.append((moment.tm_year * 12 + moment.tm_mon - 1, rng.choice(users),
+                     rng.choices(['LOGIN', 'LOGOUT', 'CREATE_CASE', 'ADD_EVIDENCE'], [4, 4, 1, 1])[0],
+                     time.strftime(f'%Y-%m-%d {hour:02d}:%M:%S', moment)))
+    for month_index in sorted({row[0] for row in rows}):
+        table = db._ensure_activity_partition(conn, month_index)
+        conn.executemany(f'INSERT INTO {table} (username, action, details, timestamp) VALUES (?, ?, ?, ?)',
+                         [(user, action, 'benchmark', stamp) for index, user, action, stamp in rows if index == month_index])
+    conn.commit()
+    db.rebuild_activity_counters(conn)
+    conn.close()
+    
+    end_date = time.strftime('%Y-%m-%d')
+    start_date = time.strftime('%Y-%m-%d', time.gmtime(start))
+    print(f"{'path':<10} {'scope':<10} {'time ms':>9}")
+    for name, summarize in (('counters', analytics.counter_summary), ('raw log', analytics.raw_log_summary)):
+        for scope, username in (('all users', None), ('one user', users[0])):
+            elapsed, _ = measure(lambda: summarize(db, start_date, end_date, username))
+            print(f"{name:<10} {scope:<10} {elapsed:>9.1f}")
+
+def bench_snapshot(args):
+    """Report aggregations on the Parquet snapshot versus SQL on the live database"""
+    import pandas as pd
+    import snapshot
+    
+    workdir = tempfile.mkdtemp(prefix='cybercrime-bench-')
+    print(f"Building {args.cases} cases ...")
+    db = build_synthetic_db(os.path.join(workdir, 'cybercrime.db'), args.cases, blob_kb=0)
+    case_snapshot = snapshot.CaseSnapshot(db, os.path.join(workdir, 'snapshot'))
+    
+    started = time.perf_counter()
+    case_snapshot.rebuild()
+    print(f"Full snapshot build:          {time.perf_counter() - started:.1f} s")
+    
+    started = time.perf_counter()
+    case_snapshot.frame()
+    print(f"Snapshot load (cold):         {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    # Edits since the last refresh, through the normal write path
+    conn = db.get_connection()
+    case_ids = [row['case_id'] for row in conn.execute(
+        'SELECT case_id FROM cases ORDER BY random() LIMIT ?', (args.updates,))]
+    conn.close()
+    db.bulk_update_status(case_ids, 'Resolved', 'benchmark')
+    started = time.perf_counter()
+    refreshed = case_snapshot.refresh()
+    print(f"Incremental refresh:          {refreshed} row(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    started = time.perf_counter()
+    cases = case_snapshot.frame()
+    print(f"Delta applied to loaded copy: {(time.perf_counter() - started) * 1000:.0f} ms")
+    resolved = int((cases['status'] == 'Resolved').sum())
+    by_status = db.get_cases_by_status()
+    expected = int(by_status.loc[by_status['status'] == 'Resolved', 'count'].sum())
+    print(f"Resolved cases:               {resolved} in snapshot, {expected} in SQLite")
+    
+    def sql(query):
+        conn = db.get_connection()
+        df = pd.read_sql_query(query, conn)
+        conn.close()
+        return df
+    
+    reports = [
+        ('trend (all time)', lambda: snapshot.trend(cases), lambda: db.get_trend_data()),
+        ('by crime type', lambda: snapshot.counts_by(cases, 'crime_type'), lambda: db.get_cases_by_type()),
+        ('by status', lambda: snapshot.counts_by(cases, 'status'), lambda: db.get_cases_by_status()),
+        ('type x status', lambda: snapshot.crosstab(cases, 'crime_type', 'status'),
+         lambda: sql('SELECT crime_type, status, COUNT(*) FROM cases GROUP BY crime_type, status')),
+        ('month x type', lambda: snapshot.crosstab(cases, 'month', 'crime_type'),
+         lambda: sql("SELECT strftime('%Y-%m', created_at), crime_type, COUNT(*) FROM cases GROUP BY 1, 2"))
+    ]
+    print(f"{'report':<18} {'snapshot ms':>12} {'sqlite ms':>10}")
+    for name, on_snapshot, on_sqlite in reports:
+        print(f"{name:<18} {measure(on_snapshot, 3)[0]:>12.0f} {measure(on_sqlite, 1)[0]:>10.0f}")
+
+def bench_changes(args):
+    """Cost of a sync poll with get_changes_since versus re-reading every case"""
+    workdir = tempfile.mkdtemp(prefix='cybercrime-bench-')
+    print(f"Building {args.cases} cases ...")
+    db = build_synthetic_db(os.path.join(workdir, 'cybercrime.db'), args.cases, blob_kb=1)
+    cursor = db.get_changes_since(args.cases - 1, 1)['cursor']
+    
+    conn = db.get_connection()
+    case_ids = [row['case_id'] for row in conn.execute(
+        'SELECT case_id FROM cases ORDER BY random() LIMIT ?', (args.updates,))]
+    conn.close()
+    db.bulk_update_status(case_ids, 'Closed', 'benchmark')
+    
+    def poll():
+        page, seen = {'cursor': cursor, 'has_more': True}, 0
+        while page['has_more']:
+            page = db.get_changes_since(page['cursor'], 500)
+            seen += len(page['changes'])
+        return seen
+    
+    print(f"Changes since cursor {cursor}: {poll()}")
+    print(f"{'read':<24} {'ms':>10}")
+    print(f"{'get_changes_since':<24} {measure(poll, 5)[0]:>10.1f}")
+    print(f"{'empty poll':<24} {measure(lambda: db.get_changes_since(10 ** 12), 5)[0]:>10.2f}")
+    print(f"{'get_all_cases':<24} {measure(db.get_all_cases, 1)[0]:>10.1f}")
+
+class CallbackClient:
+    """Fires Dash callbacks through /_dash-update-component and keeps the props they return"""
+    
+    ENCODINGS = ('identity', 'gzip', 'br')
+    
+    def __init__(self, server):
+        self.client = server.test_client()
+        self.callbacks = self.client.get('/_dash-dependencies').get_json()
+        self.props = {}
+    
+    def _payload(self, callback, changed):
+        def spec(item):
+            return {'id': json.loads(item['id']) if item['id'].startswith('{') else item['id'],
+                    'property': item['property'],
+                    'value': self.props.get((item['id'], item['property']))}
+        
+        outputs = [spec({'id': part.rsplit('.', 1)[0], 'property': part.rsplit('.', 1)[1]})
+                   for part in callback['output'].strip('.').split('...')]
+        for output in outputs:
+            del output['value']
+        return {
+            'output': callback['output'],
+            'outputs': outputs if callback['output'].startswith('..') else outputs[0],
+            'inputs': [spec(item) for item in callback['inputs']],
+            'state': [spec(item) for item in callback['state']],
+            'changedPropIds': [changed]
+        }
+    
+    def fire(self, changed):
+        """Run every callback with the changed prop as input; bytes sent and received per encoding"""
+        sizes = {}
+        for callback in self.callbacks:
+            if changed not in {f"{item['id']}.{item['property']}" for item in callback['inputs']}:
+                continue
+            payload = self._payload(callback, changed)
+            request_bytes = len(json.dumps(payload))
+            received = {}
+            for encoding in self.ENCODINGS:
+                response = self.client.post('/_dash-update-component', json=payload,
+                                            headers={'Accept-Encoding': encoding})
+                received[encoding] = len(response.data)
+            
+            if response.status_code == 200:
+                body = json.loads(self.client.post('/_dash-update-component', json=payload).data)
+                for component_id, props in body.get('response', {}).items():
+                    for prop, value in props.items():
+                        if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                            self.props[(component_id, prop)] = value
+            sizes[callback['output'].strip('.')] = (request_bytes, received)
+        return sizes
+
+def page_version_id(page, topic):
+    """A page's version store id in the string form /_dash-dependencies uses"""
+    return json.dumps({'page': page, 'topic': topic, 'type': 'page-version'}, separators=(',', ':'))
+
+def bench_payload(args):
+    """Bytes on the wire per data tick and per table callback, by response encoding"""
+    workdir = tempfile.mkdtemp(prefix='cybercrime-bench-')
+    build_synthetic_db(os.path.join(workdir, 'cybercrime.db'), args.cases, blob_kb=1)
+    app = load_app(os.path.join(workdir, 'cybercrime.db'))
+    client = CallbackClient(app.server)
+    
+    def report(title, sizes):
+        print(title)
+        print(f"  {'callback':<58} {'request':>8} {'identity':>9} {'gzip':>7} {'br':>7}")
+        for output, (sent, received) in sizes.items():
+            print(f"  {output[:58]:<58} {sent:>8} {received['identity']:>9} {received['gzip']:>7} {received['br']:>7}")
+        totals = [sum(received[encoding] for _, received in sizes.values()) for encoding in client.ENCODINGS]
+        print(f"  {'total':<58} {sum(sent for sent, _ in sizes.values()):>8} "
+              f"{totals[0]:>9} {totals[1]:>7} {totals[2]:>7}")
+    
+    # Page load, then the tick that follows one new case
+    cases_store = page_version_id('dashboard', 'cases')
+    client.props[(cases_store, 'data')] = 0
+    client.fire(f"{cases_store}.data")
+    app.db.add_case({'title': 'Benchmark case', 'crime_type': 'Phishing',
+                     'incident_date': '2025-01-01', 'created_by': 'benchmark'})
+    client.props[(cases_store, 'data')] = app.change_feed.version('cases')
+    report('Data tick after one new case (every dashboard callback it triggers):', client.fire(f"{cases_store}.data"))
+    
+    client.props[('case-status-filter', 'value')] = 'all'
+    report(f"Cases list, {args.cases} cases:", client.fire('case-status-filter.value'))
+    client.props[('search-text', 'value')] = 'report'
+    client.props[('search-crime-type', 'value')] = 'all'
+    client.props[('search-button', 'n_clicks')] = 1
+    report('Search:', client.fire('search-button.n_clicks'))
+    users_store = page_version_id('users', 'users')
+    client.props[(users_store, 'data')] = 1
+    report('Users table:', client.fire(f"{users_store}.data"))
+
+def component_ids(component):
+    """Ids of a component and all its descendants, dict ids in Dash's string form"""
+    found = set()
+    stack = [component]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+            continue
+        if not hasattr(node, 'to_plotly_json'):
+            continue
+        node_id = getattr(node, 'id', None)
+        if node_id is not None:
+            found.add(json.dumps(node_id, sort_keys=True, separators=(',', ':')) if isinstance(node_id, dict) else node_id)
+        stack.append(getattr(node, 'children', None))
+    return found
+
+def bench_pages(args):
+    """DB statements per page: on opening it and after a pushed change, with off-screen callbacks counted
+    
+    Emulates the browser: the version gate runs with the shown page's version
+    stores, then every callback with a changed store as input is fired, even
+    ones whose outputs are not on the page, so any off-screen refresh would show.
+    """
+    app = load_app()
+    client = app.server.test_client()
+    callbacks = client.get('/_dash-dependencies').get_json()
+    gate = next(callback for callback in callbacks if callback['output'].startswith('{"page":["ALL"]'))
+    shell = component_ids(app.get_dashboard_layout())
+    
+    def outputs_of(callback):
+        return [part.rsplit('.', 1) for part in callback['output'].strip('.').split('...')]
+    
+    def check_versions(stores, seen):
+        specs = [{'id': json.loads(store), 'property': 'data'} for store in sorted(stores)]
+        response = client.post('/_dash-update-component', json={
+            'output': gate['output'], 'outputs': specs, 'changedPropIds': ['change-feed.data'],
+            'inputs': [{'id': 'page-refresh', 'property': 'n_intervals', 'value': 1},
+                       {'id': 'change-feed', 'property': 'data', 'value': None}],
+            'state': [[{**spec, 'value': seen.get(store)} for spec, store in zip(specs, sorted(stores))]]
+        })
+        if response.status_code == 204:
+            return {}
+        return {store: props['data'] for store, props in response.get_json()['response'].items()}
+    
+    def fire_dependents(changed, versions, on_page):
+        off_screen = 0
+        for callback in callbacks:
+            inputs = [item['id'] for item in callback['inputs']]
+            if not changed.keys() & set(inputs):
+                continue
+            outputs = outputs_of(callback)
+            specs = [{'id': output_id, 'property': prop} for output_id, prop in outputs]
+            before = sum(row['statements'] for row in app.callback_metrics.report())
+            client.post('/_dash-update-component', json={
+                'output': callback['output'],
+                'outputs': specs if callback['output'].startswith('..') else specs[0],
+                'inputs': [{'id': json.loads(item['id']) if item['id'].startswith('{') else item['id'],
+                            'property': item['property'],
+                            'value': versions.get(item['id'])} for item in callback['inputs']],
+                'state': [{'id': item['id'], 'property': item['property'], 'value': None}
+                          for item in callback['state']],
+                'changedPropIds': [f"{item}.data" for item in inputs if item in changed]
+            })
+            if not all(output_id in on_page for output_id, _ in outputs):
+                off_screen += sum(row['statements'] for row in app.callback_metrics.report()) - before
+        return off_screen
+    
+    print(f"{'page':<12} {'topics':<14} {'open: runs':>10} {'stmts':>6} {'change: runs':>12} {'stmts':>6} {'off-screen stmts':>17}")
+    for route, page in app.PAGE_CACHE.items():
+        topics = app.PAGE_REFRESH.get(route, {'topics': ()})['topics']
+        on_page = shell | component_ids(page)
+        stores = {store for store in on_page if '"page-version"' in store}
+        
+        app.callback_metrics.reset()
+        versions = check_versions(stores, {})
+        off_screen = fire_dependents(versions, versions, on_page)
+        opened = app.callback_metrics.report()
+        
+        app.db.add_case({'title': 'Benchmark case', 'crime_type': 'Phishing',
+                         'incident_date': '2025-01-01', 'created_by': 'benchmark'})
+        app.db.add_user(f"bench{len(route)}{time.time_ns()}", 'secret', 'Benchmark User', 'Viewer')
+        app.callback_metrics.reset()
+        changed = check_versions(stores, versions)
+        off_screen += fire_dependents(changed, {**versions, **changed}, on_page)
+        after_change = app.callback_metrics.report()
+        
+        print(f"{route:<12} {','.join(topics) or '-':<14} {sum(row['calls'] for row in opened):>10} "
+              f"{sum(row['statements'] for row in opened):>6} {sum(row['calls'] for row in after_change):>12} "
+              f"{sum(row['statements'] for row in after_change):>6} {off_screen:>17}")
+
+def bench_statements(args):
+    """Per-call cost of preparing statements and opening connections versus the query registry"""
+    if args.gevent:
+        # As the gevent gunicorn worker does, before any connection is opened
+        from gevent import monkey
+        monkey.patch_all()
+    import sqlite3
+    from queries import QUERIES
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    db = build_synthetic_db(path, args.cases, blob_kb=1)
+    rng = random.Random(7)
+    case_ids = [f"CYB-{2019 + i * 7 // args.cases}-{i + 1:06d}" for i in rng.sample(range(args.cases), args.calls)]
+    limits = [rng.randint(5, 50) for _ in range(args.calls)]
+    cursors = [rng.randrange(args.cases) for _ in range(args.calls)]
+    lookup = QUERIES['case_by_id']
+    conn = db.get_connection()
+    
+    def fresh_connection_lookup(case_id):
+        fresh = sqlite3.connect(path)
+        row = fresh.execute(lookup.sql, (case_id,)).fetchone()
+        fresh.close()
+        return row
+    
+    variants = {
+        'case lookup': [
+            ('literal SQL, same connection', lambda i: conn.execute(
+                lookup.sql.replace('?', repr(case_ids[i]))).fetchone()),
+            ('bound, same connection', lambda i: lookup.execute(conn, (case_ids[i],)).fetchone()),
+            ('bound, new connection', lambda i: fresh_connection_lookup(case_ids[i])),
+            ('get_case_by_id (pooled)', lambda i: db.get_case_by_id(case_ids[i]))
+        ],
+        'change page': [
+            ('cursor, LIMIT in the SQL', lambda i: conn.execute(f'''
+                SELECT change_seq, case_id, title, status FROM cases
+                WHERE change_seq > {cursors[i]} ORDER BY change_seq LIMIT {limits[i]}
+            ''').fetchall()),
+            ('cursor, LIMIT bound', lambda i: QUERIES['changes_since'].execute(
+                conn, (cursors[i], limits[i]), columns='case_id, title, status').fetchall())
+        ]
+    }
+    
+    if args.gevent:
+        import gevent
+        
+        # Each greenlet stands for a request: it yields to the others while
+        # holding its connection, as a streamed response does
+        requests, used = [], set()
+        
+        def request(i):
+            pooled = db.get_connection()
+            requests.append(i)
+            used.add(pooled)
+            lookup.execute(pooled, (case_ids[i],)).fetchone()
+            gevent.sleep(0)
+            pooled.close()
+        
+        def greenlet_requests(i):
+            if i % args.greenlets == 0:
+                gevent.joinall([gevent.spawn(request, i + n) for n in range(min(args.greenlets, args.calls - i))])
+        
+        variants['case lookup'].append((f"pooled, {args.greenlets} greenlets", greenlet_requests))
+    
+    print(f"{'statement':<14} {'variant':<30} {'us/call':>9}")
+    for name, runs in variants.items():
+        for label, run in runs:
+            best = min(timeit_calls(run, args.calls) for _ in range(3))
+            print(f"{name:<14} {label:<30} {best:>9.1f}")
+    conn.close()
+    if args.gevent:
+        print(f"connections used by {len(requests)} greenlet requests: {len(used)}")
+
+def bench_listing(args):
+    """Peak memory of full, capped and streamed case listings as the table grows"""
+    from database import CASE_CHUNK_ROWS, MAX_LISTING_ROWS
+    
+    columns = ['case_id', 'title', 'crime_type', 'incident_date', 'location', 'status', 'priority', 'created_at']
+    
+    def stream():
+        rows = 0
+        for chunk in db.iter_all_cases(columns=columns):
+            rows += len(chunk)
+        return rows
+    
+    print(f"Cap {MAX_LISTING_ROWS} rows, chunks of {CASE_CHUNK_ROWS} rows")
+    print(f"{'cases':>9} {'mode':<10} {'rows':>9} {'time ms':>9} {'peak MB':>9}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+        db = build_synthetic_db(path, size, blob_kb=1)
+        modes = {
+            'full': lambda: len(db.get_all_cases(columns=columns)),
+            'capped': lambda: len(db.get_all_cases(columns=columns, max_rows=MAX_LISTING_ROWS)),
+            'streamed': stream
+        }
+        for mode, run in modes.items():
+            elapsed, peak = measure(run)
+            print(f"{size:>9} {mode:<10} {run():>9} {elapsed:>9.1f} {peak:>9.1f}")
+        shutil.rmtree(os.path.dirname(path))
+
+def bench_dates(args):
+    """Date range searches and trends on the integer date keys versus the text date columns"""
+    from datetime import date, timedelta
+    import pandas as pd
+    from database import Database
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    build_synthetic_db(path, args.cases, blob_kb=1)
+    db = Database(path)
+    conn = db.get_connection()
+    
+    # The queries as they were before incident_day and created_epoch existed
+    text_search = '''
+        SELECT case_id, title, crime_type, incident_date, status FROM cases
+        WHERE (:start_date IS NULL OR incident_date >= :start_date)
+          AND (:end_date IS NULL OR incident_date <= :end_date)
+        ORDER BY created_at DESC
+    '''
+    text_trend = '''
+        SELECT DATE(created_at) as date, COUNT(*) as count FROM cases
+        WHERE (:start_date IS NULL OR created_at >= :start_date)
+          AND (:end_date IS NULL OR created_at <= :end_date)
+        GROUP BY DATE(created_at) ORDER BY date
+    '''
+    columns = ['case_id', 'title', 'crime_type', 'incident_date', 'status']
+    
+    rng = random.Random(3)
+    print(f"{'query':<22} {'range':>6} {'text ms':>9} {'integer ms':>11} {'speedup':>8} {'rows':>8}")
+    for days in (7, 90, 365):
+        ranges = []
+        for _ in range(args.queries):
+            start = date(2019, 1, 1) + timedelta(days=rng.randrange(7 * 365 - days))
+            ranges.append((start.isoformat(), (start + timedelta(days=days - 1)).isoformat()))
+        
+        runs = {
+            'search_cases': (
+                lambda start, end: pd.read_sql_query(text_search, conn, params={'start_date': start, 'end_date': end}),
+                lambda start, end: db.search_cases('', 'all', start, end, columns=columns)
+            ),
+            'get_trend_data': (
+                lambda start, end: pd.read_sql_query(text_trend, conn, params={'start_date': start, 'end_date': end}),
+                lambda start, end: db.get_trend_data(start, end)
+            )
+        }
+        for name, (text_run, integer_run) in runs.items():
+            timings = []
+            for run in (text_run, integer_run):
+                started = time.perf_counter()
+                rows = sum(len(run(start, end)) for start, end in ranges)
+                timings.append((time.perf_counter() - started) * 1000 / len(ranges))
+            print(f"{name:<22} {days:>5}d {timings[0]:>9.1f} {timings[1]:>11.1f} "
+                  f"{timings[0] / timings[1]:>7.1f}x {rows // len(ranges):>8}")
+    conn.close()
+
+def bench_shards(args):
+    """Archive reads from one archive file versus one file per case year"""
+    from datetime import date, timedelta
+    from database import MAX_LISTING_ROWS, Database
+    
+    workdir = tempfile.mkdtemp(prefix='cybercrime-bench-')
+    source = os.path.join(workdir, 'source.db')
+    print(f"Building {args.cases} cases over 2019-2025 ...")
+    build_synthetic_db(source, args.cases, blob_kb=1)
+    
+    databases = {}
+    for label, by_year in (('one file', False), ('by year', True)):
+        path = os.path.join(workdir, f"{label.replace(' ', '-')}.db")
+        shutil.copy(source, path)
+        databases[label] = Database(path, shard_by_year=by_year)
+        result = databases[label].archive_closed_cases(older_than_days=0, batch_size=5000)
+        databases[label].get_archive_summary()
+    print(f"Archived {result['archived']} closed cases; {len(result['files'])} year files in sharded mode")
+    
+    rng = random.Random(11)
+    archived = rng.sample(sorted(set(databases['one file'].get_all_cases(columns=['case_id'], include_archive=True)['case_id'])
+                                 - set(databases['one file'].get_all_cases(columns=['case_id'])['case_id'])), args.queries)
+    
+    def windows(days):
+        starts = [date(2019, 1, 1) + timedelta(days=rng.randrange(7 * 365 - days)) for _ in range(args.queries)]
+        return [(start.isoformat(), (start + timedelta(days=days - 1)).isoformat()) for start in starts]
+    
+    quarters, years = windows(90), windows(365)
+    columns = ['case_id', 'title', 'crime_type', 'incident_date', 'status']
+    runs = {
+        'get_case_by_id': lambda db: [db.get_case_by_id(case_id) for case_id in archived],
+        'search 90d': lambda db: [db.search_cases('', 'all', start, end, columns=columns) for start, end in quarters],
+        'search 365d': lambda db: [db.search_cases('', 'all', start, end, columns=columns) for start, end in years],
+        'trend 365d': lambda db: [db.get_trend_data(start, end) for start, end in years],
+        'listing, capped': lambda db: [db.get_all_cases(columns=columns, include_archive=True,
+                                                        max_rows=MAX_LISTING_ROWS) for _ in range(args.queries)]
+    }
+    
+    # The second pass over the same queries reuses cached archive results (trends only)
+    print(f"{'ms per query':<18} {'one file':>9} {'again':>9} {'by year':>9} {'again':>9}")
+    for name, run in runs.items():
+        timings = []
+        for db in databases.values():
+            for _ in range(2):
+                started = time.perf_counter()
+                run(db)
+                timings.append((time.perf_counter() - started) * 1000 / args.queries)
+        print(f"{name:<18} " + ' '.join(f"{timing:>9.2f}" for timing in timings))
+    shutil.rmtree(workdir)
+
+def bench_case_cache(args):
+    """Case detail lookups with a Zipf-skewed view mix, straight from the database versus the case cache"""
+    from casecache import CaseCache
+    from database import Database
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    build_synthetic_db(path, args.cases, blob_kb=1)
+    db = Database(path, shard_by_year=True)
+    db.archive_closed_cases(older_than_days=0, batch_size=5000)
+    cache = CaseCache(db)
+    db.subscribe(cache.on_change)
+    
+    # A few cases get most views; every update_every-th view edits the viewed case
+    case_ids = list(db.get_all_cases(columns=['case_id'], include_archive=True)['case_id'])
+    rng = random.Random(5)
+    rng.shuffle(case_ids)
+    weights = [1 / rank ** 1.1 for rank in range(1, len(case_ids) + 1)]
+    views = rng.choices(case_ids, weights=weights, k=args.views)
+    
+    def run(get):
+        # Only the views are timed, not the updates
+        stale, elapsed = 0, 0.0
+        for i, case_id in enumerate(views):
+            started = time.perf_counter()
+            case = get(case_id)
+            elapsed += time.perf_counter() - started
+            if case and args.update_every and i % args.update_every == 0:
+                result = db.update_case(case_id, {'priority': rng.choice(PRIORITIES)},
+                                        expected_version=case.version, changed_by='bench')
+                if result['success'] and get(case_id).version != result['version']:
+                    stale += 1
+        return elapsed * 1e6 / len(views), stale
+    
+    print(f"{'views':<16} {'us per view':>12} {'stale reads':>12}")
+    for label, get in (('database', db.get_case_by_id), ('case cache', cache.get)):
+        us, stale = run(get)
+        print(f"{label:<16} {us:>12.1f} {stale:>12}")
+    stats = cache.stats()
+    print(f"hit rate {stats['hit_rate']:.1%}, {stats['size']} cached, "
+          f"{stats['evictions']} evictions, {stats['invalidations']} invalidations")
+    shutil.rmtree(os.path.dirname(path))
+
+def bench_alerts(args):
+    """Alert rule matching per case with the compiled matcher versus checking every rule"""
+    from dataclasses import asdict
+    from alerts import AlertRules, extract_entities
+    from entities import normalize_phone
+    
+    # Full names from the sample name parts, so entity rules spread over many names
+    parts = [name.split() for name in NAMES]
+    names = [f"{given} {family}" for given, _ in parts for _, family in parts]
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    db = build_synthetic_db(path, args.cases, blob_kb=1, names=names)
+    alert_rules = AlertRules(db)
+    
+    # Mostly rules watching one phone number or person, the rest on crime type and priority
+    rng = random.Random(9)
+    phones = list(db.get_all_cases(columns=['victim_contact'])['victim_contact'])
+    
+    def random_rule(i):
+        owner, name, kind = f"user{i % 200}", f"rule {i}", rng.random()
+        if kind < 0.6:
+            return (owner, name, None, None, None, 'phone', normalize_phone(rng.choice(phones)))
+        if kind < 0.8:
+            return (owner, name, rng.choice(CRIME_TYPES), None, None, 'name', rng.choice(names).lower())
+        if kind < 0.95:
+            return (owner, name, rng.choice(CRIME_TYPES), 'Critical', rng.choice(STATUSES), None, None)
+        return (owner, name, rng.choice(CRIME_TYPES), rng.choice(PRIORITIES), None, None, None)
+    
+    conn = db.get_connection()
+    with conn:
+        conn.executemany('''
+            INSERT INTO alert_rules (owner, name, crime_type, priority, status, entity_kind, entity_value)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (random_rule(i) for i in range(args.rules)))
+    conn.close()
+    
+    started = time.perf_counter()
+    matcher = alert_rules.matcher()
+    print(f"Compiled {matcher.size} rules in {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    rules = [rule for bucket in matcher._buckets.values() for rule in bucket]
+    cases = [asdict(db.get_case_by_id(case_id)) for case_id in db.get_all_cases(columns=['case_id'])['case_id']]
+    
+    def check_every_rule(case):
+        entities = extract_entities(case)
+        return [rule for rule in rules if rule.matches(case, entities)]
+    
+    print(f"{'us per case':<24} {'':>9}")
+    for label, match in (('entity extraction', extract_entities), ('check every rule', check_every_rule),
+                         ('compiled matcher', matcher.match)):
+        started = time.perf_counter()
+        found = sum(len(match(case)) for case in cases)
+        print(f"{label:<24} {(time.perf_counter() - started) * 1e6 / len(cases):>9.1f}")
+    print(f"{found / len(cases):.1f} matching rules per case")
+    
+    # add_case end to end, without and with the listener writing notifications
+    fields = ('title', 'crime_type', 'incident_date', 'location', 'victim_name', 'victim_contact',
+              'suspect_name', 'suspect_details', 'description', 'evidence', 'priority', 'status')
+    for label, subscribed in (('add_case, no alerts', False), ('add_case, with alerts', True)):
+        if subscribed:
+            db.subscribe(alert_rules.on_change)
+        started = time.perf_counter()
+        for _ in range(200):
+            case = rng.choice(cases)
+            db.add_case({**{field: case[field] for field in fields}, 'created_by': 'benchmark'})
+        print(f"{label:<24} {(time.perf_counter() - started) * 1e6 / 200:>9.1f}")
+    shutil.rmtree(os.path.dirname(path))
+
+def bench_sla(args):
+    """SLA watch reads off the (status, due_at) index versus scanning open cases for stale updated_at"""
+    import pandas as pd
+    from database import SLA_COUNT_CAP, SLA_SOON_HOURS
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='cybercrime-bench-'), 'cybercrime.db')
+    print(f"Building {args.cases} cases ...")
+    db = build_synthetic_db(path, args.cases, blob_kb=1, years=(2025, 2026))
+    conn = db.get_connection()
+    
+    # Before due_at: read every open case and compare its age with the policy in pandas
+    def scan():
+        policies = db.get_sla_policies().set_index('priority')
+        df = pd.read_sql_query('''
+            SELECT case_id, title, priority, status, created_at, updated_at FROM cases
+            WHERE status IN ('Pending', 'Under Investigation')
+        ''', conn)
+        hours = df['priority'].map(policies['response_hours']).where(
+            df['status'] == 'Pending', df['priority'].map(policies['resolution_hours']))
+        start = pd.to_datetime(df['created_at'].where(df['status'] == 'Pending', df['updated_at']))
+        df['due_at'] = start + pd.to_timedelta(hours, unit='h')
+        due = df[df['due_at'] < pd.Timestamp.now() + pd.Timedelta(hours=SLA_SOON_HOURS)]
+        return len(due), due.nsmallest(50, 'due_at')
+    
+    def indexed(cap):
+        summary = db.get_sla_summary(cap=cap)
+        return sum(summary['overdue'].values()) + sum(summary['due_soon'].values()), db.get_sla_cases(limit=50)
+    
+    print(f"{'SLA watch':<28} {'ms':>9} {'due':>9}")
+    for label, run in (('scan open cases', scan), ('index, exact counts', lambda: indexed(args.cases)),
+                       (f'index, counts to {SLA_COUNT_CAP:,}', lambda: indexed(SLA_COUNT_CAP))):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            due, _ = run()
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{label:<28} {min(timings):>9.1f} {due:>9}")
+    
+    # A status change moves the case between index ranges as it commits
+    case_id = db.get_sla_cases(limit=1)['case_id'].iloc[0]
+    started = time.perf_counter()
+    db.update_case(case_id, {'status': 'Resolved'}, changed_by='benchmark')
+    updated = (time.perf_counter() - started) * 1000
+    print(f"Resolving the most overdue case took {updated:.1f} ms; still listed: "
+          f"{case_id in set(db.get_sla_cases(limit=50)['case_id'])}")
+    conn.close()
+    shutil.rmtree(os.path.dirname(path))
+
+def timeit_calls(run, calls):
+    """Microseconds per call of run(i) for i in range(calls)"""
+    started = time.perf_counter()
+    for i in range(calls):
+        run(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    idle = subparsers.add_parser('idle-tabs', help='DB load of idle tabs connected to the change feed')
+    idle.add_argument('--tabs', type=int, default=200)
+    idle.add_argument('--seconds', type=int, default=30)
+    idle.set_defaults(func=bench_idle_tabs)
+    
+    projection = subparsers.add_parser('projection', help='SELECT * versus projected case listings')
+    projection.add_argument('--cases', type=int, default=100000)
+    projection.add_argument('--blob-kb', type=int, default=4)
+    projection.set_defaults(func=bench_projection)
+    
+    similarity = subparsers.add_parser('similarity', help='Duplicate lookup latency on a large backlog')
+    similarity.add_argument('--cases', type=int, default=100000)
+    similarity.add_argument('--queries', type=int, default=200)
+    similarity.set_defaults(func=bench_similarity)
+    
+    linked = subparsers.add_parser('linked', help='Two-hop linked case expansion on a large backlog')
+    linked.add_argument('--cases', type=int, default=1000000)
+    linked.add_argument('--queries', type=int, default=200)
+    linked.set_defaults(func=bench_linked)
+    
+    activity = subparsers.add_parser('activity', help='Partitioned activity log latency as it grows')
+    activity.add_argument('--rows', type=int, default=5000000)
+    activity.add_argument('--months', type=int, default=24)
+    activity.set_defaults(func=bench_activity)
+    
+    user_analytics = subparsers.add_parser('analytics', help='User analytics for a year of activity')
+    user_analytics.add_argument('--rows', type=int, default=2000000)
+    user_analytics.add_argument('--users', type=int, default=200)
+    user_analytics.set_defaults(func=bench_analytics)
+    
+    snapshot = subparsers.add_parser('snapshot', help='Reports on the Parquet snapshot versus live SQL')
+    snapshot.add_argument('--cases', type=int, default=3000000)
+    snapshot.add_argument('--updates', type=int, default=1000)
+    snapshot.set_defaults(func=bench_snapshot)
+    
+    changes = subparsers.add_parser('changes', help='Sync poll cost, changes-since versus full reads')
+    changes.add_argument('--cases', type=int, default=1000000)
+    changes.add_argument('--updates', type=int, default=200)
+    changes.set_defaults(func=bench_changes)
+    
+    payload = subparsers.add_parser('payload', help='Callback bytes on the wire by response encoding')
+    payload.add_argument('--cases', type=int, default=5000)
+    payload.set_defaults(func=bench_payload)
+    
+    pages = subparsers.add_parser('pages', help='DB statements per page view and off-screen refreshes')
+    pages.set_defaults(func=bench_pages)
+    
+    statements = subparsers.add_parser('statements', help='Statement preparation and connection overhead per call')
+    statements.add_argument('--cases', type=int, default=100000)
+    statements.add_argument('--calls', type=int, default=5000)
+    statements.add_argument('--gevent', action='store_true', help='Monkey-patch as the gevent worker does')
+    statements.add_argument('--greenlets', type=int, default=50)
+    statements.set_defaults(func=bench_statements)
+    
+    listing = subparsers.add_parser('listing', help='Peak memory of full, capped and streamed case listings')
+    listing.add_argument('--sizes', default='10000,40000,160000')
+    listing.set_defaults(func=bench_listing)
+    
+    dates = subparsers.add_parser('dates', help='Date range queries on integer date keys versus text dates')
+    dates.add_argument('--cases', type=int, default=500000)
+    dates.add_argument('--queries', type=int, default=20)
+    dates.set_defaults(func=bench_dates)
+    
+    shards = subparsers.add_parser('shards', help='Archive reads from one file versus one file per year')
+    shards.add_argument('--cases', type=int, default=500000)
+    shards.add_argument('--queries', type=int, default=20)
+    shards.set_defaults(func=bench_shards)
+    
+    case_cache = subparsers.add_parser('case-cache', help='Hot case detail views from the database versus the case cache')
+    case_cache.add_argument('--cases', type=int, default=200000)
+    case_cache.add_argument('--views', type=int, default=20000)
+    case_cache.add_argument('--update-every', type=int, default=50)
+    case_cache.set_defaults(func=bench_case_cache)
+    
+    alerts = subparsers.add_parser('alerts', help='Alert rule matching cost per new case')
+    alerts.add_argument('--rules', type=int, default=10000)
+    alerts.add_argument('--cases', type=int, default=2000)
+    alerts.set_defaults(func=bench_alerts)
+    
+    sla = subparsers.add_parser('sla', help='Overdue case listing off the SLA index versus a scan')
+    sla.add_argument('--cases', type=int, default=1000000)
+    sla.add_argument('--repeat', type=int, default=5)
+    sla.set_defaults(func=bench_sla)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
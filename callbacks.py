@@ -1,16 +1,55 @@
-from dash import Input, Output, State, dash_table, ctx
+from dash import ALL, Input, Output, Patch, State, ctx, no_update
 import dash_bootstrap_components as dbc
 from dash import html
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from flask import session
+from auth import current_user
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote, urlencode
+import analytics
+import snapshot
+from database import MAX_LISTING_ROWS, SLA_COUNT_CAP, SLA_SOON_HOURS
+from queries import UPDATABLE_CASE_FIELDS
 
-def register_callbacks(app, db):
+# Columns of the dashboard's recent cases table, and how many rows new cases
+# may be prepended up to before the table is reloaded instead
+RECENT_CASE_COLUMNS = ['case_id', 'title', 'crime_type', 'status', 'priority', 'created_at']
+RECENT_CASES_MAX_ROWS = 50
+
+# Most overdue cases listed by the dashboard's SLA watch
+SLA_WATCH_ROWS = 50
+
+# Cross-tab report types: title, row dimension, column dimension
+CROSSTAB_REPORTS = {
+    'crime_type_status': ('Crime Type by Status', 'crime_type', 'status'),
+    'crime_type_priority': ('Crime Type by Priority', 'crime_type', 'priority'),
+    'month_crime_type': ('Monthly Cases by Crime Type', 'month', 'crime_type')
+}
+
+def register_callbacks(app, db, change_feed, similarity_index, entity_index, case_snapshot, case_cache,
+                       alert_rules):
     """Register all callbacks for the application"""
     
+    # Data version gate: the only callback driven by the page's refresh timer and
+    # the change feed, besides the SLA watch. It compares the change sequence
+    # versions (shared by every worker) in O(1) and only bumps the version
+    # stores of the page being shown (see PAGE_REFRESH in app.py), which its data
+    # callbacks listen to. It also runs when a page is mounted, to load it once.
+    @app.callback(
+        Output({'type': 'page-version', 'page': ALL, 'topic': ALL}, 'data'),
+        [Input('page-refresh', 'n_intervals'),
+         Input('change-feed', 'data')],
+        State({'type': 'page-version', 'page': ALL, 'topic': ALL}, 'data')
+    )
+    def check_data_versions(n, change, seen):
+        versions = [change_feed.version(output['id']['topic']) for output in ctx.outputs_list]
+        return [version if version != last else no_update for version, last in zip(versions, seen)]
+    
     # Submit new case callback
     @app.callback(
-        Output('case-form-alert', 'children'),
+        [Output('case-form-alert', 'children'),
+         Output('duplicate-cases-panel', 'children')],
         Input('submit-case-button', 'n_clicks'),
         [State('case-title', 'value'),
          State('case-crime-type', 'value'),
@@ -32,7 +71,7 @@ def register_callbacks(app, db):
                    priority, status, session_data):
         if not all([title, crime_type, incident_date]):
             return dbc.Alert("Please fill in all required fields (Title, Crime Type, Incident Date)", 
-                           color="warning", duration=4000)
+                           color="warning", duration=4000), None
         
         case_data = {
             'title': title,
@@ -52,18 +91,53 @@ def register_callbacks(app, db):
         
         result = db.add_case(case_data)
         
-        if result['success']:
-            return dbc.Alert(f"Case registered successfully! Case ID: {result['case_id']}", 
-                           color="success", duration=4000)
-        else:
-            return dbc.Alert(f"Error: {result['error']}", color="danger", duration=4000)
+        if not result['success']:
+            return dbc.Alert(f"Error: {result['error']}", color="danger", duration=4000), None
+        
+        alert = dbc.Alert(f"Case registered successfully! Case ID: {result['case_id']}", 
+                         color="success", duration=4000)
+        
+        # Possible duplicates of the new case
+        duplicates = similarity_index.find_similar(case_data, exclude=result['case_id'])
+        if not duplicates:
+            return alert, None
+        
+        return alert, dbc.Card([
+            dbc.CardHeader([html.I(className="fas fa-clone me-2"), "Possible duplicates"],
+                           className="bg-warning"),
+            dbc.ListGroup([
+                dbc.ListGroupItem([
+                    html.Strong(duplicate['case_id']),
+                    f" - {duplicate['title']} ({duplicate['crime_type']}, {duplicate['status']})",
+                    dbc.Badge(f"{duplicate['similarity']:.0%} similar", color="warning", className="ms-2")
+                ])
+                for duplicate in duplicates
+            ], flush=True)
+        ])
+    
+    # Dashboard statistics cards callback
+    @app.callback(
+        [Output('stat-total-cases', 'children'),
+         Output('stat-pending-cases', 'children'),
+         Output('stat-resolved-cases', 'children'),
+         Output('stat-total-users', 'children')],
+        [Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+         Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'users'}, 'data')],
+        prevent_initial_call=True
+    )
+    def update_statistics_cards(cases_version, users_version):
+        stats = db.get_statistics()
+        
+        return (stats['total_cases'], stats['pending_cases'],
+                stats['resolved_cases'], stats['total_users'])
     
     # Cases by type chart callback
     @app.callback(
         Output('cases-by-type-chart', 'figure'),
-        Input('interval-component', 'n_intervals')
+        Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+        prevent_initial_call=True
     )
-    def update_cases_by_type_chart(n):
+    def update_cases_by_type_chart(cases_version):
         df = db.get_cases_by_type()
         
         if df.empty:
@@ -80,12 +154,44 @@ def register_callbacks(app, db):
         
         return fig
     
+    # Geographic charts callback
+    @app.callback(
+        [Output('cases-by-region-chart', 'figure'),
+         Output('state-crime-heatmap', 'figure')],
+        Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+        prevent_initial_call=True
+    )
+    def update_region_charts(cases_version):
+        df = db.get_location_counts()
+        
+        if df.empty:
+            fig = go.Figure()
+            fig.add_annotation(text="No data available", 
+                             xref="paper", yref="paper",
+                             x=0.5, y=0.5, showarrow=False)
+            return fig, fig
+        
+        by_location = df.groupby(['zone', 'state', 'location'], as_index=False)['count'].sum()
+        treemap = px.treemap(by_location, path=[px.Constant('Nigeria'), 'zone', 'state', 'location'],
+                             values='count', title='Cases by Zone, State and City',
+                             color_discrete_sequence=px.colors.qualitative.Set3)
+        treemap.update_traces(textinfo='label+value')
+        
+        by_state = df.pivot_table(index='state', columns='crime_type', values='count',
+                                  aggfunc='sum', fill_value=0)
+        heatmap = px.imshow(by_state, text_auto=True, aspect='auto',
+                            color_continuous_scale='Reds', title='Cases per State and Crime Type',
+                            labels={'x': 'Crime Type', 'y': 'State', 'color': 'Cases'})
+        
+        return treemap, heatmap
+    
     # Cases by status chart callback
     @app.callback(
         Output('cases-by-status-chart', 'figure'),
-        Input('interval-component', 'n_intervals')
+        Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+        prevent_initial_call=True
     )
-    def update_cases_by_status_chart(n):
+    def update_cases_by_status_chart(cases_version):
         df = db.get_cases_by_status()
         
         if df.empty:
@@ -110,115 +216,80 @@ def register_callbacks(app, db):
         
         return fig
     
-    # Recent cases table callback
+    # Recent cases table callback. Each run reads only the case changes since the
+    # last one: new cases are prepended with a Patch, changes to cases that are
+    # not shown send nothing, and only a change to a shown case reloads the rows.
     @app.callback(
-        Output('recent-cases-table', 'children'),
-        Input('interval-component', 'n_intervals')
+        [Output('recent-cases-table', 'data'),
+         Output('recent-cases-shown', 'data'),
+         Output('recent-cases-empty', 'children')],
+        Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+        State('recent-cases-shown', 'data'),
+        prevent_initial_call=True
     )
-    def update_recent_cases_table(n):
-        df = db.get_recent_cases(10)
+    def update_recent_cases_table(cases_version, shown):
+        if shown:
+            page = db.get_changes_since(shown['cursor'], RECENT_CASES_MAX_ROWS, columns=RECENT_CASE_COLUMNS)
+            changes = page['changes']
+            if not page['has_more'] and not {case['case_id'] for case in changes} & set(shown['case_ids']):
+                new = sorted((case for case in changes if case['created_at'] >= shown['oldest']),
+                             key=lambda case: case['created_at'])
+                if not new:
+                    return no_update, {**shown, 'cursor': page['cursor']}, no_update
+                if (new[0]['created_at'] >= shown['newest']
+                        and len(shown['case_ids']) + len(new) <= RECENT_CASES_MAX_ROWS):
+                    rows = Patch()
+                    for case in new:
+                        rows.prepend({column: case[column] for column in RECENT_CASE_COLUMNS})
+                    return rows, {
+                        'cursor': page['cursor'],
+                        'case_ids': [case['case_id'] for case in reversed(new)] + shown['case_ids'],
+                        'newest': new[-1]['created_at'],
+                        'oldest': shown['oldest']
+                    }, None
         
+        # Full reload; the cursor is read first so no change can fall in between
+        cursor = db.get_change_cursor()
+        df = db.get_recent_cases(10, columns=RECENT_CASE_COLUMNS)
         if df.empty:
-            return html.P("No cases found", className="text-muted")
-        
-        # Select and rename columns for display
-        display_df = df[['case_id', 'title', 'crime_type', 'status', 'priority', 'created_at']].copy()
-        display_df.columns = ['Case ID', 'Title', 'Crime Type', 'Status', 'Priority', 'Created']
-        
-        return dash_table.DataTable(
-            data=display_df.to_dict('records'),
-            columns=[{'name': col, 'id': col} for col in display_df.columns],
-            style_table={'overflowX': 'auto'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontFamily': 'Arial'
-            },
-            style_header={
-                'backgroundColor': '#2C3E50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': '#F8F9FA'
-                }
-            ],
-            page_size=10
-        )
+            return [], {'cursor': cursor, 'case_ids': [], 'newest': '', 'oldest': ''}, \
+                html.P("No cases found", className="text-muted")
+        
+        return df.to_dict('records'), {
+            'cursor': cursor,
+            'case_ids': df['case_id'].tolist(),
+            'newest': df['created_at'].iloc[0],
+            'oldest': df['created_at'].iloc[-1]
+        }, None
     
     # Cases list table callback
     @app.callback(
-        Output('cases-list-table', 'children'),
+        [Output('cases-list-table', 'data'),
+         Output('cases-list-empty', 'children')],
         [Input('case-search-input', 'value'),
          Input('case-status-filter', 'value')]
     )
     def update_cases_list(search_text, status_filter):
-        if status_filter == 'all':
-            df = db.get_all_cases()
-        else:
-            df = db.get_all_cases(status_filter)
+        # Only fetch the columns the table renders
+        columns = ['case_id', 'title', 'crime_type', 'incident_date',
+                   'location', 'status', 'priority', 'created_at']
         
-        # Apply search filter if provided
-        if search_text:
-            mask = df.apply(lambda row: row.astype(str).str.contains(search_text, case=False).any(), axis=1)
-            df = df[mask]
+        # Status and text are filtered in SQL so the row cap applies to matches only
+        df = db.get_all_cases(status_filter, columns=columns, search_text=search_text,
+                              max_rows=MAX_LISTING_ROWS)
         
         if df.empty:
-            return html.P("No cases found", className="text-muted")
-        
-        # Select columns for display
-        display_df = df[['case_id', 'title', 'crime_type', 'incident_date', 
-                        'location', 'status', 'priority', 'created_at']].copy()
-        display_df.columns = ['Case ID', 'Title', 'Crime Type', 'Incident Date', 
-                             'Location', 'Status', 'Priority', 'Created']
-        
-        return dash_table.DataTable(
-            data=display_df.to_dict('records'),
-            columns=[{'name': col, 'id': col} for col in display_df.columns],
-            filter_action="native",
-            sort_action="native",
-            page_action="native",
-            page_size=20,
-            style_table={'overflowX': 'auto'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontFamily': 'Arial',
-                'minWidth': '100px'
-            },
-            style_header={
-                'backgroundColor': '#2C3E50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': '#F8F9FA'
-                },
-                {
-                    'if': {'filter_query': '{Status} = "Resolved"', 'column_id': 'Status'},
-                    'backgroundColor': '#D4EDDA',
-                    'color': '#155724'
-                },
-                {
-                    'if': {'filter_query': '{Status} = "Pending"', 'column_id': 'Status'},
-                    'backgroundColor': '#FFF3CD',
-                    'color': '#856404'
-                },
-                {
-                    'if': {'filter_query': '{Priority} = "Critical"', 'column_id': 'Priority'},
-                    'backgroundColor': '#F8D7DA',
-                    'color': '#721C24'
-                }
-            ]
-        )
+            return [], html.P("No cases found", className="text-muted")
+        if df.attrs['truncated']:
+            export = '/export/cases.csv?' + urlencode({'status': status_filter or 'all', 'q': search_text or ''})
+            return df.to_dict('records'), _refine_alert(len(df), export)
+        return df.to_dict('records'), None
     
     # Search results callback
     @app.callback(
-        Output('search-results', 'children'),
+        [Output('search-results', 'children'),
+         Output('search-results-table', 'data'),
+         Output('search-results-container', 'style')],
         Input('search-button', 'n_clicks'),
         [State('search-text', 'value'),
          State('search-crime-type', 'value'),
@@ -227,57 +298,168 @@ def register_callbacks(app, db):
         prevent_initial_call=True
     )
     def perform_search(n_clicks, search_text, crime_type, start_date, end_date):
-        df = db.search_cases(search_text or '', crime_type, start_date, end_date)
+        df = db.search_cases(search_text or '', crime_type, start_date, end_date,
+                             columns=['case_id', 'title', 'crime_type', 'incident_date',
+                                      'victim_name', 'status', 'priority'],
+                             max_rows=MAX_LISTING_ROWS)
         
         if df.empty:
-            return dbc.Alert("No cases found matching your search criteria", color="info")
+            return dbc.Alert("No cases found matching your search criteria", color="info"), [], {'display': 'none'}
+        
+        if df.attrs['truncated']:
+            export = '/export/search.csv?' + urlencode({
+                'q': search_text or '', 'crime_type': crime_type or 'all',
+                'start_date': start_date or '', 'end_date': end_date or ''
+            })
+            return _refine_alert(len(df), export), df.to_dict('records'), {}
+        return html.H5(f"Found {len(df)} case(s)", className="mb-3"), df.to_dict('records'), {}
+    
+    # Linked cases callback: cases connected through shared entities
+    @app.callback(
+        [Output('linked-cases-results', 'children'),
+         Output('linked-cases-table', 'data'),
+         Output('linked-cases-container', 'style'),
+         Output('linked-cases-skipped', 'children')],
+        [Input('linked-button', 'n_clicks'),
+         Input('linked-case-id', 'n_submit')],
+        [State('linked-case-id', 'value'),
+         State('linked-hops', 'value')],
+        prevent_initial_call=True
+    )
+    def find_linked_cases(n_clicks, n_submit, case_id, hops):
+        hidden = {'display': 'none'}
+        case_id = (case_id or '').strip().upper()
+        if not case_cache.get(case_id):
+            return dbc.Alert(f"Case {case_id or '(empty)'} not found", color="warning"), [], hidden, None
+        
+        reached, skipped = entity_index.linked_cases(case_id, hops=int(hops))
+        entities = entity_index.get_case_entities(case_id)
+        
+        entity_badges = [
+            dbc.Badge(f"{entity['kind']}: {entity['value']} ({entity['case_count']})",
+                      color='secondary' if entity['case_count'] > 1 else 'light',
+                      text_color='white' if entity['case_count'] > 1 else 'dark',
+                      className='me-2 mb-2')
+            for entity in entities
+        ]
+        
+        linked = {other: link for other, link in reached.items() if other != case_id}
+        if not linked:
+            return html.Div([
+                html.Div(entity_badges, className="mb-3"),
+                dbc.Alert("No other case shares a suspect, victim, contact or location with this case", color="info")
+            ]), [], hidden, None
         
-        # Display results
-        display_df = df[['case_id', 'title', 'crime_type', 'incident_date', 
-                        'victim_name', 'status', 'priority']].copy()
-        display_df.columns = ['Case ID', 'Title', 'Crime Type', 'Incident Date', 
-                             'Victim', 'Status', 'Priority']
+        df = db.get_cases_by_ids(linked, columns=['case_id', 'title', 'crime_type', 'status'])
+        df['hops'] = df['case_id'].map(lambda other: linked[other][0])
+        df['linked_by'] = df['case_id'].map(lambda other: f"{linked[other][1]}: {linked[other][2]}")
+        df = df.sort_values(['hops', 'case_id'])
         
         return html.Div([
-            html.H5(f"Found {len(df)} case(s)", className="mb-3"),
-            dash_table.DataTable(
-                data=display_df.to_dict('records'),
-                columns=[{'name': col, 'id': col} for col in display_df.columns],
-                filter_action="native",
-                sort_action="native",
-                page_action="native",
-                page_size=15,
-                style_table={'overflowX': 'auto'},
-                style_cell={
-                    'textAlign': 'left',
-                    'padding': '10px',
-                    'fontFamily': 'Arial'
-                },
-                style_header={
-                    'backgroundColor': '#2C3E50',
-                    'color': 'white',
-                    'fontWeight': 'bold'
-                },
-                style_data_conditional=[
-                    {
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': '#F8F9FA'
-                    }
-                ]
-            )
-        ])
+            html.H5(f"{len(df)} case(s) linked to {case_id} within {hops} hop(s)", className="mb-3"),
+            html.Div(entity_badges, className="mb-3")
+        ]), df.to_dict('records'), {}, html.Small(
+            "Not expanded, shared by too many cases: " +
+            ', '.join(f"{kind}: {value} ({count})" for kind, value, count in skipped[:10]),
+            className="text-muted"
+        ) if skipped else None
+    
+    # Case detail page callback: load the case in the URL into the form. Cases
+    # come from the case cache, so views of the same case skip the database
+    # until it is updated. Archived cases cannot be updated, so they are shown
+    # read-only and nothing is loaded for the save callback.
+    @app.callback(
+        [Output('case-detail-heading', 'children'),
+         Output('case-detail-alert', 'children'),
+         Output('case-detail-body', 'style'),
+         Output('case-detail-loaded', 'data'),
+         Output('case-history-table', 'data'),
+         Output('case-detail-save', 'disabled'),
+         *[Output(f'detail-{field}', 'value') for field in UPDATABLE_CASE_FIELDS],
+         *[Output(f'detail-{field}', 'disabled') for field in UPDATABLE_CASE_FIELDS]],
+        Input('case-detail-url', 'pathname')
+    )
+    def load_case_detail(pathname):
+        case_id = unquote((pathname or '').rsplit('/', 1)[-1]).strip().upper()
+        case = case_cache.get(case_id) if case_id else None
+        if not case:
+            return (f"Case {case_id or '(empty)'}", dbc.Alert("Case not found", color="warning"), {'display': 'none'},
+                    None, [], True, *[None] * len(UPDATABLE_CASE_FIELDS), *[True] * len(UPDATABLE_CASE_FIELDS))
+        
+        history = db.get_case_history(case_id)
+        values = [getattr(case, field) for field in UPDATABLE_CASE_FIELDS]
+        if db.get_case_version(case.case_id) is None:
+            return (f"{case.case_id}: {case.title}",
+                    dbc.Alert("This case is archived and can no longer be edited", color="info"), {}, None,
+                    history.to_dict('records'), True, *values, *[True] * len(UPDATABLE_CASE_FIELDS))
+        return (f"{case.case_id}: {case.title}", None, {}, {'case_id': case.case_id, 'version': case.version},
+                history.to_dict('records'), False, *values, *[False] * len(UPDATABLE_CASE_FIELDS))
+    
+    # Case detail save callback: only changed fields are written, guarded by the
+    # version the form was loaded at so a concurrent edit is not overwritten
+    @app.callback(
+        [Output('case-detail-save-alert', 'children'),
+         Output('case-detail-loaded', 'data', allow_duplicate=True),
+         Output('case-history-table', 'data', allow_duplicate=True),
+         Output('case-detail-heading', 'children', allow_duplicate=True)],
+        Input('case-detail-save', 'n_clicks'),
+        [State('case-detail-loaded', 'data'),
+         *[State(f'detail-{field}', 'value') for field in UPDATABLE_CASE_FIELDS]],
+        prevent_initial_call=True
+    )
+    def save_case_detail(n_clicks, loaded, *values):
+        if not loaded:
+            return no_update, no_update, no_update, no_update
+        
+        form = dict(zip(UPDATABLE_CASE_FIELDS, values))
+        if not all([form['title'], form['crime_type'], form['incident_date']]):
+            return dbc.Alert("Title, Crime Type and Incident Date are required", color="warning",
+                             duration=4000), no_update, no_update, no_update
+        
+        # Cleared inputs come back as '' where the case has NULL
+        case = case_cache.get(loaded['case_id'])
+        if not case:
+            return dbc.Alert("Case not found", color="danger"), no_update, no_update, no_update
+        if db.get_case_version(case.case_id) is None:
+            # Archived since the form was loaded
+            return dbc.Alert("This case has been archived and can no longer be edited", color="warning"), \
+                no_update, no_update, no_update
+        updates = {field: value for field, value in form.items() if (value or None) != (getattr(case, field) or None)}
+        if not updates and case.version == loaded['version']:
+            return dbc.Alert("No changes to save", color="info", duration=3000), no_update, no_update, no_update
+        
+        # History records the user of the signed login session, not the client-side store
+        username = (current_user() or {}).get('username', 'system')
+        result = db.update_case(loaded['case_id'], updates, expected_version=loaded['version'], changed_by=username)
+        
+        if result.get('conflict'):
+            # Saved through another process, whose write this process's cache never heard of
+            case_cache.invalidate(loaded['case_id'])
+            return dbc.Alert([
+                result['error'] + " ",
+                html.A("Reload", href=f"/case/{quote(loaded['case_id'])}", className="alert-link")
+            ], color="danger"), no_update, no_update, no_update
+        if not result['success']:
+            return dbc.Alert(f"Error: {result['error']}", color="danger", duration=4000), no_update, no_update, no_update
+        
+        return (dbc.Alert(f"Saved as version {result['version']}", color="success", duration=3000),
+                {'case_id': loaded['case_id'], 'version': result['version']},
+                db.get_case_history(loaded['case_id']).to_dict('records'),
+                f"{loaded['case_id']}: {form['title']}")
     
     # Trend chart callback
     @app.callback(
         Output('trend-chart', 'figure'),
-        Input('interval-component', 'n_intervals')
+        Input({'type': 'page-version', 'page': 'reports', 'topic': 'cases'}, 'data'),
+        prevent_initial_call=True
     )
-    def update_trend_chart(n):
+    def update_trend_chart(cases_version):
         # Get data for the last 30 days
         end_date = datetime.now()
         start_date = end_date - timedelta(days=30)
         
-        df = db.get_trend_data(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        case_snapshot.refresh()
+        df = snapshot.trend(case_snapshot.frame(), start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
         
         if df.empty:
             fig = go.Figure()
@@ -294,104 +476,138 @@ def register_callbacks(app, db):
         
         return fig
     
-    # Generate report callback
+    # Generate report callback. Runs as a background job so a large report never
+    # blocks the web worker; results are cached by report type, date range and
+    # data version (n_clicks is left out of the cache key).
     @app.callback(
-        Output('report-output', 'children'),
+        [Output('report-output', 'children'),
+         Output('report-table', 'data'),
+         Output('report-table', 'columns'),
+         Output('report-table-container', 'style')],
         Input('generate-report-button', 'n_clicks'),
         [State('report-type', 'value'),
          State('report-date-range', 'start_date'),
          State('report-date-range', 'end_date')],
+        background=True,
+        progress=[Output('report-progress', 'value'),
+                  Output('report-progress', 'label')],
+        running=[(Output('generate-report-button', 'disabled'), True, False),
+                 (Output('cancel-report-button', 'disabled'), False, True),
+                 (Output('report-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})],
+        cancel=[Input('cancel-report-button', 'n_clicks')],
+        cache_args_to_ignore=[0],
         prevent_initial_call=True
     )
-    def generate_report(n_clicks, report_type, start_date, end_date):
+    def generate_report(set_progress, n_clicks, report_type, start_date, end_date):
+        # Reports aggregate the columnar snapshot, never the live tables
+        set_progress((10, 'Refreshing snapshot'))
+        case_snapshot.refresh()
+        cases = case_snapshot.frame()
+        set_progress((40, 'Aggregating cases'))
+        period = html.P(f"Period: {start_date or 'All time'} to {end_date or 'Present'}")
+        
         if report_type == 'monthly':
             # Monthly summary
-            df = db.get_trend_data(start_date, end_date)
+            df = snapshot.trend(cases, start_date, end_date)
             total = df['count'].sum() if not df.empty else 0
-            
-            return html.Div([
-                html.H5("Monthly Summary Report"),
-                html.Hr(),
-                html.P(f"Total Cases: {total}"),
-                html.P(f"Period: {start_date or 'All time'} to {end_date or 'Present'}"),
-                dash_table.DataTable(
-                    data=df.to_dict('records') if not df.empty else [],
-                    columns=[{'name': 'Date', 'id': 'date'}, {'name': 'Cases', 'id': 'count'}],
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'left', 'padding': '10px'},
-                    style_header={'backgroundColor': '#2C3E50', 'color': 'white'}
-                ) if not df.empty else html.P("No data for selected period")
-            ])
+            header = [html.H5("Monthly Summary Report"), html.Hr(), html.P(f"Total Cases: {total}"), period]
+            columns = [('Date', 'date'), ('Cases', 'count')]
+            empty = "No data for selected period"
         
         elif report_type == 'crime_type':
             # Crime type analysis
-            df = db.get_cases_by_type()
-            
-            return html.Div([
-                html.H5("Crime Type Analysis"),
-                html.Hr(),
-                dash_table.DataTable(
-                    data=df.to_dict('records') if not df.empty else [],
-                    columns=[{'name': 'Crime Type', 'id': 'crime_type'}, 
-                            {'name': 'Count', 'id': 'count'}],
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'left', 'padding': '10px'},
-                    style_header={'backgroundColor': '#2C3E50', 'color': 'white'}
-                ) if not df.empty else html.P("No data available")
-            ])
+            df = snapshot.counts_by(cases, 'crime_type', start_date, end_date)
+            header = [html.H5("Crime Type Analysis"), html.Hr()]
+            columns = [('Crime Type', 'crime_type'), ('Count', 'count')]
+            empty = "No data available"
         
         elif report_type == 'status':
             # Status overview
-            df = db.get_cases_by_status()
+            df = snapshot.counts_by(cases, 'status', start_date, end_date)
+            header = [html.H5("Status Overview"), html.Hr()]
+            columns = [('Status', 'status'), ('Count', 'count')]
+            empty = "No data available"
+        
+        elif report_type in CROSSTAB_REPORTS:
+            # Cross-tab of two dimensions with row and column totals
+            title, rows, cols = CROSSTAB_REPORTS[report_type]
+            df = snapshot.crosstab(cases, rows, cols, start_date, end_date)
             
-            return html.Div([
-                html.H5("Status Overview"),
-                html.Hr(),
-                dash_table.DataTable(
-                    data=df.to_dict('records') if not df.empty else [],
-                    columns=[{'name': 'Status', 'id': 'status'}, 
-                            {'name': 'Count', 'id': 'count'}],
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'left', 'padding': '10px'},
-                    style_header={'backgroundColor': '#2C3E50', 'color': 'white'}
-                ) if not df.empty else html.P("No data available")
-            ])
-        
-        return html.P("Report generated")
+            # A lone totals row means no case fell in the period
+            if len(df) == 1:
+                df = df.iloc[0:0]
+            header = [html.H5(title), html.Hr(), period]
+            columns = [(str(column).replace('_', ' ').title(), str(column)) for column in df.columns]
+            empty = "No data for selected period"
+        
+        else:
+            return html.P("Report generated"), [], [], {'display': 'none'}
+        
+        set_progress((70, 'Building report'))
+        if df.empty:
+            return html.Div(header + [html.P(empty)]), [], [], {'display': 'none'}
+        
+        # The first column is the row label, so the table's styles work for every report
+        df = df.rename(columns={columns[0][1]: 'label'})
+        columns = [{'name': columns[0][0], 'id': 'label'}] + [{'name': name, 'id': field} for name, field in columns[1:]]
+        return html.Div(header), df.to_dict('records'), columns, {}
     
-    # Users table callback
+    # SLA watch callback: counts and the most overdue cases, all index range
+    # reads. Deadlines pass without any write, so the refresh timer drives it too.
     @app.callback(
-        Output('users-table', 'children'),
-        Input('interval-component', 'n_intervals')
+        [Output('sla-summary', 'children'),
+         Output('sla-cases-table', 'data')],
+        [Input({'type': 'page-version', 'page': 'dashboard', 'topic': 'cases'}, 'data'),
+         Input('page-refresh', 'n_intervals')],
+        prevent_initial_call=True
     )
-    def update_users_table(n):
-        df = db.get_all_users()
+    def update_sla_watch(cases_version, n_intervals):
+        summary = db.get_sla_summary()
+        df = db.get_sla_cases(limit=SLA_WATCH_ROWS)
         
+        badges = [
+            dbc.Badge(f"{_sla_count(*summary['overdue'].values())} overdue", color="danger", className="me-2 p-2"),
+            dbc.Badge(f"{_sla_count(*summary['due_soon'].values())} due within {SLA_SOON_HOURS} h", color="warning",
+                      text_color="dark", className="me-2 p-2"),
+            html.Small(' · '.join(f"{status}: {_sla_count(summary['overdue'][status])} overdue, "
+                                  f"{_sla_count(summary['due_soon'][status])} soon"
+                                  for status in summary['overdue']), className="text-muted")
+        ]
+        return badges, df.to_dict('records')
+    
+    # SLA report callback: every overdue and soon-due case in the chosen window
+    @app.callback(
+        [Output('sla-report-summary', 'children'),
+         Output('sla-report-table', 'data')],
+        [Input({'type': 'page-version', 'page': 'reports', 'topic': 'cases'}, 'data'),
+         Input('sla-report-window', 'value')],
+        prevent_initial_call=True
+    )
+    def update_sla_report(cases_version, window):
+        df = db.get_sla_cases(soon_hours=int(window or 0), limit=MAX_LISTING_ROWS)
         if df.empty:
-            return html.P("No users found", className="text-muted")
-        
-        return dash_table.DataTable(
-            data=df.to_dict('records'),
-            columns=[{'name': col, 'id': col} for col in df.columns],
-            style_table={'overflowX': 'auto'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontFamily': 'Arial'
-            },
-            style_header={
-                'backgroundColor': '#2C3E50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': '#F8F9FA'
-                }
-            ],
-            page_size=10
-        )
+            return html.P("No open case is overdue or due in this window", className="text-muted"), []
+        
+        overdue = df['hours_overdue'] > 0
+        by_priority = df.assign(overdue=overdue).groupby('priority')['overdue'].agg(['sum', 'count'])
+        summary = html.P([
+            html.Strong(f"{int(overdue.sum())} overdue, {int((~overdue).sum())} due soon"),
+            " (" + ', '.join(f"{priority}: {int(row['sum'])} overdue of {int(row['count'])}"
+                             for priority, row in by_priority.iterrows()) + ")",
+            html.Small(f" as of {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC", className="text-muted")
+        ])
+        if len(df) >= MAX_LISTING_ROWS:
+            summary = html.Div([_refine_alert(len(df), f"/export/sla.csv?{urlencode({'hours': window})}"), summary])
+        return summary, df.to_dict('records')
+    
+    # Users table callback
+    @app.callback(
+        Output('users-table', 'data'),
+        Input({'type': 'page-version', 'page': 'users', 'topic': 'users'}, 'data'),
+        prevent_initial_call=True
+    )
+    def update_users_table(users_version):
+        return db.get_all_users().to_dict('records')
     
     # Add user callback
     @app.callback(
@@ -414,6 +630,150 @@ def register_callbacks(app, db):
         else:
             return dbc.Alert(f"Error: {result['error']}", color="danger", duration=3000)
     
+    # User analytics: user filter options follow the users table
+    @app.callback(
+        Output('analytics-user', 'options'),
+        Input({'type': 'page-version', 'page': 'analytics', 'topic': 'users'}, 'data'),
+        prevent_initial_call=True
+    )
+    def update_analytics_user_options(users_version):
+        users = db.get_all_users()
+        return [{'label': 'All Users', 'value': 'all'}] + [
+            {'label': f"{row['full_name']} ({row['username']})", 'value': row['username']}
+            for _, row in users.iterrows()
+        ]
+    
+    # User analytics charts
+    @app.callback(
+        [Output('analytics-logins-chart', 'figure'),
+         Output('analytics-cases-chart', 'figure'),
+         Output('analytics-hourly-heatmap', 'figure')],
+        [Input('analytics-date-range', 'start_date'),
+         Input('analytics-date-range', 'end_date'),
+         Input('analytics-user', 'value'),
+         Input('analytics-source', 'value')]
+    )
+    def update_analytics(start_date, end_date, username, source):
+        end_date = (end_date or datetime.now().strftime('%Y-%m-%d'))[:10]
+        start_date = (start_date or (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d'))[:10]
+        username = None if username in (None, 'all') else username
+        
+        summarize = analytics.raw_log_summary if source == 'raw' else analytics.counter_summary
+        summary = summarize(db, start_date, end_date, username)
+        
+        logins = px.bar(summary['logins_per_day'], x='day', y='count',
+                        labels={'day': 'Date', 'count': 'Logins'})
+        logins.update_traces(marker_color='#3498DB')
+        
+        cases = px.bar(summary['cases_by_user'], x='full_name', y='count',
+                       labels={'full_name': 'User', 'count': 'Cases Created'},
+                       hover_data=['username'])
+        cases.update_traces(marker_color='#27AE60')
+        
+        hourly = px.imshow(summary['hourly'], aspect='auto', color_continuous_scale='Blues',
+                           labels={'x': 'Hour of Day', 'y': 'Weekday', 'color': 'Actions'})
+        
+        return logins, cases, hourly
+    
+    # Activity log page callback: newest page, or the page older than the cursor
+    @app.callback(
+        [Output('activity-table', 'data'),
+         Output('activity-cursor', 'data'),
+         Output('activity-older-button', 'disabled'),
+         Output('activity-alert', 'children'),
+         Output('activity-rollup-table', 'children')],
+        [Input('activity-newest-button', 'n_clicks'),
+         Input('activity-older-button', 'n_clicks'),
+         Input('activity-username', 'n_submit')],
+        [State('activity-username', 'value'),
+         State('activity-cursor', 'data')]
+    )
+    def update_activity_log(newest_clicks, older_clicks, n_submit, username, cursor):
+        # The role comes from the signed login session, not the client-side store
+        if (current_user() or {}).get('role') != 'Admin':
+            return [], None, True, dbc.Alert("The activity log is only available to administrators", color="warning"), None
+        
+        page_size = 50
+        older = ctx.triggered_id == 'activity-older-button'
+        if older and not cursor:
+            return no_update, no_update, True, no_update, no_update
+        
+        df = db.get_activity_log(username=(username or '').strip() or None, limit=page_size,
+                                 before_id=cursor if older else None)
+        next_cursor = int(df['id'].iloc[-1]) if len(df) else None
+        alert = None if len(df) else dbc.Alert("No more activity", color="info")
+        
+        # The rollup only changes when maintenance compacts old months
+        rollup = no_update
+        if not older:
+            rollup_df = db.get_activity_rollup()
+            if rollup_df.empty:
+                rollup = html.P("No months have been compacted yet", className="text-muted")
+            else:
+                rollup_df.columns = ['Month', 'Action', 'Count', 'Users']
+                rollup = dbc.Table.from_dataframe(rollup_df, striped=True, bordered=True, hover=True, size='sm')
+        
+        return df.to_dict('records'), next_cursor, len(df) < page_size, alert, rollup
+    
+    # Notification feed callback: reloads when cases change, since matches are
+    # written as cases are saved
+    @app.callback(
+        [Output('notifications-table', 'data'),
+         Output('notifications-summary', 'children')],
+        [Input({'type': 'page-version', 'page': 'alerts', 'topic': 'cases'}, 'data'),
+         Input('notifications-read-button', 'n_clicks')]
+    )
+    def update_notifications(version, read_clicks):
+        username = (current_user() or {}).get('username')
+        if not username:
+            return [], None
+        if ctx.triggered_id == 'notifications-read-button':
+            alert_rules.mark_read(username)
+        
+        notifications = alert_rules.get_notifications(username)
+        unread = alert_rules.unread_count(username)
+        if not notifications:
+            return [], html.P("No notifications yet. Save a rule below to be told when matching cases come in.",
+                              className="text-muted")
+        return notifications, html.P(f"{unread} unread", className="text-muted")
+    
+    # Alert rules callback: list the user's rules, saving or deleting first
+    @app.callback(
+        [Output('alert-rules-table', 'data'),
+         Output('alert-rules-table', 'selected_rows'),
+         Output('alert-rule-alert', 'children')],
+        [Input('alert-rule-save', 'n_clicks'),
+         Input('alert-rules-delete', 'n_clicks')],
+        [State('alert-rule-name', 'value'),
+         State('alert-rule-crime-type', 'value'),
+         State('alert-rule-priority', 'value'),
+         State('alert-rule-status', 'value'),
+         State('alert-rule-entity-kind', 'value'),
+         State('alert-rule-entity-value', 'value'),
+         State('alert-rules-table', 'data'),
+         State('alert-rules-table', 'selected_rows')]
+    )
+    def update_alert_rules(save_clicks, delete_clicks, name, crime_type, priority, status, entity_kind,
+                           entity_value, rules, selected_rows):
+        # Rules belong to the user of the signed login session, not the client-side store
+        username = (current_user() or {}).get('username')
+        if not username:
+            return [], [], None
+        
+        alert = None
+        if ctx.triggered_id == 'alert-rule-save':
+            if not name:
+                return no_update, no_update, dbc.Alert("Please name the rule", color="warning", duration=4000)
+            result = alert_rules.add_rule(username, name, crime_type, priority, status, entity_kind, entity_value)
+            if not result['success']:
+                return no_update, no_update, dbc.Alert(f"Error: {result['error']}", color="danger", duration=4000)
+            alert = dbc.Alert(f"Rule '{name}' saved", color="success", duration=3000)
+        elif ctx.triggered_id == 'alert-rules-delete' and selected_rows:
+            result = alert_rules.delete_rules(username, [rules[row]['id'] for row in selected_rows])
+            alert = dbc.Alert(f"Deleted {result['deleted']} rule(s)", color="success", duration=3000)
+        
+        return alert_rules.get_rules(username), [], alert
+    
     # Logout callback
     @app.callback(
         [Output('url', 'pathname'),
@@ -425,4 +785,17 @@ def register_callbacks(app, db):
     def logout(n_clicks, session_data):
         if session_data:
             db.log_activity(session_data.get('username', 'unknown'), 'LOGOUT', 'User logged out')
+        session.pop('user', None)
         return '/', None
+
+def _refine_alert(shown, export_url):
+    """Warning for a listing cut off at MAX_LISTING_ROWS, linking the full CSV export"""
+    return dbc.Alert([
+        f"Showing the newest {shown:,} matching cases only. Refine your search to narrow the results, or ",
+        html.A("download all matches as CSV", href=export_url, target="_blank", className="alert-link"),
+        "."
+    ], color="warning", className="mb-3")
+
+def _sla_count(*counts):
+    """Sum of SLA counts, as 'N+' when any of them reached SLA_COUNT_CAP"""
+    return f"{sum(counts):,}" + ('+' if max(counts) >= SLA_COUNT_CAP else '')
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+
+# Case records kept in memory per process
+CASE_CACHE_SIZE = 2048
+
+class CaseCache:
+    """Bounded LRU of CaseRow records in front of Database.get_case_by_id
+    
+    Subscribed to the database's writes, so a committed update drops the
+    case before update_case returns and the next view reads it again. Writes
+    made by other processes are not seen that way, so every hit is checked
+    against the case's current version with one indexed lookup, which is
+    cheaper than reading the row. Archived cases are read-only, so once a
+    case is found archived its entry is trusted as it is. CaseRow is frozen,
+    so cached records are shared between requests as they are.
+    """
+    
+    def __init__(self, db, maxsize=CASE_CACHE_SIZE):
+        self.db = db
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._cases = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+    
+    def get(self, case_id):
+        """Get a case as a CaseRow, or None, from memory when it is cached and current"""
+        with self._lock:
+            entry = self._cases.get(case_id)
+        
+        archived = False
+        if entry is not None:
+            case, archived = entry
+            version = None if archived else self.db.get_case_version(case_id)
+            if archived or version == case.version:
+                with self._lock:
+                    if case_id in self._cases:
+                        self._cases.move_to_end(case_id)
+                    self._hits += 1
+                return case
+            # Gone from the hot database: archived, as the read below finds it
+            archived = version is None
+            self.invalidate(case_id)
+        
+        with self._lock:
+            self._misses += 1
+            generation = self._generation
+        
+        case = self.db.get_case_by_id(case_id)
+        if case is None:
+            return None
+        
+        with self._lock:
+            # A write committed while the row was read may have made it stale
+            if generation == self._generation:
+                self._cases[case_id] = (case, archived)
+                if len(self._cases) > self.maxsize:
+                    self._cases.popitem(last=False)
+                    self._evictions += 1
+        return case
+    
+    def on_change(self, topic, event):
+        """Change feed listener that drops cases as they are written"""
+        if topic != 'cases':
+            return
+        if event.get('action') == 'update':
+            case_ids = [event['case_id']]
+        elif event.get('action') == 'bulk_update':
+            case_ids = event['case_ids']
+        else:
+            # New cases were never cached and archival moves cases unchanged
+            return
+        self.invalidate(*case_ids)
+    
+    def invalidate(self, *case_ids):
+        """Drop cases known or suspected to be stale"""
+        with self._lock:
+            self._generation += 1
+            for case_id in case_ids:
+                if self._cases.pop(case_id, None) is not None:
+                    self._invalidations += 1
+    
+    def stats(self):
+        """Hits, misses, hit rate, evictions, invalidations and size since start (or the last reset)"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'size': len(self._cases),
+                'maxsize': self.maxsize
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._hits = self._misses = self._evictions = self._invalidations = 0
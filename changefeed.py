@@ -0,0 +1,58 @@
+import threading
+import time
+
+# Streams notice writes made by other workers or instances within this long
+POLL_SECONDS = 2
+
+class ChangeFeed:
+    """Data versions per topic, read from the database's change sequences
+    
+    Every worker and instance sees the same versions: 'cases' is the
+    change_seq cursor and 'users' a counter bumped by triggers on the users
+    table. Versions are re-read at most every POLL_SECONDS however many
+    streams are waiting, and at once after a write made in this process.
+    """
+    
+    TOPICS = ('cases', 'users')
+    
+    def __init__(self, db):
+        self.db = db
+        self._condition = threading.Condition()
+        self._versions = None
+        self._read_at = None
+    
+    def _current(self):
+        """Versions as of at most POLL_SECONDS ago; call with the condition held"""
+        now = time.monotonic()
+        if self._read_at is None or now - self._read_at >= POLL_SECONDS:
+            versions = self.db.get_change_versions()
+            self._versions = {topic: versions.get(topic, 0) for topic in self.TOPICS}
+            self._read_at = now
+        return self._versions
+    
+    def publish(self, topic, event=None):
+        """Database listener: re-read the versions and wake up waiting streams after a local write"""
+        with self._condition:
+            self._read_at = None
+            self._condition.notify_all()
+    
+    def version(self, topic):
+        """Get the current version of a topic"""
+        with self._condition:
+            return self._current().get(topic, 0)
+    
+    def versions(self):
+        """Get a snapshot of all topic versions"""
+        with self._condition:
+            return dict(self._current())
+    
+    def wait_for_change(self, known_versions, timeout):
+        """Block until any version differs from known_versions or timeout expires"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                current = self._current()
+                remaining = deadline - time.monotonic()
+                if current != known_versions or remaining <= 0:
+                    return dict(current)
+                self._condition.wait(min(POLL_SECONDS, remaining))
@@ -1,19 +1,433 @@
+import json
+import logging
 import sqlite3
-from datetime import datetime
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
 import pandas as pd
-from pathlib import Path
+
+from queries import CASE_FILTERS, QUERIES, UPDATABLE_CASE_FIELDS, CaseRow, ConnectionPool, partition_table
+from shards import ArchiveShards
+
+logger = logging.getLogger(__name__)
+
+# Columns of the cases table that listing queries may project
+CASE_COLUMNS = tuple(field.name for field in fields(CaseRow))
+
+# Shared by the main database and the archive database
+CASES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {schema}.cases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        case_id TEXT UNIQUE NOT NULL,
+        title TEXT NOT NULL,
+        crime_type TEXT NOT NULL,
+        incident_date DATE NOT NULL,
+        location TEXT,
+        victim_name TEXT,
+        victim_contact TEXT,
+        suspect_name TEXT,
+        suspect_details TEXT,
+        description TEXT,
+        evidence TEXT,
+        priority TEXT DEFAULT 'Medium',
+        status TEXT DEFAULT 'Pending',
+        created_by TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 1,
+        change_seq INTEGER,
+        incident_day INTEGER,
+        created_epoch INTEGER,
+        due_at TIMESTAMP,
+        status_since TIMESTAMP
+    )
+'''
+
+# Integer date keys kept beside the text dates so range filters, ordering and
+# day grouping compare integers through an index: incident_day counts days
+# since 1970-01-01, created_epoch is created_at in seconds since then
+INCIDENT_DAY_SQL = 'CAST(julianday(date({0})) - 2440587.5 AS INTEGER)'
+CREATED_EPOCH_SQL = "CAST(strftime('%s', {0}) AS INTEGER)"
+DATE_KEY_COLUMNS = ('incident_day', 'created_epoch')
+
+# Open-ended ranges are bound to these, so the range stays index-usable
+MIN_DATE_KEY = -(1 << 62)
+MAX_DATE_KEY = 1 << 62
+
+# SLA deadlines: an open case is due its priority's response time after it
+# was opened (Pending) and its resolution time after investigation started,
+# both counted from status_since, when the case entered its status. A status
+# change starts the clock over; a priority or policy change keeps its start
+# and applies the new hours. Resolved and closed cases, and priorities
+# without a policy, have no deadline
+SLA_STATUSES = {'Pending': 'response_hours', 'Under Investigation': 'resolution_hours'}
+DEFAULT_SLA_POLICIES = (
+    ('Critical', 4, 72),
+    ('High', 24, 7 * 24),
+    ('Medium', 72, 14 * 24),
+    ('Low', 7 * 24, 30 * 24)
+)
+DUE_AT_SQL = '''(
+    SELECT datetime({base}, '+' || CASE {status} %s END || ' hours')
+    FROM sla_policies WHERE priority = {priority}
+)''' % ' '.join(f"WHEN '{status}' THEN {column}" for status, column in SLA_STATUSES.items())
+
+# Deadline of a case from its own row; columns are qualified, as sla_policies
+# has a priority column of its own
+SLA_RESCHEDULE_SQL = DUE_AT_SQL.format(base='cases.status_since', status='cases.status', priority='cases.priority')
+
+# Listings of open cases call anything due within this many hours "due soon",
+# and SLA counts stop at SLA_COUNT_CAP so they cost the same however large the
+# backlog is
+SLA_SOON_HOURS = 24
+SLA_COUNT_CAP = 10000
+
+# Every insert or update of a case takes the next number of the 'cases'
+# sequence as its change_seq and stamps updated_at. SQLite has one writer at a
+# time, so sequence order is commit order and change_seq is a safe sync cursor.
+# The same statement refreshes the date keys and the SLA deadline, since a
+# second UPDATE of the row would itself count as a change. Only writes to the
+# editable fields (or version) count: re-timing deadlines after a policy
+# change does not.
+CASE_CHANGE_TRIGGERS_SQL = ('''
+    CREATE TRIGGER IF NOT EXISTS cases_change_after_insert AFTER INSERT ON cases
+    BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE name = 'cases';
+        UPDATE cases SET change_seq = (SELECT value FROM change_sequence WHERE name = 'cases'),
+                         incident_day = {incident_day},
+                         created_epoch = {created_epoch},
+                         due_at = {insert_due_at},
+                         status_since = NEW.created_at
+        WHERE id = NEW.id;
+    END
+''', '''
+    CREATE TRIGGER IF NOT EXISTS cases_change_after_update AFTER UPDATE OF {tracked_columns} ON cases
+    WHEN NEW.change_seq IS OLD.change_seq
+    BEGIN
+        UPDATE change_sequence SET value = value + 1 WHERE name = 'cases';
+        UPDATE cases SET change_seq = (SELECT value FROM change_sequence WHERE name = 'cases'),
+                         updated_at = CURRENT_TIMESTAMP,
+                         incident_day = {incident_day},
+                         created_epoch = {created_epoch},
+                         due_at = CASE WHEN NEW.status IS NOT OLD.status THEN {restart_due_at}
+                                       WHEN NEW.priority IS NOT OLD.priority THEN {retime_due_at}
+                                       ELSE NEW.due_at END,
+                         status_since = CASE WHEN NEW.status IS OLD.status THEN NEW.status_since
+                                             ELSE CURRENT_TIMESTAMP END
+        WHERE id = NEW.id;
+    END
+''')
+CASE_CHANGE_TRIGGERS_SQL = tuple(
+    trigger.format(tracked_columns=', '.join(UPDATABLE_CASE_FIELDS + ('version',)),
+                   incident_day=INCIDENT_DAY_SQL.format('NEW.incident_date'),
+                   created_epoch=CREATED_EPOCH_SQL.format('NEW.created_at'),
+                   insert_due_at=DUE_AT_SQL.format(base='NEW.created_at', status='NEW.status', priority='NEW.priority'),
+                   restart_due_at=DUE_AT_SQL.format(base='CURRENT_TIMESTAMP', status='NEW.status',
+                                                    priority='NEW.priority'),
+                   retime_due_at=DUE_AT_SQL.format(base='NEW.status_since', status='NEW.status',
+                                                   priority='NEW.priority'))
+    for trigger in CASE_CHANGE_TRIGGERS_SQL
+)
+
+# Largest page get_changes_since returns
+MAX_CHANGES_PAGE = 1000
+
+# Case listings shown in the UI stop at this many rows (the result is marked
+# truncated); iter_cases reads any number of rows this many at a time
+MAX_LISTING_ROWS = 5000
+CASE_CHUNK_ROWS = 2000
+
+# Closed cases whose last update is older than this are moved to the archive
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_STATUSES = ('Closed', 'Resolved')
+
+# The activity log is one table per month, activity_log_YYYYMM, behind an
+# activity_log view. Ids start at month_index << 32 in each partition, so they
+# are unique and ordered across partitions and id >> 32 names the partition.
+ACTIVITY_PARTITION_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+ACTIVITY_COLUMNS = ('id', 'username', 'action', 'details', 'timestamp')
+
+# Months of full activity detail kept; older months are summarized into
+# activity_rollup and their partitions dropped
+ACTIVITY_RETENTION_MONTHS = 12
+
+def _activity_month_index(month):
+    """'2025-03' -> 2025 * 12 + 2"""
+    year, month = month.split('-')
+    return int(year) * 12 + int(month) - 1
+
+def _activity_partition(month_index):
+    """Partition table name for a month index, e.g. activity_log_202503"""
+    return f"activity_log_{month_index // 12:04d}{month_index % 12 + 1:02d}"
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _day_number(date_text):
+    """incident_day of a 'YYYY-MM-DD...' date, as INCIDENT_DAY_SQL computes it"""
+    return (datetime.fromisoformat(date_text[:10]) - _EPOCH).days
+
+def _epoch_seconds(date_text, days=0):
+    """created_epoch at midnight of a 'YYYY-MM-DD...' date plus days, as CREATED_EPOCH_SQL computes it"""
+    return (_day_number(date_text) + days) * 86400
+
+def _like_pattern(text):
+    """'%text%' for LIKE ... ESCAPE '\\', with the text's own wildcards escaped; None for no text"""
+    if not text:
+        return None
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def _sla_window(soon_hours):
+    """Now and now + soon_hours in UTC, in the format of due_at"""
+    now = datetime.now(timezone.utc)
+    return now.strftime('%Y-%m-%d %H:%M:%S'), (now + timedelta(hours=soon_hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+def _case_select_list(columns=None):
+    """Build a validated SELECT column list; None selects every column"""
+    if columns is None:
+        return '*'
+    
+    unknown = [column for column in columns if column not in CASE_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Invalid case columns: {unknown or columns}")
+    return ', '.join(columns)
 
 class Database:
-    def __init__(self, db_path='/tmp/cybercrime.db'):
+    def __init__(self, db_path='/tmp/cybercrime.db', archive_path=None, shard_by_year=False):
         self.db_path = db_path
+        self._archive = ArchiveShards(db_path, archive_path, by_year=shard_by_year)
+        self.archive_path = self._archive.archive_path
+        self._listeners = []
+        self._tracers = []
+        self._activity_partitions = set()
+        self._pool = ConnectionPool(self.db_path)
         self.init_database()
     
+    def subscribe(self, listener):
+        """Register a callable invoked as listener(topic, event) after each committed write"""
+        self._listeners.append(listener)
+    
+    def _notify(self, topic, **event):
+        """Tell subscribers that a write to a topic ('cases', 'users') was committed"""
+        for listener in self._listeners:
+            try:
+                listener(topic, event)
+            except Exception:
+                # The write is committed either way; one failing listener must not starve the rest
+                logger.exception('Listener %r failed on %s %s', listener, topic, event.get('action'))
+    
+    def trace_statements(self, tracer):
+        """Register a callable invoked with the SQL of every statement run on later connections"""
+        self._tracers.append(tracer)
+    
+    def _trace(self, statement):
+        for tracer in self._tracers:
+            tracer(statement)
+    
     def get_connection(self):
-        """Create a database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Take a pooled connection to the hot database; close() returns it"""
+        conn = self._pool.acquire()
+        if self._tracers:
+            conn.set_trace_callback(self._trace)
         return conn
     
+    def _frame(self, conn, name, params=(), **identifiers):
+        """Run a registered query into a DataFrame"""
+        return pd.read_sql_query(QUERIES[name].render(**identifiers), conn, params=params)
+    
+    def fan_out(self, sql, params=(), archive_paths=None, cache=False, include_hot=True):
+        """Run one SELECT on the hot database and on archive files in parallel
+        
+        Returns one DataFrame per source, the hot database first. archive_paths
+        defaults to every archive file; with cache, archive results are reused
+        until their file changes. The hot read runs on the calling thread, so
+        statement tracing still sees it.
+        """
+        if archive_paths is None:
+            archive_paths = self._archive.paths()
+        futures = [self._archive.submit(path, sql, params, cache=cache) for path in archive_paths]
+        
+        frames = []
+        if include_hot:
+            conn = self.get_connection()
+            frames.append(pd.read_sql_query(sql, conn, params=params))
+            conn.close()
+        return frames + [future.result() for future in futures]
+    
+    def get_archive_summary(self):
+        """Get cached counts and date bounds over all archive files, or None if nothing is archived"""
+        summaries = [summary for summary in map(self._archive.summary, self._archive.paths()) if summary]
+        if not summaries:
+            return None
+        
+        combined = {
+            'count': sum(summary['count'] for summary in summaries),
+            'by_type': {},
+            'by_status': {}
+        }
+        for bound, pick in (('min', min), ('max', max)):
+            for column in ('incident_date', 'created_at'):
+                combined[f'{bound}_{column}'] = pick(summary[f'{bound}_{column}'] for summary in summaries)
+        for summary in summaries:
+            for key in ('by_type', 'by_status'):
+                for value, count in summary[key].items():
+                    combined[key][value] = combined[key].get(value, 0) + count
+        return combined
+    
+    def archive_overlaps(self, start_date=None, end_date=None, column='incident_date'):
+        """Check whether a date range on incident_date or created_at can match archived cases"""
+        return bool(self._archive.overlapping(start_date, end_date, column))
+    
+    def archive_closed_cases(self, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=500):
+        """Move closed/resolved cases not updated for older_than_days into the archive
+        
+        With shard_by_year each case goes to the file for its year. Each batch
+        is copied and deleted in one transaction spanning both files, and the
+        copy is INSERT OR IGNORE, so a crash at any point loses nothing and
+        simply re-running the archival finishes the job.
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+        columns = ', '.join(CASE_COLUMNS + DATE_KEY_COLUMNS)
+        moved = 0
+        written = set()
+        attached = None
+        
+        conn = self.get_connection()
+        try:
+            while True:
+                batch = {}
+                for row in QUERIES['archivable_cases'].execute(conn, {
+                    'statuses': json.dumps(ARCHIVE_STATUSES), 'cutoff': cutoff, 'batch_size': batch_size
+                }):
+                    batch.setdefault(self._archive.path_for(row['case_id'], row['created_at']), []).append(row['id'])
+                if not batch:
+                    break
+                
+                for path, ids in batch.items():
+                    if path != attached:
+                        if attached:
+                            conn.execute('DETACH DATABASE archive')
+                        self._attach_archive(conn, path)
+                        attached = path
+                    
+                    with conn:
+                        QUERIES['copy_to_archive'].execute(conn, {'ids': json.dumps(ids)}, columns=columns)
+                        QUERIES['delete_archived'].execute(conn, {'ids': json.dumps(ids)})
+                    moved += len(ids)
+                    written.add(path)
+        finally:
+            if attached:
+                conn.execute('DETACH DATABASE archive')
+            conn.close()
+        
+        for path in written:
+            self._archive.forget(path)
+        if moved:
+            self._notify('cases', action='archive', count=moved)
+        return {'success': True, 'archived': moved, 'files': sorted(written)}
+    
+    def _attach_archive(self, conn, path):
+        """Attach an archive file as 'archive', creating or upgrading its cases table"""
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+        try:
+            self._init_archive(conn)
+        except Exception:
+            conn.rollback()
+            conn.execute('DETACH DATABASE archive')
+            raise
+    
+    def _init_archive(self, conn):
+        """Create or upgrade the cases table of the attached archive file"""
+        conn.execute(CASES_TABLE_SQL.format(schema='archive'))
+        self._ensure_column(conn, 'cases', 'version', 'INTEGER NOT NULL DEFAULT 1', schema='archive')
+        
+        # Archived rows never change, so their date keys are filled in once
+        if 'created_epoch' not in [row[1] for row in conn.execute('PRAGMA archive.table_info(cases)')]:
+            for column in DATE_KEY_COLUMNS:
+                self._ensure_column(conn, 'cases', column, 'INTEGER', schema='archive')
+            self._fill_date_keys(conn, 'archive')
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_incident_date ON cases (incident_date)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_created_at ON cases (created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_incident_day ON cases (incident_day)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_created_epoch ON cases (created_epoch)')
+        conn.commit()
+    
+    def _case_listing_sql(self, columns, case_filter, sort_key=False):
+        """Rendered listing query; sort_key adds created_epoch for merging sources newest first"""
+        select = _case_select_list(columns)
+        if sort_key and columns is not None:
+            select += ', created_epoch'
+        return QUERIES['cases'].render(columns=select, filter=CASE_FILTERS[case_filter])
+    
+    def _read_cases(self, columns=None, case_filter='all', params=None, archive_paths=(), max_rows=None):
+        """Read cases matching a CASE_FILTERS entry, newest first, from the hot database and archive files
+        
+        Every source is read in parallel with the same LIMIT and the results
+        merged on created_epoch. With max_rows, at most that many rows are
+        returned and df.attrs['truncated'] tells whether more matched; archive
+        files are then only read if they can hold rows newer than the hot
+        database's page.
+        """
+        params = {**(params or {}), 'max_rows': -1 if max_rows is None else max_rows + 1}
+        
+        if archive_paths:
+            sql = self._case_listing_sql(columns, case_filter, sort_key=True)
+            if max_rows is None:
+                frames = self.fan_out(sql, params, archive_paths)
+            else:
+                # A full page from the hot database rules out files holding only older cases
+                hot = self.fan_out(sql, params, archive_paths=[])[0]
+                oldest = hot['created_epoch'].iloc[-1] if len(hot) > max_rows else None
+                if pd.notna(oldest):
+                    archive_paths = self._archive.newer_than(archive_paths, oldest)
+                frames = [hot] + self.fan_out(sql, params, archive_paths, include_hot=False)
+            df = pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+            df = df.sort_values('created_epoch', ascending=False, kind='stable', ignore_index=True)
+            if columns is not None:
+                df = df.drop(columns='created_epoch')
+        else:
+            conn = self.get_connection()
+            df = pd.read_sql_query(self._case_listing_sql(columns, case_filter), conn, params=params)
+            conn.close()
+        
+        if max_rows is not None:
+            truncated = len(df) > max_rows
+            df = df.iloc[:max_rows]
+            df.attrs['truncated'] = truncated
+        return df
+    
+    def _iter_cases(self, columns=None, case_filter='all', params=None, archive_paths=(),
+                    chunksize=CASE_CHUNK_ROWS, include_hot=True):
+        """Like _read_cases, but yield DataFrames of at most chunksize rows, one source after another
+        
+        Rows are newest first within the hot database and within each archive
+        file, and the archive files come newest year first.
+        """
+        sql = self._case_listing_sql(columns, case_filter)
+        params = {**(params or {}), 'max_rows': -1}
+        
+        if include_hot:
+            conn = self.get_connection()
+            try:
+                yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+            finally:
+                conn.close()
+        
+        for path in archive_paths:
+            conn = self._archive.connect(path)
+            try:
+                yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+            finally:
+                conn.close()
+    
     def init_database(self):
         """Initialize database with required tables"""
         conn = self.get_connection()
@@ -34,38 +448,208 @@ class Database:
         ''')
         
         # Cases table
+        cursor.execute(CASES_TABLE_SQL.format(schema='main'))
+        self._ensure_column(cursor, 'cases', 'version', 'INTEGER NOT NULL DEFAULT 1')
+        
+        # Field-level change history written by update_case
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                case_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                old_value TEXT,
+                new_value TEXT,
+                changed_by TEXT,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_case_history_case_id ON case_history (case_id, id)')
+        
+        # Archival picks old closed cases by status and age
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cases_status_updated_at
+            ON cases (status, updated_at)
+        ''')
+        
+        # Incremental refresh of the reporting snapshot reads by updated_at (snapshot.py)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cases_updated_at ON cases (updated_at)')
+        
+        # Change sequence for sync consumers (get_changes_since) and the integer date keys
+        self._init_case_changes(conn)
+        for path in self._archive.paths():
+            self._attach_archive(conn, path)
+            conn.execute('DETACH DATABASE archive')
+        
+        # Activity log: monthly partitions behind a view, plus per-month
+        # summaries of partitions past retention
+        self._init_activity_log(conn)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS activity_rollup (
+                month TEXT NOT NULL,
+                username TEXT NOT NULL,
+                action TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                first_at TIMESTAMP,
+                last_at TIMESTAMP,
+                PRIMARY KEY (month, username, action)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Activity counts per user, action and UTC hour ('YYYY-MM-DD HH'),
+        # maintained by log_activity for the analytics page. username '*' and
+        # action '*' rows hold the totals, so no chart has to sum across users.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS activity_counters (
+                username TEXT NOT NULL,
+                action TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (username, action, hour)
+            ) WITHOUT ROWID
+        ''')
+        if not QUERIES['has_activity_counters'].execute(conn).fetchone():
+            self.rebuild_activity_counters(conn)
+        
+        # Evidence blobs are stored once per SHA-256, however many cases attach them
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cases (
+            CREATE TABLE IF NOT EXISTS evidence_blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Evidence files attached to cases
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS evidence_files (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                case_id TEXT UNIQUE NOT NULL,
-                title TEXT NOT NULL,
+                case_id TEXT NOT NULL,
+                sha256 TEXT NOT NULL REFERENCES evidence_blobs (sha256),
+                filename TEXT NOT NULL,
+                content_type TEXT,
+                size INTEGER NOT NULL,
+                uploaded_by TEXT,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_files_case_id ON evidence_files (case_id)')
+        
+        # MinHash signatures and LSH buckets for duplicate detection (similarity.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_signatures (
+                case_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                case_id TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, case_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Inverted index of normalized suspects, victims, contacts and places (entities.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                case_count INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (kind, value)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_entities (
+                entity_id INTEGER NOT NULL,
+                case_id TEXT NOT NULL,
+                PRIMARY KEY (entity_id, case_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_case_entities_case_id ON case_entities (case_id)')
+        
+        # Canonical location dimension, raw text -> location mapping and
+        # per-location case counts (locations.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS locations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                state TEXT NOT NULL,
+                zone TEXT NOT NULL,
+                UNIQUE (name, state)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS location_aliases (
+                alias TEXT PRIMARY KEY,
+                location_id INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS location_case_counts (
+                location_id INTEGER NOT NULL,
                 crime_type TEXT NOT NULL,
-                incident_date DATE NOT NULL,
-                location TEXT,
-                victim_name TEXT,
-                victim_contact TEXT,
-                suspect_name TEXT,
-                suspect_details TEXT,
-                description TEXT,
-                evidence TEXT,
-                priority TEXT DEFAULT 'Medium',
-                status TEXT DEFAULT 'Pending',
-                created_by TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                case_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (location_id, crime_type)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Standing searches and the notifications they raise (alerts.py). Rule
+        # changes bump the 'alert_rules' change sequence, which tells each
+        # process to recompile its matcher
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL,
+                name TEXT NOT NULL,
+                crime_type TEXT,
+                priority TEXT,
+                status TEXT,
+                entity_kind TEXT,
+                entity_value TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_rules_owner ON alert_rules (owner, id)')
+        cursor.execute("INSERT OR IGNORE INTO change_sequence (name, value) VALUES ('alert_rules', 0)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS alert_rules_after_{event.lower()} AFTER {event} ON alert_rules
+                BEGIN
+                    UPDATE change_sequence SET value = value + 1 WHERE name = 'alert_rules';
+                END
+            ''')
         
-        # Activity log table
+        # Account and login writes bump the 'users' change sequence; with the
+        # 'cases' one it gives every process the same data versions (changefeed.py)
+        cursor.execute("INSERT OR IGNORE INTO change_sequence (name, value) VALUES ('users', 0)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS users_after_{event.lower()} AFTER {event} ON users
+                BEGIN
+                    UPDATE change_sequence SET value = value + 1 WHERE name = 'users';
+                END
+            ''')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_log (
+            CREATE TABLE IF NOT EXISTS notifications (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT NOT NULL,
+                rule_id INTEGER NOT NULL,
+                rule_name TEXT NOT NULL,
+                case_id TEXT NOT NULL,
                 action TEXT NOT NULL,
-                details TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                message TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                read_at TIMESTAMP
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_notifications_username ON notifications (username, id)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications (username)
+            WHERE read_at IS NULL
+        ''')
         
         # Insert default admin user if not exists
         cursor.execute('''
@@ -76,16 +660,177 @@ class Database:
         conn.commit()
         conn.close()
     
+    def _init_case_changes(self, conn):
+        """Create the change sequence and its triggers, numbering existing cases by updated_at"""
+        self._ensure_column(conn, 'cases', 'change_seq', 'INTEGER')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS change_sequence (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("INSERT OR IGNORE INTO change_sequence (name, value) VALUES ('cases', 0)")
+        
+        # Cases written before the triggers existed are numbered in update order
+        if conn.execute('SELECT 1 FROM cases WHERE change_seq IS NULL LIMIT 1').fetchone():
+            conn.execute('''
+                WITH numbered AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY updated_at, id)
+                               + (SELECT value FROM change_sequence WHERE name = 'cases') AS seq
+                    FROM cases WHERE change_seq IS NULL
+                )
+                UPDATE cases SET change_seq = numbered.seq FROM numbered WHERE cases.id = numbered.id
+            ''')
+            conn.execute('''
+                UPDATE change_sequence SET value = (SELECT MAX(change_seq) FROM cases) WHERE name = 'cases'
+            ''')
+        
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_cases_change_seq ON cases (change_seq)')
+        self._init_date_keys(conn)
+        self._init_due_dates(conn)
+        for trigger in CASE_CHANGE_TRIGGERS_SQL:
+            conn.execute(trigger)
+        conn.commit()
+    
+    def _init_date_keys(self, conn):
+        """Add and index the integer date keys, filling them in for cases written before they existed
+        
+        Change triggers from before the keys do not maintain them, so they are
+        dropped first; that also keeps the fill-in from counting as a change.
+        """
+        for column in DATE_KEY_COLUMNS:
+            self._ensure_column(conn, 'cases', column, 'INTEGER')
+        
+        current = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'cases_change_after_insert' "
+            "AND sql LIKE '%incident_day%'"
+        ).fetchone()
+        if not current:
+            conn.execute('DROP TRIGGER IF EXISTS cases_change_after_insert')
+            conn.execute('DROP TRIGGER IF EXISTS cases_change_after_update')
+            self._fill_date_keys(conn, 'main')
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cases_incident_day ON cases (incident_day)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cases_created_epoch ON cases (created_epoch)')
+    
+    def _init_due_dates(self, conn):
+        """Create the SLA policies and the due_at and status_since columns and index, filling them in for existing cases
+        
+        As with the date keys, change triggers from before status_since are
+        dropped first. Existing Pending cases are taken to be in their status
+        since they were opened, and other cases since their last update.
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sla_policies (
+                priority TEXT PRIMARY KEY,
+                response_hours INTEGER NOT NULL,
+                resolution_hours INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.executemany('''
+            INSERT OR IGNORE INTO sla_policies (priority, response_hours, resolution_hours) VALUES (?, ?, ?)
+        ''', DEFAULT_SLA_POLICIES)
+        self._ensure_column(conn, 'cases', 'due_at', 'TIMESTAMP')
+        self._ensure_column(conn, 'cases', 'status_since', 'TIMESTAMP')
+        
+        current = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'cases_change_after_update' "
+            "AND sql LIKE '%status_since%'"
+        ).fetchone()
+        if not current:
+            conn.execute('DROP TRIGGER IF EXISTS cases_change_after_insert')
+            conn.execute('DROP TRIGGER IF EXISTS cases_change_after_update')
+            conn.execute('''
+                UPDATE cases SET status_since = CASE status WHEN 'Pending' THEN created_at ELSE updated_at END
+                WHERE status_since IS NULL
+            ''')
+            conn.execute(f'''
+                UPDATE cases SET due_at = {SLA_RESCHEDULE_SQL}
+            ''')
+        
+        # Overdue and due-soon listings walk this index from the oldest deadline
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cases_status_due_at ON cases (status, due_at)')
+    
+    def _fill_date_keys(self, conn, schema):
+        """Compute the date keys of every case in a schema from its text dates"""
+        conn.execute(f'''
+            UPDATE {schema}.cases SET incident_day = {INCIDENT_DAY_SQL.format('incident_date')},
+                                      created_epoch = {CREATED_EPOCH_SQL.format('created_at')}
+        ''')
+    
+    def _init_activity_log(self, conn):
+        """Split a legacy single activity_log table into monthly partitions, then (re)create the view"""
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activity_log'"
+        ).fetchone()
+        if legacy:
+            # DDL is transactional in SQLite: the split happens entirely or not at all
+            conn.execute('BEGIN')
+            conn.execute('ALTER TABLE activity_log RENAME TO activity_log_legacy')
+            months = [row[0] for row in conn.execute(
+                "SELECT DISTINCT substr(timestamp, 1, 7) FROM activity_log_legacy ORDER BY 1"
+            )]
+            for month in months:
+                table = self._ensure_activity_partition(conn, _activity_month_index(month))
+                conn.execute(f'''
+                    INSERT INTO {table} (username, action, details, timestamp)
+                    SELECT username, action, details, timestamp FROM activity_log_legacy
+                    WHERE substr(timestamp, 1, 7) = ? ORDER BY id
+                ''', (month,))
+            conn.execute('DROP TABLE activity_log_legacy')
+        
+        self._create_activity_view(conn)
+        conn.commit()
+    
+    def _activity_partition_tables(self, conn):
+        """Names of the existing activity partitions, newest first"""
+        return [partition_table(row[0]) for row in QUERIES['activity_partitions'].execute(conn)]
+    
+    def _ensure_activity_partition(self, conn, month_index):
+        """Create the partition for a month if needed and return its table name"""
+        table = _activity_partition(month_index)
+        if table in self._activity_partitions:
+            return table
+        
+        conn.execute(ACTIVITY_PARTITION_SQL.format(table=table))
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_username ON {table} (username, id)')
+        
+        # Start this month's ids at month_index << 32
+        QUERIES['seed_partition_sequence'].execute(conn, {'table': table, 'seq': month_index << 32})
+        
+        self._create_activity_view(conn)
+        self._activity_partitions.add(table)
+        return table
+    
+    def _create_activity_view(self, conn):
+        """Point the activity_log view at the current set of partitions"""
+        tables = self._activity_partition_tables(conn)
+        columns = ', '.join(ACTIVITY_COLUMNS)
+        if tables:
+            body = ' UNION ALL '.join(f'SELECT {columns} FROM {table}' for table in tables)
+        else:
+            body = f"SELECT {', '.join(f'NULL AS {column}' for column in ACTIVITY_COLUMNS)} WHERE 0"
+        conn.execute('DROP VIEW IF EXISTS activity_log')
+        conn.execute(f'CREATE VIEW activity_log AS {body}')
+    
+    def _ensure_column(self, cursor, table, column, definition, schema='main'):
+        """Add a column to an existing table if an older database lacks it"""
+        columns = [row[1] for row in cursor.execute(f'PRAGMA {schema}.table_info({table})')]
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {column} {definition}')
+    
     def generate_case_id(self):
         """Generate a unique case ID"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        # Get the count of existing cases
-        cursor.execute('SELECT COUNT(*) as count FROM cases')
-        count = cursor.fetchone()['count']
+        # Get the count of existing cases, archived ones included
+        count = QUERIES['count_cases'].execute(conn).fetchone()[0]
         conn.close()
         
+        summary = self.get_archive_summary()
+        if summary:
+            count += summary['count']
+        
         # Generate case ID in format: CYB-YYYY-XXXX
         year = datetime.now().year
         case_number = str(count + 1).zfill(4)
@@ -94,33 +839,26 @@ class Database:
     def add_case(self, case_data):
         """Add a new case to the database"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         case_id = self.generate_case_id()
         
         try:
-            cursor.execute('''
-                INSERT INTO cases (
-                    case_id, title, crime_type, incident_date, location,
-                    victim_name, victim_contact, suspect_name, suspect_details,
-                    description, evidence, priority, status, created_by
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                case_id,
-                case_data.get('title'),
-                case_data.get('crime_type'),
-                case_data.get('incident_date'),
-                case_data.get('location'),
-                case_data.get('victim_name'),
-                case_data.get('victim_contact'),
-                case_data.get('suspect_name'),
-                case_data.get('suspect_details'),
-                case_data.get('description'),
-                case_data.get('evidence'),
-                case_data.get('priority', 'Medium'),
-                case_data.get('status', 'Pending'),
-                case_data.get('created_by', 'system')
-            ))
+            QUERIES['insert_case'].execute(conn, {
+                'case_id': case_id,
+                'title': case_data.get('title'),
+                'crime_type': case_data.get('crime_type'),
+                'incident_date': case_data.get('incident_date'),
+                'location': case_data.get('location'),
+                'victim_name': case_data.get('victim_name'),
+                'victim_contact': case_data.get('victim_contact'),
+                'suspect_name': case_data.get('suspect_name'),
+                'suspect_details': case_data.get('suspect_details'),
+                'description': case_data.get('description'),
+                'evidence': case_data.get('evidence'),
+                'priority': case_data.get('priority', 'Medium'),
+                'status': case_data.get('status', 'Pending'),
+                'created_by': case_data.get('created_by', 'system')
+            })
             
             conn.commit()
             
@@ -132,113 +870,243 @@ class Database:
             )
             
             conn.close()
-            return {'success': True, 'case_id': case_id}
         except Exception as e:
             conn.close()
             return {'success': False, 'error': str(e)}
+        
+        self._notify('cases', action='create', case_id=case_id)
+        return {'success': True, 'case_id': case_id}
     
-    def get_all_cases(self, status_filter='all'):
-        """Get all cases, optionally filtered by status"""
-        conn = self.get_connection()
+    def get_all_cases(self, status_filter='all', columns=None, include_archive=False, search_text=None,
+                      max_rows=None):
+        """Get all cases, optionally filtered by status and text, and projected to columns
         
-        if status_filter == 'all':
-            query = 'SELECT * FROM cases ORDER BY created_at DESC'
-            df = pd.read_sql_query(query, conn)
-        else:
-            query = 'SELECT * FROM cases WHERE status = ? ORDER BY created_at DESC'
-            df = pd.read_sql_query(query, conn, params=(status_filter,))
+        search_text matches any of the case list's columns. Archived cases are
+        left out unless include_archive is set. With max_rows, see _read_cases.
+        """
+        archive_paths = self._archive.overlapping() if include_archive else ()
+        return self._read_cases(columns, 'listing', self._listing_params(status_filter, search_text),
+                                archive_paths=archive_paths, max_rows=max_rows)
+    
+    def iter_all_cases(self, status_filter='all', columns=None, include_archive=False, search_text=None,
+                       chunksize=CASE_CHUNK_ROWS):
+        """get_all_cases as a generator of DataFrames with at most chunksize rows each"""
+        archive_paths = self._archive.overlapping() if include_archive else ()
+        return self._iter_cases(columns, 'listing', self._listing_params(status_filter, search_text),
+                                archive_paths=archive_paths, chunksize=chunksize)
+    
+    def iter_archived_cases(self, columns=None, chunksize=CASE_CHUNK_ROWS):
+        """Every archived case as a generator of DataFrames with at most chunksize rows each
         
-        conn.close()
-        return df
+        Only archive files are read, so the hot database can be written while
+        the generator is open.
+        """
+        return self._iter_cases(columns, archive_paths=self._archive.paths(), chunksize=chunksize, include_hot=False)
+    
+    def _listing_params(self, status_filter, search_text):
+        return {'status': None if status_filter in (None, 'all') else status_filter,
+                'pattern': _like_pattern(search_text)}
     
     def get_case_by_id(self, case_id):
-        """Get a specific case by ID"""
+        """Get a specific case by ID as a CaseRow, or None"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM cases WHERE case_id = ?', (case_id,))
-        case = cursor.fetchone()
+        case = QUERIES['case_by_id'].execute(conn, (case_id,)).fetchone()
         conn.close()
         
-        return dict(case) if case else None
+        # Fall back to the archive file(s) its year routes to for old closed cases
+        if not case:
+            for path in self._archive.paths_for_case_ids([case_id]):
+                conn = self._archive.connect(path)
+                case = QUERIES['case_by_id'].execute(conn, (case_id,)).fetchone()
+                conn.close()
+                if case:
+                    break
+        
+        return case
     
-    def update_case(self, case_id, updates):
-        """Update a case"""
+    def get_case_version(self, case_id):
+        """Version of a case in the hot database, or None (archived or unknown), off the case_id index"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        row = QUERIES['case_version'].execute(conn, (case_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+    
+    def get_cases_by_ids(self, case_ids, columns=None):
+        """Get several cases by ID, including archived ones"""
+        case_ids = list(case_ids)
+        if not case_ids:
+            return self._read_cases(columns, 'none')
+        return self._read_cases(columns, 'ids', {'case_ids': json.dumps(case_ids)},
+                                archive_paths=self._archive.paths_for_case_ids(case_ids))
+    
+    def update_case(self, case_id, updates, expected_version=None, changed_by='system'):
+        """Update a case, writing only changed fields, guarded by the case version
         
-        set_clause = ', '.join([f"{key} = ?" for key in updates.keys()])
-        values = list(updates.values())
-        values.append(case_id)
+        Pass the version the editor loaded as expected_version: if someone else
+        saved in between, nothing is written and the result has conflict=True.
+        """
+        invalid = [key for key in updates if key not in UPDATABLE_CASE_FIELDS]
+        if invalid:
+            return {'success': False, 'error': f"Invalid fields: {', '.join(invalid)}"}
+        
+        conn = self.get_connection()
         
         try:
-            cursor.execute(f'''
-                UPDATE cases 
-                SET {set_clause}, updated_at = CURRENT_TIMESTAMP
-                WHERE case_id = ?
-            ''', values)
+            current = QUERIES['case_by_id'].execute(conn, (case_id,)).fetchone()
+            if not current:
+                conn.close()
+                return {'success': False, 'error': 'Case not found'}
+            
+            version = current.version if expected_version is None else expected_version
+            changes = {key: value for key, value in updates.items() if getattr(current, key) != value}
+            if not changes and current.version == version:
+                conn.close()
+                return {'success': True, 'version': version, 'changed': []}
+            
+            params = {'case_id': case_id, 'version': version}
+            for field in UPDATABLE_CASE_FIELDS:
+                params[f'set_{field}'] = field in changes
+                params[field] = changes.get(field)
+            cursor = QUERIES['update_case'].execute(conn, params)
+            
+            if cursor.rowcount == 0:
+                conn.rollback()
+                conn.close()
+                return {'success': False, 'conflict': True, 'version': current.version,
+                        'error': 'This case was changed by someone else. Reload it and try again.'}
+            
+            QUERIES['insert_case_history'].executemany(conn, [
+                (case_id, version + 1, key, getattr(current, key), value, changed_by)
+                for key, value in changes.items()
+            ])
             
             conn.commit()
             conn.close()
-            return {'success': True}
         except Exception as e:
             conn.close()
             return {'success': False, 'error': str(e)}
+        
+        changed = {key: (getattr(current, key), value) for key, value in changes.items()}
+        self._notify('cases', action='update', case_id=case_id, changes=changed)
+        return {'success': True, 'version': version + 1, 'changed': list(changes)}
     
-    def search_cases(self, search_text='', crime_type='all', start_date=None, end_date=None):
-        """Search cases with filters"""
+    def bulk_update_status(self, case_ids, status, changed_by='system', batch_size=500):
+        """Set the status of many cases with one UPDATE per batch instead of one per case"""
+        updated = 0
+        old_statuses = {}
         conn = self.get_connection()
         
-        query = 'SELECT * FROM cases WHERE 1=1'
-        params = []
-        
-        if search_text:
-            query += ' AND (case_id LIKE ? OR title LIKE ? OR victim_name LIKE ? OR suspect_name LIKE ?)'
-            search_pattern = f'%{search_text}%'
-            params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
-        
-        if crime_type != 'all':
-            query += ' AND crime_type = ?'
-            params.append(crime_type)
-        
-        if start_date:
-            query += ' AND incident_date >= ?'
-            params.append(start_date)
+        try:
+            for start in range(0, len(case_ids), batch_size):
+                params = {'status': status, 'changed_by': changed_by,
+                          'case_ids': json.dumps(list(case_ids[start:start + batch_size]))}
+                
+                with conn:
+                    targets = QUERIES['bulk_status_targets'].execute(conn, params).fetchall()
+                    QUERIES['bulk_status_history'].execute(conn, params)
+                    updated += QUERIES['bulk_status_update'].execute(conn, params).rowcount
+                old_statuses.update((row['case_id'], row['status']) for row in targets)
+            conn.close()
+        except Exception as e:
+            conn.close()
+            return {'success': False, 'error': str(e), 'updated': updated}
         
-        if end_date:
-            query += ' AND incident_date <= ?'
-            params.append(end_date)
+        if updated:
+            self._notify('cases', action='bulk_update', case_ids=list(case_ids), status=status,
+                         old_statuses=old_statuses)
+        return {'success': True, 'updated': updated}
+    
+    def get_changes_since(self, cursor=0, limit=500, columns=None):
+        """Cases inserted or updated after a cursor, oldest change first
         
-        query += ' ORDER BY created_at DESC'
+        The cursor is the change_seq of the last change a consumer has seen (0
+        to start); pass back the returned cursor to get the next page. Each page
+        is a range read on idx_cases_change_seq, so a poll costs O(changes).
+        Archiving moves a case without changing it, so it is not a change.
+        """
+        limit = max(1, min(int(limit), MAX_CHANGES_PAGE))
+        conn = self.get_connection()
+        rows = QUERIES['changes_since'].execute(conn, (int(cursor), limit + 1),
+                                                columns=_case_select_list(columns)).fetchall()
+        conn.close()
         
-        df = pd.read_sql_query(query, conn, params=params)
+        changes = [dict(row) for row in rows[:limit]]
+        return {
+            'changes': changes,
+            'cursor': changes[-1]['change_seq'] if changes else int(cursor),
+            'has_more': len(rows) > limit
+        }
+    
+    def get_change_cursor(self):
+        """Cursor of the latest case change, to read changes made from now on"""
+        conn = self.get_connection()
+        row = QUERIES['change_cursor'].execute(conn).fetchone()
+        conn.close()
+        return row['value'] if row else 0
+    
+    def get_change_versions(self):
+        """Current value of every change sequence ('cases', 'users', 'alert_rules') by name"""
+        conn = self.get_connection()
+        rows = QUERIES['change_versions'].execute(conn).fetchall()
+        conn.close()
+        return {row['name']: row['value'] for row in rows}
+    
+    def get_case_history(self, case_id):
+        """Get the field-level change history of a case, newest first"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'case_history', (case_id,))
         conn.close()
         
         return df
     
+    def search_cases(self, search_text='', crime_type='all', start_date=None, end_date=None,
+                     columns=None, max_rows=None):
+        """Search cases with filters, projected to columns
+        
+        Only archive files the incident date range reaches into are searched.
+        With max_rows, see _read_cases.
+        """
+        case_filter, params = self._search_filter(search_text, crime_type, start_date, end_date)
+        archive_paths = self._archive.overlapping(start_date, end_date)
+        return self._read_cases(columns, case_filter, params, archive_paths=archive_paths, max_rows=max_rows)
+    
+    def iter_search_cases(self, search_text='', crime_type='all', start_date=None, end_date=None,
+                          columns=None, chunksize=CASE_CHUNK_ROWS):
+        """search_cases as a generator of DataFrames with at most chunksize rows each"""
+        case_filter, params = self._search_filter(search_text, crime_type, start_date, end_date)
+        archive_paths = self._archive.overlapping(start_date, end_date)
+        return self._iter_cases(columns, case_filter, params, archive_paths=archive_paths, chunksize=chunksize)
+    
+    def _search_filter(self, search_text, crime_type, start_date, end_date):
+        """CASE_FILTERS entry and parameters for a search, with an incident_day range when dated"""
+        params = {
+            'pattern': _like_pattern(search_text),
+            'crime_type': crime_type if crime_type not in (None, 'all') else None
+        }
+        if not (start_date or end_date):
+            return 'search', params
+        
+        params['start_day'] = _day_number(start_date) if start_date else MIN_DATE_KEY
+        params['end_day'] = _day_number(end_date) if end_date else MAX_DATE_KEY
+        return 'search_dated', params
+    
     def get_statistics(self):
         """Get dashboard statistics"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        # Total cases
-        cursor.execute('SELECT COUNT(*) as count FROM cases')
-        total_cases = cursor.fetchone()['count']
-        
-        # Pending cases
-        cursor.execute("SELECT COUNT(*) as count FROM cases WHERE status = 'Pending'")
-        pending_cases = cursor.fetchone()['count']
-        
-        # Resolved cases
-        cursor.execute("SELECT COUNT(*) as count FROM cases WHERE status = 'Resolved'")
-        resolved_cases = cursor.fetchone()['count']
-        
-        # Total users
-        cursor.execute('SELECT COUNT(*) as count FROM users WHERE is_active = 1')
-        total_users = cursor.fetchone()['count']
+        total_cases = QUERIES['count_cases'].execute(conn).fetchone()[0]
+        pending_cases = QUERIES['count_cases_with_status'].execute(conn, ('Pending',)).fetchone()[0]
+        resolved_cases = QUERIES['count_cases_with_status'].execute(conn, ('Resolved',)).fetchone()[0]
+        total_users = QUERIES['count_active_users'].execute(conn).fetchone()[0]
         
         conn.close()
         
+        # Archived cases are all closed or resolved
+        summary = self.get_archive_summary()
+        if summary:
+            total_cases += summary['count']
+            resolved_cases += summary['by_status'].get('Resolved', 0)
+        
         return {
             'total_cases': total_cases,
             'pending_cases': pending_cases,
@@ -246,72 +1114,159 @@ class Database:
             'total_users': total_users
         }
     
-    def get_cases_by_type(self):
-        """Get case distribution by crime type"""
+    def get_sla_summary(self, soon_hours=SLA_SOON_HOURS, cap=SLA_COUNT_CAP):
+        """Open cases past their SLA deadline, and due within soon_hours, per status
+        
+        Each count is a range of idx_cases_status_due_at and stops at cap, so
+        at most cap index entries are read per count.
+        """
+        now, soon = _sla_window(soon_hours)
         conn = self.get_connection()
+        summary = {'overdue': {}, 'due_soon': {}}
+        for status in SLA_STATUSES:
+            summary['overdue'][status] = QUERIES['sla_count'].execute(conn, (status, '', now, cap)).fetchone()[0]
+            summary['due_soon'][status] = QUERIES['sla_count'].execute(conn, (status, now, soon, cap)).fetchone()[0]
+        conn.close()
         
-        query = '''
-            SELECT crime_type, COUNT(*) as count 
-            FROM cases 
-            GROUP BY crime_type
-            ORDER BY count DESC
-        '''
+        return summary
+    
+    def get_sla_cases(self, soon_hours=SLA_SOON_HOURS, limit=MAX_LISTING_ROWS):
+        """Open cases overdue or due within soon_hours, most overdue first
         
-        df = pd.read_sql_query(query, conn)
+        hours_overdue is negative for cases not due yet. At most limit cases
+        (None for all) are read per status, straight off the (status, due_at)
+        index.
+        """
+        now, soon = _sla_window(soon_hours)
+        conn = self.get_connection()
+        frames = [self._frame(conn, 'sla_due', {'status': status, 'before': soon, 'limit': -1 if limit is None else limit})
+                  for status in SLA_STATUSES]
         conn.close()
         
+        df = pd.concat(frames, ignore_index=True).sort_values('due_at', kind='stable', ignore_index=True)
+        if limit is not None:
+            df = df.head(limit)
+        df['hours_overdue'] = ((pd.Timestamp(now) - pd.to_datetime(df['due_at'])).dt.total_seconds() / 3600).round(1)
         return df
     
-    def get_cases_by_status(self):
-        """Get case distribution by status"""
+    def get_sla_policies(self):
+        """Response and resolution hours per priority"""
         conn = self.get_connection()
+        df = self._frame(conn, 'sla_policies')
+        conn.close()
         
-        query = '''
-            SELECT status, COUNT(*) as count 
-            FROM cases 
-            GROUP BY status
-            ORDER BY count DESC
-        '''
+        return df
+    
+    def set_sla_policy(self, priority, response_hours, resolution_hours):
+        """Add or change the SLA of a priority
         
-        df = pd.read_sql_query(query, conn)
+        Open cases of the priority get deadlines under the new hours, still
+        counted from when they entered their status. Re-timing is not a change
+        to the cases: their change_seq and updated_at stay as they are.
+        """
+        conn = self.get_connection()
+        try:
+            QUERIES['set_sla_policy'].execute(conn, (priority, response_hours, resolution_hours))
+            rescheduled = QUERIES['reschedule_sla'].execute(
+                conn, {'priority': priority, 'statuses': json.dumps(list(SLA_STATUSES))},
+                due_at=SLA_RESCHEDULE_SQL
+            ).rowcount
+            conn.commit()
+            conn.close()
+            return {'success': True, 'rescheduled': rescheduled}
+        except Exception as e:
+            conn.close()
+            return {'success': False, 'error': str(e)}
+    
+    def get_cases_by_type(self):
+        """Get case distribution by crime type"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'cases_by_type')
+        conn.close()
+        
+        return self._with_archive_counts(df, 'crime_type', 'by_type')
+    
+    def get_location_counts(self):
+        """Get case counts per canonical location and crime type, with its state and zone"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'location_counts')
         conn.close()
         
         return df
     
-    def get_recent_cases(self, limit=10):
-        """Get most recent cases"""
+    def get_cases_by_status(self):
+        """Get case distribution by status"""
         conn = self.get_connection()
+        df = self._frame(conn, 'cases_by_status')
+        conn.close()
+        
+        return self._with_archive_counts(df, 'status', 'by_status')
+    
+    def _with_archive_counts(self, df, column, summary_key):
+        """Add the archive's cached per-group counts to a hot-table GROUP BY result"""
+        summary = self.get_archive_summary()
+        if not summary or not summary[summary_key]:
+            return df
         
-        query = f'SELECT * FROM cases ORDER BY created_at DESC LIMIT {limit}'
-        df = pd.read_sql_query(query, conn)
+        archived = pd.DataFrame(list(summary[summary_key].items()), columns=[column, 'count'])
+        merged = pd.concat([df, archived]).groupby(column, as_index=False)['count'].sum()
+        return merged.sort_values('count', ascending=False, ignore_index=True)
+    
+    def get_recent_cases(self, limit=10, columns=None):
+        """Get most recent cases, projected to columns"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'recent_cases', (int(limit),), columns=_case_select_list(columns))
         conn.close()
         
         return df
     
     def get_trend_data(self, start_date=None, end_date=None):
-        """Get case trends over time"""
-        conn = self.get_connection()
+        """Get cases created per day over [start_date, end_date], both inclusive days
         
-        query = '''
-            SELECT DATE(created_at) as date, COUNT(*) as count
-            FROM cases
-        '''
+        Only archive files the range reaches into are read, and their counts
+        are cached until the file changes.
+        """
+        params = {
+            'start_epoch': _epoch_seconds(start_date) if start_date else MIN_DATE_KEY,
+            'end_epoch': _epoch_seconds(end_date, days=1) if end_date else MAX_DATE_KEY
+        }
+        frames = self.fan_out(QUERIES['trend'].sql, params, self._archive.overlapping(start_date, end_date, 'created_at'),
+                              cache=True)
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames).groupby('date', as_index=False)['count'].sum()
+    
+    def add_evidence_file(self, case_id, sha256, size, filename, content_type=None, uploaded_by='system'):
+        """Record an evidence file stored under its SHA-256 and attach it to a case"""
+        conn = self.get_connection()
         
-        params = []
-        if start_date:
-            query += ' WHERE created_at >= ?'
-            params.append(start_date)
+        try:
+            deduplicated = QUERIES['insert_evidence_blob'].execute(conn, (sha256, size)).rowcount == 0
+            evidence_id = QUERIES['insert_evidence_file'].execute(
+                conn, (case_id, sha256, filename, content_type, size, uploaded_by)
+            ).lastrowid
             
-            if end_date:
-                query += ' AND created_at <= ?'
-                params.append(end_date)
-        elif end_date:
-            query += ' WHERE created_at <= ?'
-            params.append(end_date)
-        
-        query += ' GROUP BY DATE(created_at) ORDER BY date'
+            conn.commit()
+            conn.close()
+            
+            self.log_activity(uploaded_by, 'ADD_EVIDENCE', f"Attached {filename} to case {case_id}")
+            return {'success': True, 'evidence_id': evidence_id, 'deduplicated': deduplicated}
+        except Exception as e:
+            conn.close()
+            return {'success': False, 'error': str(e)}
+    
+    def get_evidence_file(self, evidence_id):
+        """Get an evidence file record by ID as an EvidenceRow, or None"""
+        conn = self.get_connection()
+        evidence = QUERIES['evidence_by_id'].execute(conn, (evidence_id,)).fetchone()
+        conn.close()
         
-        df = pd.read_sql_query(query, conn, params=params)
+        return evidence
+    
+    def get_case_evidence(self, case_id):
+        """Get the evidence files attached to a case"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'case_evidence', (case_id,))
         conn.close()
         
         return df
@@ -319,71 +1274,168 @@ class Database:
     def add_user(self, username, password, full_name, role):
         """Add a new user"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO users (username, password, full_name, role)
-                VALUES (?, ?, ?, ?)
-            ''', (username, password, full_name, role))
+            QUERIES['insert_user'].execute(conn, (username, password, full_name, role))
             
             conn.commit()
             conn.close()
-            return {'success': True}
         except sqlite3.IntegrityError:
             conn.close()
             return {'success': False, 'error': 'Username already exists'}
         except Exception as e:
             conn.close()
             return {'success': False, 'error': str(e)}
+        
+        self._notify('users', action='create', username=username)
+        return {'success': True}
     
     def get_all_users(self):
         """Get all active users"""
         conn = self.get_connection()
-        
-        query = 'SELECT id, username, full_name, role, created_at, last_login FROM users WHERE is_active = 1'
-        df = pd.read_sql_query(query, conn)
+        df = self._frame(conn, 'active_users')
         conn.close()
         
         return df
     
+    def get_user_by_credentials(self, username, password):
+        """Get the active user with these credentials as a UserRow, or None"""
+        conn = self.get_connection()
+        user = QUERIES['authenticate_user'].execute(conn, (username, password)).fetchone()
+        conn.close()
+        return user
+    
     def update_last_login(self, username):
         """Update user's last login timestamp"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE users 
-            SET last_login = CURRENT_TIMESTAMP 
-            WHERE username = ?
-        ''', (username,))
+        QUERIES['touch_last_login'].execute(conn, (username,))
         
         conn.commit()
         conn.close()
+        self._notify('users', action='login', username=username)
     
     def log_activity(self, username, action, details=''):
-        """Log user activity"""
+        """Log user activity into the current month's partition"""
+        now = datetime.now(timezone.utc)
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO activity_log (username, action, details)
-            VALUES (?, ?, ?)
-        ''', (username, action, details))
+        table = self._ensure_activity_partition(conn, now.year * 12 + now.month - 1)
+        QUERIES['insert_activity'].execute(conn, (username, action, details, now.strftime('%Y-%m-%d %H:%M:%S')),
+                                           table=table)
+        hour = now.strftime('%Y-%m-%d %H')
+        QUERIES['bump_activity_counter'].executemany(
+            conn, [(username, action, hour), (username, '*', hour), ('*', action, hour), ('*', '*', hour)]
+        )
         
         conn.commit()
         conn.close()
     
-    def get_activity_log(self, username=None, limit=100):
-        """Get activity log"""
+    def rebuild_activity_counters(self, conn=None):
+        """Recompute the hourly activity counters from the retained activity log"""
+        own_connection = conn is None
+        conn = conn or self.get_connection()
+        with conn:
+            QUERIES['clear_activity_counters'].execute(conn)
+            QUERIES['fill_activity_counters'].execute(conn)
+            for per_user, per_action in ((True, False), (False, True), (False, False)):
+                QUERIES['total_activity_counters'].execute(conn, {'per_user': per_user, 'per_action': per_action})
+        if own_connection:
+            conn.close()
+    
+    def get_activity_log(self, username=None, limit=100, before_id=None, start_date=None, end_date=None):
+        """Get the newest activity, or the page older than before_id (keyset pagination)
+        
+        Partitions are read newest first with an id range seek each, stopping
+        as soon as limit rows are found, so a page costs the same at any depth.
+        start_date/end_date ('YYYY-MM-DD', inclusive) skip partitions outside
+        the range; limit=None reads the whole range.
+        """
         conn = self.get_connection()
+        remaining = int(limit) if limit is not None else -1
+        frames = []
         
-        if username:
-            query = f'SELECT * FROM activity_log WHERE username = ? ORDER BY timestamp DESC LIMIT {limit}'
-            df = pd.read_sql_query(query, conn, params=(username,))
-        else:
-            query = f'SELECT * FROM activity_log ORDER BY timestamp DESC LIMIT {limit}'
-            df = pd.read_sql_query(query, conn)
+        for table in self._activity_partition_tables(conn):
+            if remaining == 0:
+                break
+            month = f"{table[-6:-2]}-{table[-2:]}"
+            if before_id is not None and _activity_month_index(month) > int(before_id) >> 32:
+                continue
+            if (start_date and month < start_date[:7]) or (end_date and month > end_date[:7]):
+                continue
+            
+            df = self._frame(conn, 'activity_page', {
+                'before_id': int(before_id) if before_id is not None else None,
+                'username': username or None,
+                'start_date': start_date or None,
+                'end_date': end_date or None,
+                'limit': remaining
+            }, table=table)
+            if not df.empty:
+                frames.append(df)
+                if remaining > 0:
+                    remaining -= len(df)
+        
+        conn.close()
+        if not frames:
+            return pd.DataFrame(columns=list(ACTIVITY_COLUMNS))
+        return pd.concat(frames, ignore_index=True)
+    
+    def get_daily_activity(self, start_date, end_date, action='LOGIN', username=None):
+        """Get counts of one action per day from the hourly activity counters"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'daily_activity', (username or '*', action, f"{start_date} 00", f"{end_date} 23"))
+        conn.close()
+        return df
+    
+    def get_activity_by_user(self, start_date, end_date, action='CREATE_CASE'):
+        """Get counts of one action for every active user from the hourly activity counters"""
+        conn = self.get_connection()
+        
+        # One primary key range per user rather than a scan over all users' rows
+        df = self._frame(conn, 'activity_by_user', (action, f"{start_date} 00", f"{end_date} 23"))
+        conn.close()
+        return df
+    
+    def get_hourly_activity(self, start_date, end_date, username=None):
+        """Get total activity per UTC hour ('YYYY-MM-DD HH') from the hourly counters"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'hourly_activity', (username or '*', f"{start_date} 00", f"{end_date} 23"))
+        conn.close()
+        return df
+    
+    def compact_activity_log(self, keep_months=ACTIVITY_RETENTION_MONTHS):
+        """Summarize activity partitions older than keep_months into activity_rollup and drop them"""
+        now = datetime.now(timezone.utc)
+        oldest_kept = now.year * 12 + now.month - max(int(keep_months), 1)
         
+        conn = self.get_connection()
+        compacted = []
+        rows = 0
+        try:
+            for table in self._activity_partition_tables(conn):
+                month = f"{table[-6:-2]}-{table[-2:]}"
+                if _activity_month_index(month) >= oldest_kept:
+                    continue
+                
+                # Summary and drop commit together, so a month is never half gone
+                with conn:
+                    rows += QUERIES['count_partition'].execute(conn, table=table).fetchone()[0]
+                    QUERIES['rollup_partition'].execute(conn, (month,), table=table)
+                    QUERIES['drop_partition'].execute(conn, table=table)
+                    QUERIES['forget_partition_sequence'].execute(conn, (table,))
+                    self._create_activity_view(conn)
+                self._activity_partitions.discard(table)
+                compacted.append(month)
+            
+            conn.close()
+            return {'success': True, 'months': sorted(compacted), 'rows': rows}
+        except Exception as e:
+            conn.close()
+            return {'success': False, 'error': str(e)}
+    
+    def get_activity_rollup(self):
+        """Get summarized activity per month and action for compacted months"""
+        conn = self.get_connection()
+        df = self._frame(conn, 'activity_rollup')
         conn.close()
         return df
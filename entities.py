@@ -0,0 +1,212 @@
+import re
+from collections import defaultdict
+
+# Case fields entities are extracted from, by entity kind
+NAME_FIELDS = ('suspect_name', 'victim_name')
+CONTACT_FIELDS = ('victim_contact', 'suspect_details', 'description')
+LOCATION_FIELDS = ('location',)
+ENTITY_FIELDS = NAME_FIELDS + CONTACT_FIELDS + LOCATION_FIELDS
+
+# Entities shared by more cases than this (a city, "unknown") link everything
+# to everything, so link expansion does not go through them
+MAX_FANOUT = 100
+
+EMAIL_PATTERN = re.compile(r'[a-z0-9._%+-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{2,}')
+PHONE_PATTERN = re.compile(r'(?<![\d+])(?:\+?234|0)[\s-]?[789][01]\d(?:[\s-]?\d){7}(?!\d)')
+NAME_TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'chief', 'alhaji', 'alhaja', 'prof', 'engr', 'barr', 'pastor'}
+PLACEHOLDERS = {'', 'unknown', 'none', 'n a', 'na', 'nil', 'anonymous', 'not known', 'unidentified'}
+
+def normalize_name(name):
+    """Lowercase a person's name, drop titles and order the parts, so 'Mr. Okafor Adebayo' == 'adebayo okafor'"""
+    parts = [part for part in re.sub(r'[^a-z ]+', ' ', str(name).lower()).split() if part not in NAME_TITLES]
+    value = ' '.join(sorted(parts))
+    return None if value in PLACEHOLDERS or len(value) < 3 else value
+
+def normalize_phone(phone):
+    """Nigerian phone number in international form, e.g. 0803 123 4567 -> 2348031234567"""
+    digits = re.sub(r'\D', '', phone)
+    return '234' + digits[-10:]
+
+def normalize_location(location):
+    """Lowercase a location with punctuation and extra spaces removed"""
+    value = ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', str(location).lower()).split())
+    return None if value in PLACEHOLDERS else value
+
+def extract_entities(case):
+    """Set of (kind, value) entities mentioned in a case dict"""
+    entities = set()
+    for field in NAME_FIELDS:
+        if case.get(field):
+            value = normalize_name(case[field])
+            if value:
+                entities.add(('name', value))
+    
+    for field in CONTACT_FIELDS:
+        text = str(case.get(field) or '').lower()
+        entities.update(('email', email) for email in EMAIL_PATTERN.findall(text))
+        entities.update(('phone', normalize_phone(phone)) for phone in PHONE_PATTERN.findall(text))
+    
+    for field in LOCATION_FIELDS:
+        if case.get(field):
+            value = normalize_location(case[field])
+            if value:
+                entities.add(('location', value))
+    return entities
+
+def _chunks(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class EntityIndex:
+    """Inverted index from normalized people, contacts and places to the cases that mention them"""
+    
+    def __init__(self, database, max_fanout=MAX_FANOUT):
+        self.db = database
+        self.max_fanout = max_fanout
+    
+    def on_change(self, topic, event):
+        """Change feed listener that keeps the index current as cases are written"""
+        if topic != 'cases':
+            return
+        if event.get('action') == 'create':
+            self.index_cases([event['case_id']])
+        elif event.get('action') == 'update' and set(event.get('changes', {})) & set(ENTITY_FIELDS):
+            self.index_cases([event['case_id']])
+    
+    def index_cases(self, case_ids):
+        """Re-extract the entities of the given cases and apply the differences to the index"""
+        conn = self.db.get_connection()
+        indexed = 0
+        with conn:
+            for batch in _chunks(case_ids):
+                rows = conn.execute(f'''
+                    SELECT case_id, {', '.join(ENTITY_FIELDS)} FROM cases
+                    WHERE case_id IN ({', '.join('?' for _ in batch)})
+                ''', batch).fetchall()
+                indexed += self._index_rows(conn, [dict(row) for row in rows])
+        conn.close()
+        return indexed
+    
+    def _index_rows(self, conn, rows):
+        """Apply the entities of case dicts (case_id and ENTITY_FIELDS) to the index"""
+        current = defaultdict(set)
+        for row in conn.execute(f'''
+            SELECT ce.case_id, e.kind, e.value FROM case_entities ce
+            JOIN entities e ON e.id = ce.entity_id
+            WHERE ce.case_id IN ({', '.join('?' for _ in rows)})
+        ''', [row['case_id'] for row in rows]):
+            current[row['case_id']].add((row['kind'], row['value']))
+        
+        for row in rows:
+            self._apply(conn, row['case_id'], current[row['case_id']], extract_entities(row))
+        return len(rows)
+    
+    def _apply(self, conn, case_id, old, new):
+        """Link a case to its added entities and unlink the removed ones, keeping case counts"""
+        for kind, value in old - new:
+            entity_id = conn.execute('SELECT id FROM entities WHERE kind = ? AND value = ?', (kind, value)).fetchone()['id']
+            conn.execute('DELETE FROM case_entities WHERE entity_id = ? AND case_id = ?', (entity_id, case_id))
+            conn.execute('UPDATE entities SET case_count = case_count - 1 WHERE id = ?', (entity_id,))
+            conn.execute('DELETE FROM entities WHERE id = ? AND case_count = 0', (entity_id,))
+        
+        for kind, value in new - old:
+            conn.execute('''
+                INSERT INTO entities (kind, value, case_count) VALUES (?, ?, 1)
+                ON CONFLICT (kind, value) DO UPDATE SET case_count = case_count + 1
+            ''', (kind, value))
+            entity_id = conn.execute('SELECT id FROM entities WHERE kind = ? AND value = ?', (kind, value)).fetchone()['id']
+            conn.execute('INSERT INTO case_entities (entity_id, case_id) VALUES (?, ?)', (entity_id, case_id))
+    
+    def ensure_built(self):
+        """Build the index once for a database that has cases but no entities yet"""
+        conn = self.db.get_connection()
+        empty = not conn.execute('SELECT 1 FROM case_entities LIMIT 1').fetchone()
+        has_cases = conn.execute('SELECT 1 FROM cases LIMIT 1').fetchone()
+        conn.close()
+        if empty and (has_cases or self.db.archive_overlaps()):
+            self.rebuild()
+    
+    def rebuild(self, batch_size=5000):
+        """Re-index every case, hot and archived, in batches"""
+        conn = self.db.get_connection()
+        with conn:
+            conn.execute('DELETE FROM case_entities')
+            conn.execute('DELETE FROM entities')
+        
+        indexed = 0
+        last_id = 0
+        while True:
+            batch = conn.execute('SELECT id, case_id FROM cases WHERE id > ? ORDER BY id LIMIT ?',
+                                 (last_id, batch_size)).fetchall()
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            indexed += self.index_cases([row['case_id'] for row in batch])
+        
+        for chunk in self.db.iter_archived_cases(['case_id', *ENTITY_FIELDS], chunksize=batch_size):
+            # NULL text comes back from pandas as NaN, which extract_entities would take for a value
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+            with conn:
+                for batch in _chunks(records):
+                    indexed += self._index_rows(conn, batch)
+        conn.close()
+        return indexed
+    
+    def get_case_entities(self, case_id):
+        """Entities of a case with how many cases share each one"""
+        conn = self.db.get_connection()
+        rows = conn.execute('''
+            SELECT e.kind, e.value, e.case_count FROM case_entities ce
+            JOIN entities e ON e.id = ce.entity_id
+            WHERE ce.case_id = ?
+            ORDER BY e.case_count DESC, e.kind, e.value
+        ''', (case_id,)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    def linked_cases(self, case_id, hops=2, limit=500):
+        """Breadth-first expansion from a case through shared entities
+        
+        Returns the reached cases as {case_id: (hops, kind, value)} with the
+        entity each was first reached through, plus the entities that were too
+        common to expand.
+        """
+        reached = {case_id: (0, None, None)}
+        expanded = set()
+        skipped = {}
+        frontier = [case_id]
+        conn = self.db.get_connection()
+        
+        for hop in range(1, hops + 1):
+            # Entities of the frontier cases that have not been expanded yet
+            entities = {}
+            for batch in _chunks(frontier):
+                placeholders = ', '.join('?' for _ in batch)
+                for row in conn.execute(f'''
+                    SELECT DISTINCT e.id, e.kind, e.value, e.case_count FROM case_entities ce
+                    JOIN entities e ON e.id = ce.entity_id
+                    WHERE ce.case_id IN ({placeholders}) AND e.case_count > 1
+                ''', batch):
+                    if row['id'] in expanded:
+                        continue
+                    if row['case_count'] > self.max_fanout:
+                        skipped[row['id']] = (row['kind'], row['value'], row['case_count'])
+                    else:
+                        entities[row['id']] = (row['kind'], row['value'])
+            expanded.update(entities)
+            
+            frontier = []
+            for batch in _chunks(entities):
+                placeholders = ', '.join('?' for _ in batch)
+                for row in conn.execute(f'''
+                    SELECT entity_id, case_id FROM case_entities WHERE entity_id IN ({placeholders})
+                ''', batch):
+                    if row['case_id'] not in reached and len(reached) <= limit:
+                        reached[row['case_id']] = (hop, *entities[row['entity_id']])
+                        frontier.append(row['case_id'])
+            if not frontier:
+                break
+        conn.close()
+        
+        return reached, sorted(skipped.values(), key=lambda entity: -entity[2])
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import tempfile
+
+# Uploads are hashed and written in chunks of this size, so memory use does
+# not depend on the file size
+CHUNK_SIZE = 1024 * 1024
+
+class EvidenceStore:
+    """Content-addressed evidence files on local disk, one copy per SHA-256"""
+    
+    def __init__(self, database, root='/tmp/cybercrime-evidence'):
+        self.db = database
+        self.root = root
+        self.incoming = os.path.join(root, 'incoming')
+        os.makedirs(self.incoming, exist_ok=True)
+    
+    def blob_path(self, sha256):
+        """Path of a stored blob, fanned out as ab/cd/abcd..."""
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+    
+    def save(self, case_id, stream, filename, content_type=None, uploaded_by='system'):
+        """Stream an upload to disk while hashing it, then attach it to a case"""
+        hasher = hashlib.sha256()
+        size = 0
+        
+        # Write to a temp file in the same filesystem so the final move is atomic
+        fd, temp_path = tempfile.mkstemp(dir=self.incoming)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            
+            if not size:
+                os.remove(temp_path)
+                return {'success': False, 'error': 'The upload is empty'}
+            
+            sha256 = hasher.hexdigest()
+            path = self.blob_path(sha256)
+            if os.path.exists(path):
+                # Same content already stored for some case: keep the existing copy
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        result = self.db.add_evidence_file(case_id, sha256, size, filename, content_type, uploaded_by)
+        if result['success']:
+            result.update({'sha256': sha256, 'size': size})
+        return result
+    
+    def get_file(self, evidence_id):
+        """Get an evidence record and the path of its blob, or (None, None)"""
+        evidence = self.db.get_evidence_file(evidence_id)
+        if not evidence:
+            return None, None
+        
+        path = self.blob_path(evidence.sha256)
+        if not os.path.exists(path):
+            return evidence, None
+        return evidence, path
@@ -0,0 +1,454 @@
+"""Load test of the Dash callback endpoint with realistic user sessions
+
+Usage:
+    python loadtest.py [--users 20] [--duration 60] [--cases 5000]
+                       [--gunicorn 1:1:gevent] [--gunicorn 2:4:gthread ...]
+                       [--mix dashboard=6,cases=3,search=2,report=1,submit=1]
+    python loadtest.py --url http://127.0.0.1:8050 [--users 20] [--duration 60]
+
+Each --gunicorn WORKERS:THREADS[:CLASS] starts the app under gunicorn against
+a throwaway database and runs the same session mix against it, so worker,
+thread and worker-class settings for app.yaml can be compared side by side.
+--url runs the mix against a server that is already running instead.
+
+Every virtual user behaves like a browser tab: it loads the page to get its
+callback token, keeps an /events stream open (--no-events to skip), logs in
+through the login callback, then loops over weighted actions with think
+time in between:
+    dashboard   opens the dashboard: version gate, then every data callback
+    cases       types a search into the cases list, one callback per key
+    search      runs an advanced search
+    report      generates a report, polling the background job to the end
+    submit      submits a new case
+Latency is per callback request; a report is measured from the first POST
+to its result. Errors are HTTP statuses >= 400 and failed connections.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import brotli
+
+SAMPLE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cybercrime.db')
+
+DEFAULT_MIX = 'dashboard=6,cases=3,search=2,report=1,submit=1'
+REPORT_TYPES = ['monthly', 'crime_type', 'status', 'crime_type_status', 'crime_type_priority', 'month_crime_type']
+SEARCH_TERMS = ['report', 'bank', 'phishing', 'wallet', 'CYB-2024', 'Okafor', 'scam', 'login']
+CRIME_TYPES = ['all', 'Hacking', 'Phishing', 'Identity Theft', 'Online Fraud', 'Malware', 'Other']
+
+# Longest a report may take before it counts as an error
+REPORT_TIMEOUT_SECONDS = 120
+
+class Stats:
+    """Latencies and errors per callback, shared by every virtual user"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+    
+    def record(self, name, elapsed_ms, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed_ms)
+            self.errors[name] = self.errors.get(name, 0) + (not ok)
+    
+    def rows(self):
+        """(callback, requests, errors, p50, p95, p99) per callback, plus the total"""
+        with self._lock:
+            latencies = {name: list(values) for name, values in self.latencies.items()}
+            errors = dict(self.errors)
+        everything = [value for values in latencies.values() for value in values]
+        rows = [(name, len(values), errors[name], *percentiles(values))
+                for name, values in sorted(latencies.items())]
+        rows.append(('total', len(everything), sum(errors.values()), *percentiles(everything)))
+        return rows
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles of a list of numbers"""
+    if not values:
+        return tuple(0.0 for _ in points)
+    ordered = sorted(values)
+    return tuple(ordered[min(len(ordered) - 1, max(0, round(point / 100 * len(ordered)) - 1))] for point in points)
+
+class DashClient:
+    """One browser tab's HTTP connection to the app, speaking the callback protocol"""
+    
+    def __init__(self, base_url, callbacks, stats):
+        url = urlparse(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.callbacks = callbacks
+        self.stats = stats
+        self.conn = None
+        self.end_id = None
+    
+    def _request(self, method, path, body=None):
+        """Send a request on the kept-alive connection, reconnecting once if the server dropped it"""
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REPORT_TIMEOUT_SECONDS)
+            try:
+                headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, br'} if body else {}
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                return response.status, _decode(response)
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+    
+    def open_page(self):
+        """Load the page shell for the token the renderer echoes on every callback"""
+        started = time.perf_counter()
+        try:
+            status, body = self._request('GET', '/')
+        except (OSError, http.client.HTTPException):
+            status, body = 599, b''
+        config = re.search(rb'<script id="_dash-config" type="application/json">(.*?)</script>', body, re.S)
+        self.end_id = json.loads(config.group(1)).get('end_id') if config else None
+        self.stats.record('page load', (time.perf_counter() - started) * 1000, status < 400)
+    
+    def fire(self, name, output, inputs, state=None, changed=None):
+        """POST one callback the way the renderer does; returns the 'response' part or None
+        
+        inputs and state are {'id.prop': value}; ids of pattern-matching
+        callbacks are passed through already expanded. A background callback
+        is polled until it finishes and timed as a whole.
+        """
+        callback = self.callbacks[output]
+        outputs = [{'id': _component_id(part.rsplit('.', 1)[0]), 'property': part.rsplit('.', 1)[1]}
+                   for part in callback['output'].strip('.').split('...')]
+        payload = {
+            'output': callback['output'],
+            'outputs': outputs if callback['output'].startswith('..') else outputs[0],
+            'inputs': [_prop(item, inputs) for item in callback['inputs']],
+            'state': [_prop(item, state or {}) for item in callback['state']],
+            'changedPropIds': [changed or next(iter(inputs))]
+        }
+        return self._post(name, payload, callback.get('background'))
+    
+    def fire_payload(self, name, payload):
+        return self._post(name, payload, None)
+    
+    def _post(self, name, payload, background):
+        query = {'endId': self.end_id} if self.end_id else {}
+        started = time.perf_counter()
+        ok, data = False, None
+        try:
+            status, body = self._request('POST', f"/_dash-update-component?{urlencode(query)}", json.dumps(payload))
+            ok = status < 400
+            data = json.loads(body) if status == 200 and body else {}
+            
+            # Background callback: poll with the job handles, inputs cleared, like the renderer
+            if ok and background and 'response' not in data:
+                handles = {**query, 'cacheKey': data['cacheKey'], 'job': data['job']}
+                cleared = json.dumps({**payload,
+                                      'inputs': [{**item, 'value': None} for item in payload['inputs']],
+                                      'state': [{**item, 'value': None} for item in payload['state']]})
+                deadline = time.monotonic() + REPORT_TIMEOUT_SECONDS
+                while 'response' not in data:
+                    if time.monotonic() > deadline:
+                        ok = False
+                        break
+                    time.sleep(background.get('interval', 1000) / 1000)
+                    status, body = self._request('POST', f"/_dash-update-component?{urlencode(handles)}", cleared)
+                    ok = status < 400
+                    if not ok or status == 204:
+                        break
+                    data = json.loads(body)
+        except (OSError, http.client.HTTPException, ValueError, KeyError):
+            ok = False
+        self.stats.record(name, (time.perf_counter() - started) * 1000, ok)
+        return data.get('response') if ok and data else None
+    
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+def _decode(response):
+    """Response body, decompressed as the browser would"""
+    body = response.read()
+    encoding = response.getheader('Content-Encoding', '')
+    if encoding == 'br':
+        return brotli.decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    return body
+
+def _component_id(text):
+    return json.loads(text) if text.startswith('{') else text
+
+def _prop(item, values):
+    key = f"{item['id']}.{item['property']}"
+    return {'id': _component_id(item['id']), 'property': item['property'], 'value': values.get(key)}
+
+def _store(page, topic):
+    return json.dumps({'page': page, 'topic': topic, 'type': 'page-version'}, separators=(',', ':'))
+
+class VirtualUser:
+    """A logged-in user clicking through the app with think time between actions"""
+    
+    def __init__(self, number, base_url, callbacks, stats, mix, think, events, stop):
+        self.number = number
+        self.client = DashClient(base_url, callbacks, stats)
+        self.callbacks = callbacks
+        self.base_url = base_url
+        self.stats = stats
+        self.mix = mix
+        self.think = think
+        self.events = events
+        self.stop = stop
+        self.rng = random.Random(number)
+        self.session = None
+        self.dashboard_versions = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def run(self):
+        if self.events:
+            threading.Thread(target=self._hold_events, daemon=True).start()
+        
+        self.client.open_page()
+        response = self.client.fire('login', '..session-store.data...login-alert.children..',
+                                    {'login-button.n_clicks': 1},
+                                    {'username-input.value': 'admin', 'password-input.value': 'admin123'})
+        self.session = (response or {}).get('session-store', {}).get('data')
+        
+        actions, weights = zip(*self.mix.items())
+        while not self.stop.is_set():
+            getattr(self, f"do_{self.rng.choices(actions, weights)[0]}")()
+            self.stop.wait(self.rng.expovariate(1 / self.think) if self.think else 0)
+        self.client.close()
+    
+    def _hold_events(self):
+        """Keep an /events stream open like a real tab, reconnecting until the run ends"""
+        url = urlparse(self.base_url)
+        while not self.stop.is_set():
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=5)
+            try:
+                conn.request('GET', '/events')
+                response = conn.getresponse()
+                while not self.stop.is_set() and response.fp.readline():
+                    pass
+            except (OSError, http.client.HTTPException):
+                self.stop.wait(1)
+            finally:
+                conn.close()
+    
+    def do_dashboard(self):
+        stores = [_store('dashboard', 'cases'), _store('dashboard', 'users')]
+        gate = next(output for output in self.callbacks if output.startswith('{"page":["ALL"]'))
+        response = self.client.fire_payload('version gate', {
+            'output': gate,
+            'outputs': [{'id': json.loads(store), 'property': 'data'} for store in stores],
+            'inputs': [{'id': 'page-refresh', 'property': 'n_intervals', 'value': None},
+                       {'id': 'change-feed', 'property': 'data', 'value': None}],
+            'state': [[{'id': json.loads(store), 'property': 'data', 'value': None} for store in stores]],
+            'changedPropIds': []
+        }) or {}
+        versions = {store: props.get('data') for store, props in response.items()}
+        
+        for output, callback in self.callbacks.items():
+            inputs = {f"{item['id']}.{item['property']}" for item in callback['inputs']}
+            if not inputs & {f"{store}.data" for store in stores}:
+                continue
+            self.client.fire(output.strip('.').split('.')[0], output,
+                             {f"{store}.data": versions.get(store, 1) for store in stores},
+                             changed=f"{stores[0]}.data")
+    
+    def do_cases(self):
+        text = self.rng.choice(SEARCH_TERMS)
+        status = self.rng.choice(['all', 'all', 'Pending', 'Resolved'])
+        for length in range(1, len(text) + 1):
+            self.client.fire('cases-list-table', '..cases-list-table.data...cases-list-empty.children..',
+                             {'case-search-input.value': text[:length], 'case-status-filter.value': status})
+            time.sleep(0.12)
+    
+    def do_search(self):
+        year = self.rng.randint(2019, 2025)
+        self.client.fire('search-results', self._output('search-results.children'),
+                         {'search-button.n_clicks': self.rng.randint(1, 100)},
+                         {'search-text.value': self.rng.choice(SEARCH_TERMS),
+                          'search-crime-type.value': self.rng.choice(CRIME_TYPES),
+                          'search-date-range.start_date': f"{year}-01-01",
+                          'search-date-range.end_date': f"{year}-12-31"})
+    
+    def do_report(self):
+        year = self.rng.choice([None, 2023, 2024, 2025])
+        self.client.fire('report-output', self._output('report-output.children'),
+                         {'generate-report-button.n_clicks': self.rng.randint(1, 100)},
+                         {'report-type.value': self.rng.choice(REPORT_TYPES),
+                          'report-date-range.start_date': f"{year}-01-01" if year else None,
+                          'report-date-range.end_date': f"{year}-12-31" if year else None})
+    
+    def do_submit(self):
+        self.client.fire('case-form-alert', self._output('case-form-alert.children'),
+                         {'submit-case-button.n_clicks': 1},
+                         {'case-title.value': f"Load test case {self.number}-{time.time_ns()}",
+                          'case-crime-type.value': self.rng.choice(CRIME_TYPES[1:]),
+                          'case-incident-date.value': '2025-01-15',
+                          'case-location.value': 'Lagos',
+                          'case-victim-name.value': 'Load Test',
+                          'case-description.value': 'Submitted by the load test',
+                          'case-priority.value': 'Medium',
+                          'case-status.value': 'Pending',
+                          'session-store.data': self.session})
+    
+    def _output(self, first):
+        return next(output for output in self.callbacks if output.strip('.').startswith(first))
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        action, _, weight = part.partition('=')
+        if not hasattr(VirtualUser, f"do_{action.strip()}"):
+            raise SystemExit(f"Unknown action in --mix: {action}")
+        mix[action.strip()] = float(weight or 1)
+    return mix
+
+def prepare_database(cases):
+    """A throwaway database: the sample data, or cases synthetic ones"""
+    workdir = tempfile.mkdtemp(prefix='cybercrime-load-')
+    path = os.path.join(workdir, 'cybercrime.db')
+    if cases:
+        from benchmark import build_synthetic_db
+        print(f"Building {cases} cases ...")
+        build_synthetic_db(path, cases, blob_kb=1)
+    else:
+        shutil.copy(SAMPLE_DB, path)
+    return workdir
+
+class GunicornServer:
+    """The app under gunicorn on a free local port, with its own data directories"""
+    
+    def __init__(self, spec, workdir):
+        workers, threads, *worker_class = spec.split(':')
+        self.workers, self.threads = int(workers), int(threads)
+        self.worker_class = worker_class[0] if worker_class else ('gthread' if self.threads > 1 else 'sync')
+        self.workdir = workdir
+        self.process = None
+    
+    @property
+    def label(self):
+        return f"{self.workers}w x {self.threads}t {self.worker_class}"
+    
+    def __enter__(self):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        env = dict(os.environ,
+                   CYBERCRIME_DB=os.path.join(self.workdir, 'cybercrime.db'),
+                   CYBERCRIME_JOB_CACHE=os.path.join(self.workdir, 'jobs'),
+                   CYBERCRIME_SNAPSHOT_DIR=os.path.join(self.workdir, 'snapshot'),
+                   CYBERCRIME_EVIDENCE_DIR=os.path.join(self.workdir, 'evidence'),
+                   CYBERCRIME_SECRET_KEY=os.environ.get('CYBERCRIME_SECRET_KEY') or os.urandom(32).hex())
+        self.process = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', '-b', f"127.0.0.1:{self.port}", 'app:server',
+            '--workers', str(self.workers), '--threads', str(self.threads),
+            '--worker-class', self.worker_class, '--worker-connections', '1000', '--timeout', '300'
+        ], cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"gunicorn exited with {self.process.returncode} ({self.label})")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                conn.request('GET', '/_dash-dependencies')
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return f"http://127.0.0.1:{self.port}"
+            except OSError:
+                time.sleep(0.25)
+        raise SystemExit(f"gunicorn did not start ({self.label})")
+    
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def run_load(base_url, args, mix):
+    """Run the session mix against a server; returns the Stats and the measured seconds"""
+    conn = http.client.HTTPConnection(urlparse(base_url).hostname, urlparse(base_url).port or 80, timeout=30)
+    conn.request('GET', '/_dash-dependencies')
+    callbacks = {callback['output']: callback for callback in json.loads(conn.getresponse().read())}
+    conn.close()
+    
+    stats = Stats()
+    stop = threading.Event()
+    users = [VirtualUser(number, base_url, callbacks, stats, mix, args.think, args.events, stop)
+             for number in range(args.users)]
+    for user in users:
+        user.thread.start()
+        time.sleep(args.ramp / max(args.users, 1))
+    
+    stop.wait(args.duration)
+    stop.set()
+    for user in users:
+        user.thread.join(REPORT_TIMEOUT_SECONDS)
+    return stats, time.perf_counter() - stats.started
+
+def print_report(label, stats, seconds):
+    rows = stats.rows()
+    print(f"\n{label}: {rows[-1][1] / seconds:.1f} requests/s over {seconds:.0f}s")
+    print(f"  {'callback':<26} {'requests':>9} {'errors':>7} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, count, errors, p50, p95, p99 in rows:
+        print(f"  {name[:26]:<26} {count:>9} {errors:>7} {errors / max(count, 1) * 100:>6.1f} "
+              f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Load an already running server instead of starting gunicorn')
+    parser.add_argument('--gunicorn', action='append', metavar='WORKERS:THREADS[:CLASS]',
+                        help='gunicorn configuration to test; repeat to compare (default 1:1:gevent, as app.yaml)')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load per configuration')
+    parser.add_argument('--ramp', type=float, default=2, help='Seconds over which users start')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean seconds between a user\'s actions')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weighted actions, e.g. ' + DEFAULT_MIX)
+    parser.add_argument('--cases', type=int, default=0, help='Synthetic cases to load (default: the sample data)')
+    parser.add_argument('--no-events', dest='events', action='store_false',
+                        help='Do not hold an /events stream open per user')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    
+    if args.url:
+        stats, seconds = run_load(args.url, args, mix)
+        print_report(args.url, stats, seconds)
+        return 0
+    
+    summary = []
+    for spec in args.gunicorn or ['1:1:gevent']:
+        workdir = prepare_database(args.cases)
+        server = GunicornServer(spec, workdir)
+        with server as base_url:
+            print(f"Running {args.users} users for {args.duration:.0f}s against gunicorn {server.label} ...")
+            stats, seconds = run_load(base_url, args, mix)
+        shutil.rmtree(workdir, ignore_errors=True)
+        print_report(f"gunicorn {server.label}", stats, seconds)
+        summary.append((server.label, stats.rows()[-1], seconds))
+    
+    if len(summary) > 1:
+        print(f"\n{'configuration':<24} {'req/s':>7} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for label, (_, count, errors, p50, p95, p99), seconds in summary:
+            print(f"{label:<24} {count / seconds:>7.1f} {errors / max(count, 1) * 100:>6.1f} "
+                  f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
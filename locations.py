@@ -0,0 +1,167 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Geopolitical zone -> states
+ZONES = {
+    'North Central': ['Benue', 'FCT', 'Kogi', 'Kwara', 'Nasarawa', 'Niger', 'Plateau'],
+    'North East': ['Adamawa', 'Bauchi', 'Borno', 'Gombe', 'Taraba', 'Yobe'],
+    'North West': ['Jigawa', 'Kaduna', 'Kano', 'Katsina', 'Kebbi', 'Sokoto', 'Zamfara'],
+    'South East': ['Abia', 'Anambra', 'Ebonyi', 'Enugu', 'Imo'],
+    'South South': ['Akwa Ibom', 'Bayelsa', 'Cross River', 'Delta', 'Edo', 'Rivers'],
+    'South West': ['Ekiti', 'Lagos', 'Ogun', 'Ondo', 'Osun', 'Oyo']
+}
+STATE_ZONES = {state: zone for zone, states in ZONES.items() for state in states}
+
+# Cities and towns -> state
+CITIES = {
+    'Abuja': 'FCT', 'Gwagwalada': 'FCT', 'Kubwa': 'FCT', 'Garki': 'FCT', 'Wuse': 'FCT', 'Maitama': 'FCT',
+    'Makurdi': 'Benue', 'Lokoja': 'Kogi', 'Ilorin': 'Kwara', 'Lafia': 'Nasarawa', 'Keffi': 'Nasarawa',
+    'Minna': 'Niger', 'Bida': 'Niger', 'Jos': 'Plateau',
+    'Yola': 'Adamawa', 'Bauchi': 'Bauchi', 'Maiduguri': 'Borno', 'Gombe': 'Gombe', 'Jalingo': 'Taraba',
+    'Damaturu': 'Yobe', 'Potiskum': 'Yobe',
+    'Dutse': 'Jigawa', 'Kaduna': 'Kaduna', 'Zaria': 'Kaduna', 'Kano': 'Kano', 'Katsina': 'Katsina',
+    'Birnin Kebbi': 'Kebbi', 'Sokoto': 'Sokoto', 'Gusau': 'Zamfara',
+    'Umuahia': 'Abia', 'Aba': 'Abia', 'Awka': 'Anambra', 'Onitsha': 'Anambra', 'Nnewi': 'Anambra',
+    'Abakaliki': 'Ebonyi', 'Enugu': 'Enugu', 'Nsukka': 'Enugu', 'Owerri': 'Imo',
+    'Uyo': 'Akwa Ibom', 'Eket': 'Akwa Ibom', 'Yenagoa': 'Bayelsa', 'Calabar': 'Cross River',
+    'Asaba': 'Delta', 'Warri': 'Delta', 'Sapele': 'Delta', 'Benin City': 'Edo', 'Auchi': 'Edo',
+    'Port Harcourt': 'Rivers', 'Bonny': 'Rivers',
+    'Ado Ekiti': 'Ekiti', 'Ikeja': 'Lagos', 'Lekki': 'Lagos', 'Victoria Island': 'Lagos', 'Ikorodu': 'Lagos',
+    'Surulere': 'Lagos', 'Yaba': 'Lagos', 'Epe': 'Lagos', 'Badagry': 'Lagos', 'Ajah': 'Lagos',
+    'Abeokuta': 'Ogun', 'Ota': 'Ogun', 'Ijebu Ode': 'Ogun', 'Sagamu': 'Ogun', 'Akure': 'Ondo', 'Ondo': 'Ondo',
+    'Osogbo': 'Osun', 'Ile Ife': 'Osun', 'Ilesa': 'Osun', 'Ibadan': 'Oyo', 'Ogbomoso': 'Oyo', 'Oyo': 'Oyo'
+}
+
+# Common alternative spellings -> canonical city or state
+ALIASES = {
+    'benin': 'Benin City', 'ph': 'Port Harcourt', 'portharcourt': 'Port Harcourt', 'phc': 'Port Harcourt',
+    'vi': 'Victoria Island', 'ife': 'Ile Ife', 'ile ife': 'Ile Ife', 'oshogbo': 'Osogbo',
+    'federal capital territory': 'FCT', 'fct abuja': 'Abuja', 'akwaibom': 'Akwa Ibom', 'ijebu ode': 'Ijebu Ode'
+}
+
+UNKNOWN = 'Unknown'
+
+def _key(text):
+    """Lowercase words only, e.g. 'Ikeja,  LAGOS State.' -> 'ikeja lagos state'"""
+    return ' '.join(re.sub(r'[^a-z0-9 ]+', ' ', text.lower()).split())
+
+_CITY_KEYS = {_key(city): city for city in CITIES}
+_STATE_KEYS = {_key(state): state for state in STATE_ZONES}
+_ALIAS_KEYS = {_key(alias): target for alias, target in ALIASES.items()}
+_MAX_WORDS = max(len(key.split()) for key in (*_CITY_KEYS, *_STATE_KEYS, *_ALIAS_KEYS))
+
+@lru_cache(maxsize=65536)
+def resolve_location(text):
+    """Map free-text location to a canonical (name, state, zone), most specific place first
+    
+    'Ikeja, Lagos' -> ('Ikeja', 'Lagos', 'South West'); 'Lagos State' ->
+    ('Lagos', 'Lagos', 'South West'); anything unrecognized keeps its own
+    name under the Unknown state and zone.
+    """
+    words = _key(str(text or '')).split()
+    if not words:
+        return (UNKNOWN, UNKNOWN, UNKNOWN)
+    
+    # Longest phrases first, so 'benin city' wins over 'benin' and 'port harcourt' over nothing
+    city = state = None
+    for size in range(min(_MAX_WORDS, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            phrase = ' '.join(words[start:start + size])
+            phrase = _key(_ALIAS_KEYS.get(phrase, phrase))
+            if not city and phrase in _CITY_KEYS:
+                city = _CITY_KEYS[phrase]
+            if not state and phrase in _STATE_KEYS:
+                state = _STATE_KEYS[phrase]
+    
+    if city and (not state or CITIES[city] == state):
+        return (city, CITIES[city], STATE_ZONES[CITIES[city]])
+    if state:
+        # A state on its own resolves to the state capital area under the state's name
+        return (state, state, STATE_ZONES[state])
+    return (' '.join(words).title(), UNKNOWN, UNKNOWN)
+
+class LocationIndex:
+    """Canonical location dimension and per-location case counts, kept current from case writes"""
+    
+    def __init__(self, database):
+        self.db = database
+        self._location_ids = {}
+    
+    def location_id(self, conn, text):
+        """Get (creating if needed) the dimension row for a free-text location
+        
+        Each distinct raw string is resolved once: in-process first, then
+        through the location_aliases table, and only then by the gazetteer.
+        """
+        raw = str(text or '').strip()
+        if raw in self._location_ids:
+            return self._location_ids[raw]
+        
+        row = conn.execute('SELECT location_id FROM location_aliases WHERE alias = ?', (raw,)).fetchone()
+        if row:
+            location_id = row['location_id']
+        else:
+            name, state, zone = resolve_location(raw)
+            conn.execute('INSERT OR IGNORE INTO locations (name, state, zone) VALUES (?, ?, ?)', (name, state, zone))
+            location_id = conn.execute('SELECT id FROM locations WHERE name = ? AND state = ?',
+                                       (name, state)).fetchone()['id']
+            conn.execute('INSERT OR IGNORE INTO location_aliases (alias, location_id) VALUES (?, ?)',
+                         (raw, location_id))
+        
+        self._location_ids[raw] = location_id
+        return location_id
+    
+    def _add(self, conn, location, crime_type, delta):
+        conn.execute('''
+            INSERT INTO location_case_counts (location_id, crime_type, case_count) VALUES (?, ?, ?)
+            ON CONFLICT (location_id, crime_type) DO UPDATE SET case_count = case_count + excluded.case_count
+        ''', (self.location_id(conn, location), crime_type or UNKNOWN, delta))
+    
+    def on_change(self, topic, event):
+        """Change feed listener that moves counts between locations as cases are written"""
+        if topic != 'cases' or event.get('action') not in ('create', 'update'):
+            return
+        changes = event.get('changes', {})
+        if event['action'] == 'update' and not {'location', 'crime_type'} & set(changes):
+            return
+        
+        case = self.db.get_case_by_id(event['case_id'])
+        if not case:
+            return
+        
+        conn = self.db.get_connection()
+        with conn:
+            if event['action'] == 'update':
+                old_location = changes.get('location', (case.location,))[0]
+                old_crime_type = changes.get('crime_type', (case.crime_type,))[0]
+                self._add(conn, old_location, old_crime_type, -1)
+            self._add(conn, case.location, case.crime_type, 1)
+        conn.close()
+    
+    def ensure_built(self):
+        """Build the counts once for a database that has cases but no counts yet"""
+        conn = self.db.get_connection()
+        empty = not conn.execute('SELECT 1 FROM location_case_counts LIMIT 1').fetchone()
+        has_cases = conn.execute('SELECT 1 FROM cases LIMIT 1').fetchone()
+        conn.close()
+        if empty and (has_cases or self.db.archive_overlaps()):
+            self.rebuild()
+    
+    def rebuild(self):
+        """Recount every case, hot and archived, by canonical location"""
+        frames = self.db.fan_out(
+            'SELECT location, crime_type, COUNT(*) AS cases FROM main.cases GROUP BY location, crime_type'
+        )
+        groups = Counter()
+        for frame in frames:
+            for location, crime_type, cases in frame.itertuples(index=False):
+                groups[location, crime_type] += int(cases)
+        
+        conn = self.db.get_connection()
+        with conn:
+            conn.execute('DELETE FROM location_case_counts')
+            for (location, crime_type), cases in groups.items():
+                self._add(conn, location, crime_type, cases)
+        conn.close()
+        return sum(groups.values())
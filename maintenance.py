@@ -0,0 +1,110 @@
+"""Maintenance jobs for the Cybercrime Management System
+
+Usage:
+    python maintenance.py archive [--days 365] [--batch-size 500]
+    python maintenance.py dedupe [--rebuild] [--threshold 0.5]
+    python maintenance.py entities
+    python maintenance.py locations
+    python maintenance.py activity [--keep-months 12]
+    python maintenance.py sla [--set PRIORITY RESPONSE_HOURS RESOLUTION_HOURS]
+
+Jobs run against CYBERCRIME_DB (default /tmp/cybercrime.db), archiving by
+year when CYBERCRIME_SHARD_BY_YEAR=1 as the app does, and are safe to re-run
+or interrupt.
+"""
+import argparse
+import os
+import sys
+
+from database import ACTIVITY_RETENTION_MONTHS, ARCHIVE_AFTER_DAYS, Database
+from entities import EntityIndex
+from locations import LocationIndex
+from similarity import SimilarityIndex
+
+def archive(db, args):
+    """Move old closed/resolved cases into the archive database"""
+    result = db.archive_closed_cases(older_than_days=args.days, batch_size=args.batch_size)
+    print(f"Archived {result['archived']} case(s) into {', '.join(result['files']) or db.archive_path}")
+
+def dedupe(db, args):
+    """Index the case backlog and print clusters of likely duplicate cases"""
+    index = SimilarityIndex(db, threshold=args.threshold)
+    if args.rebuild:
+        print(f"Indexed {index.rebuild()} case(s)")
+    
+    clusters = index.find_duplicate_clusters()
+    print(f"{len(clusters)} cluster(s) of possible duplicates")
+    for members in clusters:
+        print(', '.join(members))
+
+def entities(db, args):
+    """Rebuild the entity link index from every case"""
+    index = EntityIndex(db)
+    print(f"Indexed entities of {index.rebuild()} case(s)")
+
+def locations(db, args):
+    """Recount cases per canonical location"""
+    print(f"Counted {LocationIndex(db).rebuild()} case(s) by location")
+
+def activity(db, args):
+    """Summarize and drop activity log months past retention"""
+    result = db.compact_activity_log(keep_months=args.keep_months)
+    if not result['success']:
+        print(f"Error: {result['error']}")
+        return 1
+    print(f"Compacted {result['rows']} activity row(s) from {len(result['months'])} month(s): "
+          f"{', '.join(result['months']) or '-'}")
+
+def sla(db, args):
+    """Show, or change, the SLA hours per priority"""
+    if args.set:
+        priority, response_hours, resolution_hours = args.set
+        result = db.set_sla_policy(priority, int(response_hours), int(resolution_hours))
+        if not result['success']:
+            print(f"Error: {result['error']}")
+            return 1
+        print(f"Rescheduled {result['rescheduled']} open {priority} case(s)")
+    print(db.get_sla_policies().to_string(index=False))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.environ.get('CYBERCRIME_DB', '/tmp/cybercrime.db'))
+    parser.add_argument('--shard-by-year', action='store_true',
+                        default=os.environ.get('CYBERCRIME_SHARD_BY_YEAR') == '1',
+                        help='Archive into one file per case year')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    archive_parser = subparsers.add_parser('archive', help='Move old closed cases to the archive')
+    archive_parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                                help='Archive cases closed and untouched for this many days')
+    archive_parser.add_argument('--batch-size', type=int, default=500)
+    archive_parser.set_defaults(func=archive)
+    
+    dedupe_parser = subparsers.add_parser('dedupe', help='Find clusters of near-duplicate cases')
+    dedupe_parser.add_argument('--rebuild', action='store_true',
+                               help='Re-index every case first (needed once for existing data)')
+    dedupe_parser.add_argument('--threshold', type=float, default=0.5,
+                               help='Minimum estimated similarity to link two cases')
+    dedupe_parser.set_defaults(func=dedupe)
+    
+    entities_parser = subparsers.add_parser('entities', help='Rebuild the entity link index')
+    entities_parser.set_defaults(func=entities)
+    
+    locations_parser = subparsers.add_parser('locations', help='Recount cases per canonical location')
+    locations_parser.set_defaults(func=locations)
+    
+    activity_parser = subparsers.add_parser('activity', help='Compact activity log months past retention')
+    activity_parser.add_argument('--keep-months', type=int, default=ACTIVITY_RETENTION_MONTHS,
+                                 help='Months of full activity detail to keep, including the current one')
+    activity_parser.set_defaults(func=activity)
+    
+    sla_parser = subparsers.add_parser('sla', help='Show or change the SLA hours per priority')
+    sla_parser.add_argument('--set', nargs=3, metavar=('PRIORITY', 'RESPONSE_HOURS', 'RESOLUTION_HOURS'),
+                            help='Hours to pick up a Pending case and to resolve one under investigation')
+    sla_parser.set_defaults(func=sla)
+    
+    args = parser.parse_args()
+    return args.func(Database(args.db, shard_by_year=args.shard_by_year), args)
+
+if __name__ == '__main__':
+    sys.exit(main())
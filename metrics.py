@@ -0,0 +1,61 @@
+import threading
+import time
+
+from flask import request
+
+class CallbackMetrics:
+    """Calls, DB statements and wall time per Dash callback, counted in this process
+    
+    Every /_dash-update-component request is one callback run, named by its
+    outputs. Statements are counted through Database.trace_statements on the
+    request's own thread. Background callbacks (reports) run in job processes
+    and are not counted here.
+    """
+    
+    def __init__(self, database):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {}
+        database.trace_statements(self._count_statement)
+    
+    def init_app(self, server):
+        server.before_request(self._start)
+        server.after_request(self._finish)
+    
+    def _count_statement(self, statement):
+        if getattr(self._local, 'callback', None):
+            self._local.statements += 1
+    
+    def _start(self):
+        self._local.callback = None
+        if not request.path.endswith('/_dash-update-component'):
+            return
+        body = request.get_json(silent=True) or {}
+        self._local.callback = body.get('output', '?').strip('.').replace('...', ' + ')
+        self._local.statements = 0
+        self._local.started = time.perf_counter()
+    
+    def _finish(self, response):
+        callback = getattr(self._local, 'callback', None)
+        if not callback:
+            return response
+        elapsed = (time.perf_counter() - self._local.started) * 1000
+        self._local.callback = None
+        
+        with self._lock:
+            stats = self._stats.setdefault(callback, {'calls': 0, 'statements': 0, 'ms': 0.0})
+            stats['calls'] += 1
+            stats['statements'] += self._local.statements
+            stats['ms'] += elapsed
+        return response
+    
+    def report(self):
+        """Per-callback totals, most DB statements first"""
+        with self._lock:
+            rows = [{'callback': callback, **stats, 'ms': round(stats['ms'], 1)}
+                    for callback, stats in self._stats.items()]
+        return sorted(rows, key=lambda row: (-row['statements'], row['callback']))
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,439 @@
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+# Prepared statements kept per connection; comfortably above the number of
+# registered statements and their rendered variants
+STATEMENT_CACHE_SIZE = 256
+
+# Idle connections kept per process, enough for every request of a gevent
+# worker that holds one at the same time
+MAX_IDLE_CONNECTIONS = 32
+
+@dataclass(frozen=True, slots=True)
+class CaseRow:
+    id: int
+    case_id: str
+    title: str
+    crime_type: str
+    incident_date: str
+    location: str
+    victim_name: str
+    victim_contact: str
+    suspect_name: str
+    suspect_details: str
+    description: str
+    evidence: str
+    priority: str
+    status: str
+    created_by: str
+    created_at: str
+    updated_at: str
+    version: int
+
+@dataclass(frozen=True, slots=True)
+class UserRow:
+    id: int
+    username: str
+    full_name: str
+    role: str
+
+@dataclass(frozen=True, slots=True)
+class EvidenceRow:
+    id: int
+    case_id: str
+    sha256: str
+    filename: str
+    content_type: str
+    size: int
+    uploaded_by: str
+    uploaded_at: str
+
+def _columns(row_type, prefix=''):
+    return ', '.join(prefix + field.name for field in fields(row_type))
+
+@lru_cache(maxsize=None)
+def _row_factory(row_type):
+    return lambda cursor, row: row_type(*row)
+
+@lru_cache(maxsize=1024)
+def _render(sql, identifiers):
+    return sql.format(**dict(identifiers))
+
+@dataclass(frozen=True, slots=True)
+class Query:
+    """A named statement; values are always bound, only {identifiers} are filled in
+    
+    Identifiers (projected columns, a filter from CASE_FILTERS, a partition
+    table) come from fixed whitelists, and each rendering is memoized, so every
+    call with the same shape runs the exact same SQL text and hits the
+    connection's statement cache.
+    """
+    name: str
+    sql: str
+    row: type = None
+    
+    def render(self, **identifiers):
+        if not identifiers:
+            return self.sql
+        return _render(self.sql, tuple(sorted(identifiers.items())))
+    
+    def execute(self, conn, params=(), **identifiers):
+        """Run on a connection; rows come back as self.row objects when the query has a row type"""
+        cursor = conn.cursor()
+        if self.row:
+            cursor.row_factory = _row_factory(self.row)
+        return cursor.execute(self.render(**identifiers), params)
+    
+    def executemany(self, conn, rows, **identifiers):
+        return conn.executemany(self.render(**identifiers), rows)
+
+QUERIES = {}
+
+def register(name, sql, row=None):
+    """Declare a statement once under a name"""
+    if name in QUERIES:
+        raise ValueError(f"Query already registered: {name}")
+    QUERIES[name] = Query(name, sql, row)
+    return QUERIES[name]
+
+# Filters usable as {filter} in the case listing query, all named parameters
+# so the hot database and every archive file bind the same dict
+CASE_FILTERS = {
+    'all': '1=1',
+    'none': '0',
+    'ids': 'case_id IN (SELECT value FROM json_each(:case_ids))',
+    'listing': r'''
+        (:status IS NULL OR status = :status)
+        AND (:pattern IS NULL OR case_id LIKE :pattern ESCAPE '\' OR title LIKE :pattern ESCAPE '\'
+             OR crime_type LIKE :pattern ESCAPE '\' OR incident_date LIKE :pattern ESCAPE '\'
+             OR location LIKE :pattern ESCAPE '\' OR status LIKE :pattern ESCAPE '\'
+             OR priority LIKE :pattern ESCAPE '\' OR created_at LIKE :pattern ESCAPE '\')
+    ''',
+    'search': r'''
+        (:pattern IS NULL OR case_id LIKE :pattern ESCAPE '\' OR title LIKE :pattern ESCAPE '\'
+         OR victim_name LIKE :pattern ESCAPE '\' OR suspect_name LIKE :pattern ESCAPE '\')
+        AND (:crime_type IS NULL OR crime_type = :crime_type)
+    '''
+}
+# A plain range, not ':start_day IS NULL OR ...', so SQLite can scan idx_cases_incident_day
+CASE_FILTERS['search_dated'] = CASE_FILTERS['search'] + 'AND incident_day BETWEEN :start_day AND :end_day'
+
+
+PARTITION_TABLE = re.compile(r'activity_log_\d{6}')
+
+def partition_table(name):
+    """Check an activity partition name before it is used as an identifier"""
+    if not PARTITION_TABLE.fullmatch(name):
+        raise ValueError(f"Invalid activity partition: {name}")
+    return name
+
+# Cases
+register('count_cases', 'SELECT COUNT(*) FROM cases')
+register('count_cases_with_status', 'SELECT COUNT(*) FROM cases WHERE status = ?')
+register('case_by_id', f'SELECT {_columns(CaseRow)} FROM main.cases WHERE case_id = ?', CaseRow)
+register('case_version', 'SELECT version FROM main.cases WHERE case_id = ?')
+register('insert_case', '''
+    INSERT INTO cases (
+        case_id, title, crime_type, incident_date, location,
+        victim_name, victim_contact, suspect_name, suspect_details,
+        description, evidence, priority, status, created_by
+    ) VALUES (
+        :case_id, :title, :crime_type, :incident_date, :location,
+        :victim_name, :victim_contact, :suspect_name, :suspect_details,
+        :description, :evidence, :priority, :status, :created_by
+    )
+''')
+# :max_rows -1 reads every row
+register('cases', 'SELECT {columns} FROM cases WHERE {filter} ORDER BY created_epoch DESC LIMIT :max_rows')
+register('recent_cases', 'SELECT {columns} FROM cases ORDER BY created_epoch DESC LIMIT ?')
+
+# Fields update_case may write; anything else is rejected before any SQL runs
+UPDATABLE_CASE_FIELDS = (
+    'title', 'crime_type', 'incident_date', 'location', 'victim_name',
+    'victim_contact', 'suspect_name', 'suspect_details', 'description',
+    'evidence', 'priority', 'status'
+)
+
+# One statement for every combination of fields: :set_<field> says whether the
+# field is written, so NULL can still be assigned explicitly
+UPDATE_CASE_SQL = 'UPDATE cases SET {assignments}, version = version + 1 WHERE case_id = :case_id AND version = :version'
+register('update_case', UPDATE_CASE_SQL.format(assignments=', '.join(
+    f"{field} = CASE WHEN :set_{field} THEN :{field} ELSE {field} END" for field in UPDATABLE_CASE_FIELDS
+)))
+register('insert_case_history', '''
+    INSERT INTO case_history (case_id, version, field, old_value, new_value, changed_by)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+register('bulk_status_history', '''
+    INSERT INTO case_history (case_id, version, field, old_value, new_value, changed_by)
+    SELECT case_id, version + 1, 'status', status, :status, :changed_by
+    FROM cases WHERE case_id IN (SELECT value FROM json_each(:case_ids)) AND status != :status
+''')
+register('bulk_status_targets', '''
+    SELECT case_id, status FROM cases
+    WHERE case_id IN (SELECT value FROM json_each(:case_ids)) AND status != :status
+''')
+register('bulk_status_update', '''
+    UPDATE cases
+    SET status = :status, version = version + 1
+    WHERE case_id IN (SELECT value FROM json_each(:case_ids)) AND status != :status
+''')
+register('case_history', '''
+    SELECT version, field, old_value, new_value, changed_by, changed_at
+    FROM case_history
+    WHERE case_id = ?
+    ORDER BY id DESC
+''')
+register('changes_since', '''
+    SELECT change_seq, {columns} FROM cases
+    WHERE change_seq > ?
+    ORDER BY change_seq
+    LIMIT ?
+''')
+register('change_cursor', "SELECT value FROM change_sequence WHERE name = 'cases'")
+register('change_versions', 'SELECT name, value FROM change_sequence')
+
+# Dashboard aggregates
+register('cases_by_type', '''
+    SELECT crime_type, COUNT(*) as count
+    FROM cases
+    GROUP BY crime_type
+    ORDER BY count DESC
+''')
+register('cases_by_status', '''
+    SELECT status, COUNT(*) as count
+    FROM cases
+    GROUP BY status
+    ORDER BY count DESC
+''')
+# Open cases of one status due before :before, most overdue first, read in
+# order off idx_cases_status_due_at; NULL due_at (no deadline) never matches
+register('sla_due', '''
+    SELECT case_id, title, crime_type, priority, status, due_at FROM cases
+    WHERE status = :status AND due_at < :before
+    ORDER BY due_at LIMIT :limit
+''')
+register('sla_count', '''
+    SELECT COUNT(*) FROM (SELECT 1 FROM cases WHERE status = ? AND due_at >= ? AND due_at < ? LIMIT ?)
+''')
+register('sla_policies', 'SELECT priority, response_hours, resolution_hours FROM sla_policies ORDER BY response_hours')
+register('set_sla_policy', '''
+    INSERT INTO sla_policies (priority, response_hours, resolution_hours) VALUES (?, ?, ?)
+    ON CONFLICT (priority) DO UPDATE SET response_hours = excluded.response_hours,
+                                         resolution_hours = excluded.resolution_hours
+''')
+# {due_at} is database.DUE_AT_SQL over each case's own columns
+register('reschedule_sla', '''
+    UPDATE cases SET due_at = {due_at}
+    WHERE priority = :priority AND status IN (SELECT value FROM json_each(:statuses))
+''')
+register('location_counts', '''
+    SELECT l.zone, l.state, l.name AS location, c.crime_type, c.case_count AS count
+    FROM location_case_counts c
+    JOIN locations l ON l.id = c.location_id
+    WHERE c.case_count > 0
+    ORDER BY l.zone, l.state, l.name
+''')
+# Days are created_epoch / 86400, read off idx_cases_created_epoch; :end_epoch is exclusive
+register('trend', '''
+    SELECT date(created_epoch / 86400 * 86400, 'unixepoch') as date, COUNT(*) as count
+    FROM cases
+    WHERE created_epoch >= :start_epoch AND created_epoch < :end_epoch
+    GROUP BY created_epoch / 86400
+    ORDER BY created_epoch / 86400
+''')
+
+# Archive
+register('archivable_cases', '''
+    SELECT id, case_id, created_at FROM main.cases
+    WHERE status IN (SELECT value FROM json_each(:statuses)) AND updated_at < :cutoff
+    ORDER BY id LIMIT :batch_size
+''')
+register('copy_to_archive', '''
+    INSERT OR IGNORE INTO archive.cases ({columns})
+    SELECT {columns} FROM main.cases WHERE id IN (SELECT value FROM json_each(:ids))
+''')
+register('delete_archived', 'DELETE FROM main.cases WHERE id IN (SELECT value FROM json_each(:ids))')
+register('archive_bounds', '''
+    SELECT COUNT(*), MIN(incident_date), MAX(incident_date), MIN(created_at), MAX(created_at), MAX(created_epoch)
+    FROM cases
+''')
+register('archive_by_type', 'SELECT crime_type, COUNT(*) FROM cases GROUP BY crime_type')
+register('archive_by_status', 'SELECT status, COUNT(*) FROM cases GROUP BY status')
+
+# Evidence
+register('insert_evidence_blob', 'INSERT OR IGNORE INTO evidence_blobs (sha256, size) VALUES (?, ?)')
+register('insert_evidence_file', '''
+    INSERT INTO evidence_files (case_id, sha256, filename, content_type, size, uploaded_by)
+    VALUES (?, ?, ?, ?, ?, ?)
+''')
+register('evidence_by_id', f'SELECT {_columns(EvidenceRow)} FROM evidence_files WHERE id = ?', EvidenceRow)
+register('case_evidence', f'''
+    SELECT {_columns(EvidenceRow)}
+    FROM evidence_files
+    WHERE case_id = ?
+    ORDER BY uploaded_at DESC, id DESC
+''')
+
+# Users
+register('insert_user', 'INSERT INTO users (username, password, full_name, role) VALUES (?, ?, ?, ?)')
+register('active_users', 'SELECT id, username, full_name, role, created_at, last_login FROM users WHERE is_active = 1')
+register('count_active_users', 'SELECT COUNT(*) FROM users WHERE is_active = 1')
+register('touch_last_login', 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username = ?')
+register('authenticate_user', f'''
+    SELECT {_columns(UserRow)}
+    FROM users
+    WHERE username = ? AND password = ? AND is_active = 1
+''', UserRow)
+
+# Activity log partitions ({table} is always checked by partition_table)
+register('activity_partitions', '''
+    SELECT name FROM sqlite_master
+    WHERE type = 'table' AND name GLOB 'activity_log_[0-9]*'
+    ORDER BY name DESC
+''')
+register('seed_partition_sequence', '''
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT :table, :seq WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :table)
+''')
+register('insert_activity', 'INSERT INTO {table} (username, action, details, timestamp) VALUES (?, ?, ?, ?)')
+register('bump_activity_counter', '''
+    INSERT INTO activity_counters (username, action, hour, count) VALUES (?, ?, ?, 1)
+    ON CONFLICT (username, action, hour) DO UPDATE SET count = count + 1
+''')
+register('activity_page', '''
+    SELECT * FROM {table}
+    WHERE (:before_id IS NULL OR id < :before_id)
+      AND (:username IS NULL OR username = :username)
+      AND (:start_date IS NULL OR timestamp >= :start_date)
+      AND (:end_date IS NULL OR timestamp < date(:end_date, '+1 day'))
+    ORDER BY id DESC
+    LIMIT :limit
+''')
+register('count_partition', 'SELECT COUNT(*) FROM {table}')
+register('rollup_partition', '''
+    INSERT INTO activity_rollup (month, username, action, count, first_at, last_at)
+    SELECT ?, username, action, COUNT(*), MIN(timestamp), MAX(timestamp)
+    FROM {table} GROUP BY username, action
+    ON CONFLICT (month, username, action) DO UPDATE SET
+        count = count + excluded.count,
+        first_at = MIN(first_at, excluded.first_at),
+        last_at = MAX(last_at, excluded.last_at)
+''')
+register('drop_partition', 'DROP TABLE {table}')
+register('forget_partition_sequence', 'DELETE FROM sqlite_sequence WHERE name = ?')
+register('activity_rollup', '''
+    SELECT month, action, SUM(count) as count, COUNT(DISTINCT username) as users
+    FROM activity_rollup
+    GROUP BY month, action
+    ORDER BY month DESC, count DESC
+''')
+
+# Activity counters
+register('has_activity_counters', 'SELECT 1 FROM activity_counters LIMIT 1')
+register('clear_activity_counters', 'DELETE FROM activity_counters')
+register('fill_activity_counters', '''
+    INSERT INTO activity_counters (username, action, hour, count)
+    SELECT username, action, substr(timestamp, 1, 13), COUNT(*)
+    FROM activity_log GROUP BY 1, 2, 3
+''')
+register('total_activity_counters', '''
+    INSERT INTO activity_counters (username, action, hour, count)
+    SELECT CASE WHEN :per_user THEN username ELSE '*' END,
+           CASE WHEN :per_action THEN action ELSE '*' END,
+           hour, SUM(count)
+    FROM activity_counters
+    WHERE username != '*' AND action != '*'
+    GROUP BY 1, 2, 3
+''')
+register('daily_activity', '''
+    SELECT substr(hour, 1, 10) as day, SUM(count) as count
+    FROM activity_counters
+    WHERE username = ? AND action = ? AND hour BETWEEN ? AND ?
+    GROUP BY day
+    ORDER BY day
+''')
+register('activity_by_user', '''
+    SELECT u.username, COALESCE((
+        SELECT SUM(c.count) FROM activity_counters c
+        WHERE c.username = u.username AND c.action = ? AND c.hour BETWEEN ? AND ?
+    ), 0) as count
+    FROM users u
+    WHERE u.is_active = 1
+''')
+register('hourly_activity', '''
+    SELECT hour, count
+    FROM activity_counters
+    WHERE username = ? AND action = '*' AND hour BETWEEN ? AND ?
+''')
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool instead of closing it"""
+    pool = None
+    idle = False
+    
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+class ConnectionPool:
+    """Idle connections shared by a process, so prepared statements outlive a single method call
+    
+    A connection goes back on close(), with any open transaction rolled back,
+    and is then handed to whichever thread or greenlet asks next: a
+    gevent worker runs each request in a greenlet of its own, so connections
+    kept per thread (or greenlet) would rarely be reused. Connections are
+    opened with check_same_thread=False for that reason; the pool never
+    hands one to two users at once. After a fork the inherited ones are left
+    alone rather than closed: closing them would drop the parent's POSIX
+    locks on the database file.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._idle = []
+        self._inherited = []
+    
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._inherited.extend(self._idle)
+            self._lock, self._pid, self._idle = threading.Lock(), os.getpid(), []
+    
+    def acquire(self):
+        self._check_fork()
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                conn.idle = False
+                return conn
+        
+        conn = sqlite3.connect(self.path, factory=PooledConnection, cached_statements=STATEMENT_CACHE_SIZE,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        return conn
+    
+    def release(self, conn):
+        if conn.idle:
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(None)
+        
+        self._check_fork()
+        with self._lock:
+            if len(self._idle) < MAX_IDLE_CONNECTIONS:
+                conn.idle = True
+                self._idle.append(conn)
+                return
+        conn.pool = None
+        conn.close()
@@ -0,0 +1,161 @@
+from flask import Response, abort, jsonify, request, send_file, url_for
+from werkzeug.utils import secure_filename
+import json
+import time
+from auth import api_token_required, current_user, login_required, require_role
+
+# A stream is closed after this long and the browser reconnects on its own,
+# so idle connections never pin a worker indefinitely
+STREAM_SECONDS = 300
+HEARTBEAT_SECONDS = 25
+
+# Columns of the CSV case exports
+EXPORT_COLUMNS = ['case_id', 'title', 'crime_type', 'incident_date', 'location',
+                  'victim_name', 'status', 'priority', 'created_at']
+
+def register_routes(server, db, change_feed, evidence_store, callback_metrics, case_cache):
+    """Register plain Flask routes on the Dash server"""
+    
+    # Server-sent events: one 'change' event per topic whose version moved
+    @server.route('/events')
+    def change_events():
+        def stream():
+            known = change_feed.versions()
+            
+            # Current versions first, so a reconnecting client catches up
+            yield 'retry: 5000\n\n'
+            for topic, version in known.items():
+                yield _format_event(topic, version)
+            
+            deadline = time.monotonic() + STREAM_SECONDS
+            while time.monotonic() < deadline:
+                current = change_feed.wait_for_change(known, HEARTBEAT_SECONDS)
+                
+                if current == known:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                for topic, version in current.items():
+                    if known.get(topic) != version:
+                        yield _format_event(topic, version)
+                known = current
+        
+        return Response(stream(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
+    # Evidence upload: multipart 'file' field, or the raw request body with ?filename=;
+    # recorded as uploaded by the logged-in user
+    @server.route('/evidence/<case_id>', methods=['POST', 'PUT'])
+    @login_required
+    def upload_evidence(case_id):
+        if not db.get_case_by_id(case_id):
+            abort(404)
+        
+        # Anything but multipart is the file itself: take the raw stream before
+        # request.files or request.values would parse and consume the body
+        if request.mimetype != 'multipart/form-data':
+            stream, filename, content_type = request.stream, request.args.get('filename'), request.mimetype
+        else:
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({'success': False, 'error': "No 'file' field in the upload"}), 400
+            stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+        
+        filename = secure_filename(filename or '') or 'evidence.bin'
+        result = evidence_store.save(case_id, stream, filename, content_type, current_user()['username'])
+        
+        return jsonify(result), 201 if result['success'] else 400
+    
+    # Evidence list for a case
+    @server.route('/evidence/<case_id>', methods=['GET'])
+    @login_required
+    def list_evidence(case_id):
+        df = db.get_case_evidence(case_id)
+        return jsonify(df.to_dict('records'))
+    
+    # Evidence download; send_file answers Range requests and streams from disk
+    @server.route('/evidence/file/<int:evidence_id>')
+    @login_required
+    def download_evidence(evidence_id):
+        evidence, path = evidence_store.get_file(evidence_id)
+        if not path:
+            abort(404)
+        
+        return send_file(
+            path,
+            mimetype=evidence.content_type or 'application/octet-stream',
+            as_attachment=True,
+            download_name=evidence.filename,
+            etag=evidence.sha256,
+            conditional=True
+        )
+    
+    # Incremental sync for partner systems: ?cursor=<last change_seq seen>&limit=<page size>,
+    # authorized by the SYNC_API_TOKEN bearer token
+    @server.route('/api/changes')
+    @api_token_required('SYNC_API_TOKEN')
+    def case_changes():
+        try:
+            cursor = int(request.args.get('cursor', 0))
+            limit = int(request.args.get('limit', 500))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'cursor and limit must be integers'}), 400
+        
+        page = db.get_changes_since(cursor, limit)
+        if page['has_more']:
+            page['next'] = url_for('case_changes', cursor=page['cursor'], limit=limit)
+        return jsonify(page)
+    
+    # Full case listings as CSV for logged-in users, streamed in chunks so memory stays flat
+    # however many rows match
+    @server.route('/export/cases.csv')
+    @login_required
+    def export_cases():
+        chunks = db.iter_all_cases(request.args.get('status', 'all'), columns=EXPORT_COLUMNS,
+                                   search_text=request.args.get('q') or None)
+        return _csv_response(chunks, 'cases.csv')
+    
+    @server.route('/export/search.csv')
+    @login_required
+    def export_search():
+        chunks = db.iter_search_cases(request.args.get('q', ''), request.args.get('crime_type', 'all'),
+                                      request.args.get('start_date') or None, request.args.get('end_date') or None,
+                                      columns=EXPORT_COLUMNS)
+        return _csv_response(chunks, 'search.csv')
+    
+    # Every open case overdue or due within ?hours=, for the SLA report; logged-in users only
+    @server.route('/export/sla.csv')
+    @login_required
+    def export_sla():
+        df = db.get_sla_cases(soon_hours=request.args.get('hours', 0, type=int), limit=None)
+        return _csv_response([df], 'sla.csv')
+    
+    # Callback runs and DB statements per callback, and case cache hit rate, since start (or the
+    # last DELETE, which only an Admin may send)
+    @server.route('/api/metrics', methods=['GET', 'DELETE'])
+    def callback_metrics_report():
+        if request.method == 'DELETE':
+            require_role('Admin')
+            callback_metrics.reset()
+            case_cache.reset()
+        return jsonify({'callbacks': callback_metrics.report(), 'case_cache': case_cache.stats()})
+
+def _format_event(topic, version):
+    """Format a topic version as a server-sent event"""
+    return f"event: change\ndata: {json.dumps({'topic': topic, 'version': version})}\n\n"
+
+def _csv_response(chunks, filename):
+    """Stream DataFrame chunks as one CSV attachment, the header written once"""
+    def stream():
+        header = True
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+        if header:
+            yield ','.join(EXPORT_COLUMNS) + '\n'
+    
+    return Response(stream(), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
@@ -0,0 +1,182 @@
+import glob
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from queries import QUERIES
+
+# Archive files read at the same time by one fan-out
+SHARD_WORKERS = 4
+
+# Aggregate results kept across all archive files; an entry is only reused
+# while its file's mtime is unchanged
+MAX_CACHED_RESULTS = 512
+
+CASE_YEAR = re.compile(r'CYB-(\d{4})-')
+
+class ArchiveShards:
+    """The SQLite files archived cases live in: one archive file, or one per case year
+    
+    With by_year, a case is archived into <db>-archive-YYYY.db for the year of
+    its CYB-YYYY-NNNN id; a single archive file from before is still read.
+    Archived cases never change, so the files are read through read-only
+    connections and their summaries and cached results stay valid until
+    archival writes to them again.
+    """
+    
+    def __init__(self, db_path, archive_path=None, by_year=False):
+        stem = str(Path(db_path).with_name(Path(db_path).stem + '-archive'))
+        self.archive_path = archive_path or stem + '.db'
+        self.by_year = by_year
+        self._year_path = stem + '-{year}.db'
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._results = OrderedDict()
+        self._executor = None
+        self._executor_pid = None
+    
+    def path_for(self, case_id, created_at=None):
+        """File a case is archived into"""
+        if not self.by_year:
+            return self.archive_path
+        match = CASE_YEAR.match(case_id or '')
+        return self._year_path.format(year=match.group(1) if match else str(created_at)[:4])
+    
+    def paths(self):
+        """Existing archive files, newest year first"""
+        paths = []
+        if self.by_year:
+            paths = sorted(glob.glob(self._year_path.format(year='[0-9]' * 4)), reverse=True)
+        if os.path.exists(self.archive_path):
+            paths.append(self.archive_path)
+        return paths
+    
+    def paths_for_case_ids(self, case_ids):
+        """Archive files that can hold any of the case IDs"""
+        paths = self.paths()
+        if self.by_year:
+            years = set()
+            for case_id in case_ids:
+                match = CASE_YEAR.match(case_id)
+                if not match:
+                    # An ID without a year could be in any file
+                    years = None
+                    break
+                years.add(match.group(1))
+            if years is not None:
+                wanted = {self._year_path.format(year=year) for year in years} | {self.archive_path}
+                paths = [path for path in paths if path in wanted]
+        return paths
+    
+    def summary(self, path):
+        """Cached count, date bounds and per-type/per-status counts of one file; None if it has no cases"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        
+        # A file only changes when cases are archived into it, so its mtime is the cache key
+        cached = self._summaries.get(path)
+        if cached and cached['mtime'] == mtime:
+            return cached if cached['count'] else None
+        
+        conn = self.connect(path)
+        try:
+            bounds = QUERIES['archive_bounds'].execute(conn).fetchone()
+            by_type = dict(QUERIES['archive_by_type'].execute(conn).fetchall())
+            by_status = dict(QUERIES['archive_by_status'].execute(conn).fetchall())
+        except sqlite3.OperationalError:
+            # File exists but no case has been archived into it yet
+            return None
+        finally:
+            conn.close()
+        
+        summary = {
+            'mtime': mtime,
+            'count': bounds[0],
+            'min_incident_date': bounds[1],
+            'max_incident_date': bounds[2],
+            'min_created_at': bounds[3],
+            'max_created_at': bounds[4],
+            'max_created_epoch': bounds[5],
+            'by_type': by_type,
+            'by_status': by_status
+        }
+        self._summaries[path] = summary
+        return summary if summary['count'] else None
+    
+    def overlapping(self, start_date=None, end_date=None, column='incident_date'):
+        """Archive files whose cases can fall in a date range on incident_date or created_at"""
+        paths = []
+        for path in self.paths():
+            summary = self.summary(path)
+            if not summary:
+                continue
+            low, high = summary[f'min_{column}'], summary[f'max_{column}']
+            if start_date and start_date[:10] > high[:10]:
+                continue
+            if end_date and end_date[:10] < low[:10]:
+                continue
+            paths.append(path)
+        return paths
+    
+    def newer_than(self, paths, created_epoch):
+        """The files among paths holding a case created at or after created_epoch"""
+        return [path for path in paths if (self.summary(path) or {}).get('max_created_epoch', created_epoch - 1)
+                >= created_epoch]
+    
+    def connect(self, path):
+        """Read-only connection to an archive file"""
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def submit(self, path, sql, params=(), cache=False):
+        """Start reading a SELECT from an archive file on the shard threads; returns a Future of a DataFrame
+        
+        With cache, the result is kept for the same file version, SQL and parameters.
+        """
+        key = None
+        if cache:
+            key = (path, os.stat(path).st_mtime_ns, sql, repr(params))
+            with self._lock:
+                cached = self._results.get(key)
+                if cached is not None:
+                    self._results.move_to_end(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached.copy())
+                return future
+        return self._executor_for_pid().submit(self._read, path, sql, params, key)
+    
+    def _read(self, path, sql, params, key):
+        conn = self.connect(path)
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+        
+        if key:
+            with self._lock:
+                self._results[key] = df.copy()
+                while len(self._results) > MAX_CACHED_RESULTS:
+                    self._results.popitem(last=False)
+        return df
+    
+    def _executor_for_pid(self):
+        # Worker threads do not survive a fork, so each process starts its own
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(SHARD_WORKERS, thread_name_prefix='archive-shard')
+                self._executor_pid = os.getpid()
+            return self._executor
+    
+    def forget(self, path):
+        """Drop the cached summary of a file archival is writing to"""
+        self._summaries.pop(path, None)
@@ -0,0 +1,239 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# 128 MinHash permutations split into 32 LSH bands of 4 rows: cases whose
+# estimated Jaccard similarity is above ~0.45 share at least one band bucket
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Free-text fields that make up a case's fingerprint
+SIMILARITY_FIELDS = ('title', 'description', 'suspect_name', 'suspect_details',
+                     'victim_name', 'victim_contact')
+
+# Multiply-add-shift hashing: (a * x + b) mod 2**64, top 32 bits, with odd a.
+# Wrapping uint64 arithmetic avoids a modulo per shingle per permutation
+_rng = np.random.default_rng(20240607)
+_PERM_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F], dtype=np.uint64)[:ROWS]
+
+def case_text(case):
+    """Normalized text of a case's similarity fields"""
+    text = ' '.join(str(case.get(field) or '') for field in SIMILARITY_FIELDS)
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+def _shingles(text):
+    """Distinct character 5-gram hashes of a text, vectorized over its bytes"""
+    data = np.frombuffer(text.encode(), dtype=np.uint8).astype(np.uint64)
+    if len(data) < SHINGLE_SIZE:
+        data = np.pad(data, (0, SHINGLE_SIZE - len(data)))
+    
+    count = len(data) - SHINGLE_SIZE + 1
+    values = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        values |= data[offset:offset + count] << np.uint64(8 * offset)
+    return np.unique(values)
+
+def compute_signatures(texts):
+    """MinHash signatures for many texts at once, as a (len(texts), NUM_PERM) uint32 array"""
+    shingles = [_shingles(text) for text in texts]
+    lengths = np.array([len(values) for values in shingles])
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    values = np.concatenate(shingles)
+    
+    # One pass per permutation over every shingle of the batch, then a
+    # segmented min gives each text's value for that permutation
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for i in range(NUM_PERM):
+        hashed = (_PERM_A[i] * values + _PERM_B[i]) >> np.uint64(32)
+        signatures[:, i] = np.minimum.reduceat(hashed, offsets)
+    return signatures
+
+def band_buckets(signatures):
+    """LSH bucket id per band, as a (n, BANDS) int64 array"""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (bands * _BAND_MULTIPLIERS).sum(axis=2).view(np.int64)
+
+class SimilarityIndex:
+    """MinHash/LSH index over cases for near-duplicate detection"""
+    
+    def __init__(self, database, threshold=0.5):
+        self.db = database
+        self.threshold = threshold
+    
+    def on_change(self, topic, event):
+        """Change feed listener that keeps the index current as cases are written"""
+        if topic != 'cases':
+            return
+        if event.get('action') == 'create':
+            self.index_cases([event['case_id']])
+        elif event.get('action') == 'update' and set(event.get('changes', {})) & set(SIMILARITY_FIELDS):
+            self.index_cases([event['case_id']])
+    
+    def index_cases(self, case_ids):
+        """Compute and store signatures and LSH buckets for the given cases"""
+        conn = self.db.get_connection()
+        rows = conn.execute(f'''
+            SELECT case_id, {', '.join(SIMILARITY_FIELDS)} FROM cases
+            WHERE case_id IN ({', '.join('?' for _ in case_ids)})
+        ''', list(case_ids)).fetchall()
+        indexed = self._index_rows(conn, [dict(row) for row in rows])
+        conn.close()
+        return indexed
+    
+    def _index_rows(self, conn, rows):
+        """Store signatures and LSH buckets of case dicts (case_id and SIMILARITY_FIELDS)"""
+        if not rows:
+            return 0
+        
+        ids = [row['case_id'] for row in rows]
+        placeholders = ', '.join('?' for _ in ids)
+        signatures = compute_signatures([case_text(row) for row in rows])
+        buckets = band_buckets(signatures)
+        
+        with conn:
+            # Drop old buckets by primary key, using the signatures being replaced
+            old = conn.execute(f'''
+                SELECT case_id, signature FROM case_signatures WHERE case_id IN ({placeholders})
+            ''', ids).fetchall()
+            if old:
+                old_buckets = band_buckets(np.stack([np.frombuffer(row['signature'], dtype='<u4') for row in old]))
+                conn.executemany('DELETE FROM case_lsh_buckets WHERE band = ? AND bucket = ? AND case_id = ?', [
+                    (band, int(bucket), row['case_id'])
+                    for row, row_buckets in zip(old, old_buckets)
+                    for band, bucket in enumerate(row_buckets)
+                ])
+            
+            conn.executemany('INSERT OR REPLACE INTO case_signatures (case_id, signature) VALUES (?, ?)', [
+                (case_id, signature.astype('<u4').tobytes()) for case_id, signature in zip(ids, signatures)
+            ])
+            conn.executemany('INSERT OR IGNORE INTO case_lsh_buckets (band, bucket, case_id) VALUES (?, ?, ?)', [
+                (band, int(bucket), case_id)
+                for case_id, row_buckets in zip(ids, buckets)
+                for band, bucket in enumerate(row_buckets)
+            ])
+        return len(ids)
+    
+    def ensure_built(self):
+        """Build the index once for a database that has cases but no signatures yet"""
+        conn = self.db.get_connection()
+        empty = not conn.execute('SELECT 1 FROM case_signatures LIMIT 1').fetchone()
+        has_cases = conn.execute('SELECT 1 FROM cases LIMIT 1').fetchone()
+        conn.close()
+        if empty and (has_cases or self.db.archive_overlaps()):
+            self.rebuild()
+    
+    def rebuild(self, batch_size=2000):
+        """Re-index every case, hot and archived, in batches"""
+        conn = self.db.get_connection()
+        with conn:
+            conn.execute('DELETE FROM case_lsh_buckets')
+            conn.execute('DELETE FROM case_signatures')
+        
+        indexed = 0
+        last_id = 0
+        while True:
+            batch = conn.execute('SELECT id, case_id FROM cases WHERE id > ? ORDER BY id LIMIT ?',
+                                 (last_id, batch_size)).fetchall()
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            indexed += self.index_cases([row['case_id'] for row in batch])
+        
+        for chunk in self.db.iter_archived_cases(['case_id', *SIMILARITY_FIELDS], chunksize=batch_size):
+            # NULL text comes back from pandas as NaN, which case_text would take for a word
+            indexed += self._index_rows(conn, chunk.astype(object).where(chunk.notna(), None).to_dict('records'))
+        conn.close()
+        return indexed
+    
+    def find_similar(self, case, limit=5, exclude=None, candidates=100):
+        """Find indexed cases similar to a case dict, most similar first"""
+        signature = compute_signatures([case_text(case)])[0]
+        buckets = band_buckets(signature[np.newaxis, :])[0]
+        
+        # One primary key lookup per band; a row-value IN over the bands is
+        # planned as a scan of the whole bucket table
+        conn = self.db.get_connection()
+        lookups = ' UNION ALL '.join('SELECT case_id FROM case_lsh_buckets WHERE band = ? AND bucket = ?'
+                                     for _ in range(BANDS))
+        rows = conn.execute(f'''
+            SELECT s.case_id, s.signature
+            FROM (
+                SELECT case_id, COUNT(*) AS hits FROM ({lookups})
+                GROUP BY case_id
+                ORDER BY hits DESC
+                LIMIT ?
+            ) AS c
+            JOIN case_signatures s ON s.case_id = c.case_id
+        ''', [value for band, bucket in enumerate(buckets) for value in (band, int(bucket))] + [candidates + 1]).fetchall()
+        
+        matches = []
+        for row in rows:
+            if row['case_id'] == exclude:
+                continue
+            score = float(np.mean(np.frombuffer(row['signature'], dtype='<u4') == signature))
+            if score >= self.threshold:
+                matches.append((score, row['case_id']))
+        matches.sort(reverse=True)
+        
+        conn.close()
+        
+        # get_case_by_id also finds archived cases
+        results = []
+        for score, case_id in matches[:limit]:
+            found = self.db.get_case_by_id(case_id)
+            if found:
+                results.append({key: getattr(found, key) for key in ('case_id', 'title', 'crime_type', 'status', 'created_at')})
+                results[-1]['similarity'] = round(score, 2)
+        return results
+    
+    def find_duplicate_clusters(self, max_bucket_size=200):
+        """Group the whole backlog into clusters of likely duplicates via shared LSH buckets"""
+        conn = self.db.get_connection()
+        groups = conn.execute('''
+            SELECT group_concat(case_id, char(31)) AS members
+            FROM case_lsh_buckets
+            GROUP BY band, bucket
+            HAVING COUNT(*) > 1
+        ''').fetchall()
+        
+        # Candidate pairs from every shared bucket; huge buckets are boilerplate text
+        pairs = set()
+        for group in groups:
+            members = sorted(group['members'].split('\x1f'))[:max_bucket_size]
+            first = members[0]
+            pairs.update((first, other) for other in members[1:])
+            pairs.update(zip(members, members[1:]))
+        
+        involved = sorted({case_id for pair in pairs for case_id in pair})
+        signatures = {}
+        for start in range(0, len(involved), 500):
+            batch = involved[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            for row in conn.execute(f'SELECT case_id, signature FROM case_signatures WHERE case_id IN ({placeholders})', batch):
+                signatures[row['case_id']] = np.frombuffer(row['signature'], dtype='<u4')
+        conn.close()
+        
+        # Union-find over the verified pairs
+        parent = {}
+        
+        def find(case_id):
+            parent.setdefault(case_id, case_id)
+            while parent[case_id] != case_id:
+                parent[case_id] = parent[parent[case_id]]
+                case_id = parent[case_id]
+            return case_id
+        
+        for first, second in pairs:
+            if np.mean(signatures[first] == signatures[second]) >= self.threshold:
+                parent[find(first)] = find(second)
+        
+        clusters = defaultdict(list)
+        for case_id in parent:
+            clusters[find(case_id)].append(case_id)
+        return sorted((sorted(members) for members in clusters.values() if len(members) > 1),
+                      key=len, reverse=True)
@@ -0,0 +1,242 @@
+import fcntl
+import json
+import os
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columns copied into the snapshot: everything reports group or filter on,
+# none of the free text
+SNAPSHOT_COLUMNS = ('case_id', 'crime_type', 'incident_date', 'location', 'priority', 'status',
+                    'created_by', 'created_at', 'updated_at', 'version')
+CATEGORY_COLUMNS = ('crime_type', 'location', 'priority', 'status', 'created_by')
+TIMESTAMP_COLUMNS = ('incident_date', 'created_at', 'updated_at')
+
+# Rows updated this close to the watermark are read again on the next refresh,
+# so a transaction that committed late with an older updated_at is not missed
+WATERMARK_OVERLAP_SECONDS = 60
+
+# Delta files are merged into a new base file once there are this many
+MAX_DELTA_FILES = 20
+
+def _to_table(df):
+    """Arrow table with dictionary-encoded categories and real timestamps"""
+    df = df.copy()
+    for column in TIMESTAMP_COLUMNS:
+        df[column] = pd.to_datetime(df[column], errors='coerce')
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].fillna('Unknown').astype('category')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+class CaseSnapshot:
+    """Columnar (Parquet) copy of cases for reports, refreshed incrementally by updated_at
+    
+    Layout under root: a base file, delta files appended in order, and
+    manifest.json naming them with the watermark and the case versions inside
+    the overlap window. Readers load base + deltas and keep the last row per
+    case_id; report aggregations never touch SQLite.
+    """
+    
+    def __init__(self, database, root='/tmp/cybercrime-snapshot'):
+        self.db = database
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        os.makedirs(root, exist_ok=True)
+        self._frame = None
+        self._frame_files = []
+    
+    @contextmanager
+    def _lock(self):
+        """Serialize refreshes across worker processes"""
+        with open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    
+    def _write_manifest(self, manifest):
+        temp_path = f"{self.manifest_path}.{uuid.uuid4().hex}"
+        with open(temp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temp_path, self.manifest_path)
+    
+    def _write_file(self, df, prefix):
+        name = f"{prefix}-{uuid.uuid4().hex}.parquet"
+        pq.write_table(_to_table(df), os.path.join(self.root, name), compression='zstd')
+        return name
+    
+    def _query_cases(self, where='1=1', params=(), archive_paths=None):
+        """Snapshot columns of hot and archived cases (every archive file by default); short parallel reads, no write locks"""
+        query = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM main.cases WHERE {where}"
+        frames = self.db.fan_out(query, list(params), archive_paths=archive_paths)
+        return pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+    
+    def rebuild(self):
+        """Write a fresh base file from every case"""
+        with self._lock():
+            df = self._query_cases()
+            old = self._read_manifest()
+            manifest = {'base': self._write_file(df, 'base'), 'deltas': []}
+            manifest.update(self._watermark(df))
+            self._write_manifest(manifest)
+            self._remove_unused(old, manifest)
+        return len(df)
+    
+    def _watermark(self, df, previous=None):
+        """Newest updated_at seen, and the case versions close enough to it to be read again"""
+        watermark = max(filter(None, [previous, df['updated_at'].max() if len(df) else None]), default=None)
+        if not watermark:
+            return {'watermark': None, 'recent': {}}
+        
+        recent = df[pd.to_datetime(df['updated_at'], errors='coerce')
+                    >= pd.Timestamp(watermark) - pd.Timedelta(seconds=WATERMARK_OVERLAP_SECONDS)]
+        return {'watermark': watermark, 'recent': dict(zip(recent['case_id'].tolist(), recent['version'].astype(int).tolist()))}
+    
+    def refresh(self):
+        """Append cases updated since the watermark as a delta file; returns the number of new rows
+        
+        Only the hot database is read, through idx_cases_updated_at: archived
+        cases cannot be updated, and archival moves a case unchanged, so every
+        archived case already reached the snapshot while it was hot (or in
+        rebuild, which reads the archive files too).
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            self.rebuild()
+            return 0
+        
+        with self._lock():
+            manifest = self._read_manifest()
+            if not manifest['watermark']:
+                delta = self._query_cases(archive_paths=())
+            else:
+                delta = self._query_cases(
+                    'updated_at >= datetime(?, ?)', (manifest['watermark'], f"-{WATERMARK_OVERLAP_SECONDS} seconds"),
+                    archive_paths=()
+                )
+            
+            # Rows from the overlap window that the snapshot already has are not new
+            recent = manifest.get('recent', {})
+            known = [recent.get(case_id) == version for case_id, version in zip(delta['case_id'], delta['version'])]
+            delta = delta[~pd.Series(known, index=delta.index, dtype=bool)]
+            if delta.empty:
+                return 0
+            
+            old = dict(manifest)
+            manifest['deltas'] = manifest['deltas'] + [self._write_file(delta, 'delta')]
+            window = pd.concat([pd.DataFrame({'case_id': list(recent), 'version': list(recent.values()),
+                                              'updated_at': manifest['watermark']}),
+                                delta[['case_id', 'version', 'updated_at']]], ignore_index=True)
+            manifest.update(self._watermark(window.drop_duplicates('case_id', keep='last'), manifest['watermark']))
+            if len(manifest['deltas']) > MAX_DELTA_FILES:
+                manifest['base'] = self._write_file(self.frame(manifest), 'base')
+                manifest['deltas'] = []
+            self._write_manifest(manifest)
+            self._remove_unused(old, manifest)
+        return len(delta)
+    
+    def _remove_unused(self, old, new):
+        """Delete files the previous manifest had and the new one does not"""
+        if not old:
+            return
+        keep = {new['base'], *new['deltas']}
+        for name in [old['base'], *old['deltas']]:
+            if name not in keep and os.path.exists(os.path.join(self.root, name)):
+                os.remove(os.path.join(self.root, name))
+    
+    def _read(self, names):
+        """Files as one DataFrame, keeping the last row per case_id"""
+        tables = [pq.read_table(os.path.join(self.root, name)) for name in names]
+        df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
+        if len(names) > 1:
+            df = df.drop_duplicates('case_id', keep='last', ignore_index=True)
+        return df
+    
+    def frame(self, manifest=None):
+        """The snapshot as a DataFrame (categorical columns), cached until the manifest changes
+        
+        When only new delta files were added since the cached copy was loaded,
+        just those are read and applied on top of it.
+        """
+        manifest = manifest or self._read_manifest()
+        if manifest is None:
+            self.rebuild()
+            manifest = self._read_manifest()
+        
+        files = [manifest['base'], *manifest['deltas']]
+        if files == self._frame_files:
+            return self._frame
+        
+        if self._frame_files and files[:len(self._frame_files)] == self._frame_files:
+            df = _apply_delta(self._frame, self._read(files[len(self._frame_files):]))
+        else:
+            df = self._read(files[:1])
+            if len(files) > 1:
+                df = _apply_delta(df, self._read(files[1:]))
+        
+        for column in CATEGORY_COLUMNS:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+        self._frame, self._frame_files = df, files
+        return df
+
+def _apply_delta(df, delta):
+    """Replace the rows of df whose case_id is in delta, categories merged so they stay categorical"""
+    df = df[~df['case_id'].isin(delta['case_id'])]
+    delta = delta.copy()
+    for column in CATEGORY_COLUMNS:
+        categories = df[column].astype('category').cat.categories.union(delta[column].astype(str).unique())
+        df = df.assign(**{column: df[column].astype(pd.CategoricalDtype(categories))})
+        delta[column] = delta[column].astype(pd.CategoricalDtype(categories))
+    return pd.concat([df, delta], ignore_index=True)
+
+def _in_range(df, start_date=None, end_date=None, column='created_at'):
+    """Rows whose column falls within [start_date, end_date], both inclusive days"""
+    mask = pd.Series(True, index=df.index)
+    if start_date:
+        mask &= df[column] >= pd.Timestamp(start_date[:10])
+    if end_date:
+        mask &= df[column] < pd.Timestamp(end_date[:10]) + pd.Timedelta(days=1)
+    return df[mask]
+
+def trend(df, start_date=None, end_date=None):
+    """Cases created per day, like Database.get_trend_data"""
+    cases = _in_range(df, start_date, end_date)
+    counts = cases['created_at'].dt.normalize().value_counts().sort_index()
+    return pd.DataFrame({'date': counts.index.strftime('%Y-%m-%d'), 'count': counts.to_numpy()})
+
+def counts_by(df, column, start_date=None, end_date=None):
+    """Case counts per value of a categorical column, largest first"""
+    counts = _in_range(df, start_date, end_date)[column].value_counts()
+    counts = counts[counts > 0]
+    return pd.DataFrame({column: counts.index.astype(str), 'count': counts.to_numpy()})
+
+def crosstab(df, rows, columns, start_date=None, end_date=None):
+    """Case counts for every combination of two columns ('month' groups created_at by month)"""
+    cases = _in_range(df, start_date, end_date)
+    keys = [
+        pd.Series(cases['created_at'].to_numpy().astype('datetime64[M]'), index=cases.index, name='month')
+        if name == 'month' else cases[name]
+        for name in (rows, columns)
+    ]
+    table = cases.groupby(keys, observed=True).size().unstack(fill_value=0)
+    for axis in ('index', 'columns'):
+        labels = getattr(table, axis)
+        if isinstance(labels, pd.DatetimeIndex):
+            table = table.set_axis(labels.strftime('%Y-%m'), axis=axis)
+        else:
+            table = table.set_axis(labels.astype(str), axis=axis)
+    
+    table['Total'] = table.sum(axis=1)
+    table.loc['Total'] = table.sum(axis=0)
+    return table.rename_axis(index=rows, columns=None).reset_index()